@@ -1,2 +1,4 @@
 pip install -r requirements.txt
-python manage.py collectstatic
\ No newline at end of file
+python manage.py collectstatic
+python manage.py rebuild_search_index
+python manage.py prerender
\ No newline at end of file
@@ -66,6 +66,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'tally_app.navigation.navigation',
             ],
         },
     },
@@ -81,6 +82,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # import_all writes from several threads at once: take the write lock when a
+        # transaction starts and wait for it rather than failing with "database is locked"
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 30,
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+# Pages and the navigation are cached per dataset version (tally_app/page_cache.py). The version
+# is kept in the database, where every process sees the importers' bumps, so a per-process cache
+# is enough.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'olympics',
     }
 }
 
@@ -127,6 +148,16 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# Pages rendered to static HTML by `manage.py prerender`, for the static build to serve
+PRERENDER_ROOT = BASE_DIR / 'staticfiles_build'
+
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    # plotly.js, straight from the installed plotly package
+    'tally_app.static_assets.PlotlyJsFinder',
+]
+
 
 sys.path.insert(0, BASE_DIR / 'libs/paris-2024-olympic-api')
 
@@ -24,5 +24,8 @@ urlpatterns = [
 
     re_path(r'^countries/$', views.all_countries, name='countries'),
     re_path(r'^games/$', views.all_games, name='games'),
+    re_path(r'^search/$', views.search, name='search'),
+    re_path(r'^search/suggest/$', views.search_suggestions, name='search_suggestions'),
     re_path(r'^tally/', include('tally_app.urls', namespace='tally_app')),
+    re_path(r'^api/v1/', include('tally_app.api_urls', namespace='api_v1')),
 ]
@@ -0,0 +1,31 @@
+// Draws a country's medal counts per Games from the country_stats_data endpoint
+(function () {
+	const chart = document.getElementById('medal-chart');
+	if (!chart) {
+		return;
+	}
+
+	const traces = [
+		{key: 'total', name: 'Total Medals', color: 'black', dash: 'dot'},
+		{key: 'gold', name: 'Gold Medals', color: '#e8c62c', dash: 'solid'},
+		{key: 'silver', name: 'Silver Medals', color: 'silver', dash: 'solid'},
+		{key: 'bronze', name: 'Bronze Medals', color: '#e6a14e', dash: 'solid'},
+	];
+
+	fetch(chart.dataset.url)
+		.then((response) => response.json())
+		.then((data) => {
+			Plotly.newPlot(chart, traces.map((trace) => ({
+				x: data.year,
+				y: data[trace.key],
+				mode: 'lines+markers',
+				marker: {color: trace.color},
+				line: {dash: trace.dash},
+				name: trace.name,
+			})), {
+				title: `${data.country} Medal Count (1896 - 2024)`,
+				xaxis: {title: 'Year'},
+				yaxis: {title: '# Medals'},
+			}, {responsive: true});
+		});
+})();
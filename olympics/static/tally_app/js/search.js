@@ -0,0 +1,89 @@
+// Suggests athletes, countries, events and disciplines under the navigation search box as it's typed into
+(function () {
+	const input = document.getElementById('site-search');
+	const list = document.getElementById('site-search-suggestions');
+	if (!input || !list) {
+		return;
+	}
+
+	const minLength = 2;
+	const delay = 120;
+	let timer = null;
+	let controller = null;
+	let selected = -1;
+
+	function close() {
+		list.innerHTML = '';
+		list.style.display = 'none';
+		selected = -1;
+	}
+
+	function select(index) {
+		const items = list.querySelectorAll('a');
+		items.forEach((item, i) => item.classList.toggle('active', i === index));
+		selected = index;
+	}
+
+	function show(results) {
+		close();
+		results.forEach((result) => {
+			const item = document.createElement('a');
+			item.href = result.url;
+			item.className = 'list-group-item';
+			const title = document.createElement('strong');
+			title.textContent = result.title;
+			const detail = document.createElement('small');
+			detail.className = 'text-muted';
+			detail.textContent = ` ${result.detail}`;
+			item.append(title, detail);
+			list.appendChild(item);
+		});
+		list.style.display = results.length ? 'block' : 'none';
+	}
+
+	function suggest() {
+		const query = input.value.trim();
+		if (query.length < minLength) {
+			close();
+			return;
+		}
+
+		// Only the answer to the latest query is shown
+		if (controller) {
+			controller.abort();
+		}
+		controller = new AbortController();
+		fetch(`${input.dataset.suggestUrl}?q=${encodeURIComponent(query)}`, {signal: controller.signal})
+			.then((response) => response.json())
+			.then((data) => show(data.results))
+			.catch((error) => {
+				if (error.name !== 'AbortError') {
+					close();
+				}
+			});
+	}
+
+	input.addEventListener('input', () => {
+		clearTimeout(timer);
+		timer = setTimeout(suggest, delay);
+	});
+
+	input.addEventListener('keydown', (event) => {
+		const items = list.querySelectorAll('a');
+		if (event.key === 'ArrowDown' && items.length) {
+			event.preventDefault();
+			select((selected + 1) % items.length);
+		} else if (event.key === 'ArrowUp' && items.length) {
+			event.preventDefault();
+			select((selected - 1 + items.length) % items.length);
+		} else if (event.key === 'Enter' && selected >= 0) {
+			event.preventDefault();
+			window.location = items[selected].href;
+		} else if (event.key === 'Escape') {
+			close();
+		}
+	});
+
+	// Let a click on a suggestion land before the list goes away
+	input.addEventListener('blur', () => setTimeout(close, 200));
+})();
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from tally_app.models import Country, Athlete, Team, Event, Medal, Discipline, Host
+from tally_app.models import Country, Athlete, Team, Event, Medal, Discipline, Host, MedalTally, ImportCheckpoint
 
 
 class CountryAdmin(admin.ModelAdmin):
@@ -7,17 +7,22 @@ class CountryAdmin(admin.ModelAdmin):
 
 
 class AthleteAdmin(admin.ModelAdmin):
-	list_display = ['id', 'displayName', 'disciplines', 'country']
+	list_display = ['id', 'displayName', 'disciplinesRaw', 'country']
+	filter_horizontal = ['disciplines']
+	raw_id_fields = ['events']
 
 
 class TeamAdmin(admin.ModelAdmin):
 	list_display = ['codeRaw', 'id', 'discipline', 'country']
+	raw_id_fields = ['athletes']
 
 
 class MedalAdmin(admin.ModelAdmin):
 	list_display = [
-		'rank', 'event', 'object_id', 'content_type', 'content_object'
+		'rank', 'event', 'winner'
 	]
+	list_select_related = ['event__discipline', 'athlete', 'team__country']
+	raw_id_fields = ['athlete', 'team']
 
 
 class DisciplineAdmin(admin.ModelAdmin):
@@ -32,6 +37,14 @@ class HostAdmin(admin.ModelAdmin):
 	list_display = ['id', 'name', 'season', 'location', 'year', 'startDate', 'endDate']
 
 
+class MedalTallyAdmin(admin.ModelAdmin):
+	list_display = ['country', 'host', 'gold', 'silver', 'bronze', 'total']
+
+
+class ImportCheckpointAdmin(admin.ModelAdmin):
+	list_display = ['filename', 'rowOffset', 'updated', 'fileHash']
+
+
 # Register your models here.
 admin.site.register(Country, CountryAdmin)
 admin.site.register(Athlete, AthleteAdmin)
@@ -40,3 +53,5 @@ admin.site.register(Event, EventAdmin)
 admin.site.register(Discipline, DisciplineAdmin)
 admin.site.register(Medal, MedalAdmin)
 admin.site.register(Host, HostAdmin)
+admin.site.register(MedalTally, MedalTallyAdmin)
+admin.site.register(ImportCheckpoint, ImportCheckpointAdmin)
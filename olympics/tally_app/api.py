@@ -0,0 +1,312 @@
+from functools import wraps
+
+from django.db.models import F, Prefetch, Sum
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from tally_app.models import Athlete, Country, Event, Host, Medal, OverallMedalTally
+from tally_app.listings import RANK_ORDER, get_country_medals, with_winners
+from tally_app.export import EXPORT_FORMATS, get_export_medals, iter_export
+from tally_app.page_cache import cache_page_per_dataset
+from tally_app.pagination import InvalidCursor, paginate_keyset
+from tally_app.tally import OVERALL_TALLY_ORDERINGS, get_overall_tally_page, get_tally_ordering
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+SEASONS = ('Summer', 'Winter')
+
+TALLY_FIELDS = ('country', 'code', 'iso', 'flag_url', 'gold', 'silver', 'bronze', 'total')
+HOST_FIELDS = ('slug', 'name', 'location', 'season', 'year', 'start_date', 'end_date')
+MEDAL_FIELDS = ('id', 'rank', 'date', 'country', 'event', 'discipline', 'host', 'winner')
+EVENT_FIELDS = ('id', 'name', 'gender', 'discipline', 'host', 'podium')
+
+
+class ApiError(Exception):
+
+	def __init__(self, message, status=400):
+		super().__init__(message)
+		self.status = status
+
+
+def api_view(view):
+	"""A read-only JSON endpoint, cached per dataset version, reporting errors as JSON too."""
+
+	@cache_page_per_dataset
+	@require_safe
+	@wraps(view)
+	def json_view(request, *args, **kwargs):
+		try:
+			return JsonResponse(view(request, *args, **kwargs))
+		except ApiError as e:
+			return JsonResponse({'error': str(e)}, status=e.status)
+		except InvalidCursor as e:
+			return JsonResponse({'error': str(e)}, status=400)
+		except Http404:
+			return JsonResponse({'error': 'Not found'}, status=404)
+
+	return json_view
+
+
+def get_page_size(request):
+	try:
+		pageSize = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+	except ValueError:
+		raise ApiError('limit must be a number')
+	if not 1 <= pageSize <= MAX_PAGE_SIZE:
+		raise ApiError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+	return pageSize
+
+
+def get_fields(request, available):
+	"""The fields asked for with ?fields=a,b (all of them by default), in the order of `available`."""
+	if not request.GET.get('fields'):
+		return available
+
+	fields = set(request.GET['fields'].split(','))
+	if unknown := fields - set(available):
+		raise ApiError(f'Unknown fields {", ".join(sorted(unknown))}, choose from {", ".join(available)}')
+	return tuple(field for field in available if field in fields)
+
+
+def get_season(request):
+	season = request.GET.get('season')
+	if season is not None and season not in SEASONS:
+		raise ApiError(f'season must be one of {", ".join(SEASONS)}')
+	return season
+
+
+def get_tally_sort(request):
+	sort = request.GET.get('sort', 'gold')
+	if sort not in OVERALL_TALLY_ORDERINGS:
+		raise ApiError(f'sort must be one of {", ".join(OVERALL_TALLY_ORDERINGS)}')
+	direction = request.GET.get('direction', 'desc')
+	if direction not in ('asc', 'desc'):
+		raise ApiError('direction must be asc or desc')
+	return sort, direction
+
+
+def get_page_url(request, cursorName, cursor):
+	if cursor is None:
+		return None
+	query = request.GET.copy()
+	query.pop('after', None)
+	query.pop('before', None)
+	query[cursorName] = cursor
+	return f'{request.path}?{query.urlencode()}'
+
+
+def paginate(request, queryset, ordering, serialize, available):
+	"""A page of serialized rows with links to the pages either side, as the API returns them."""
+	fields = get_fields(request, available)
+	page = paginate_keyset(queryset, ordering, get_page_size(request),
+		after=request.GET.get('after'), before=request.GET.get('before'))
+	return get_page_data(request, page, serialize, fields)
+
+
+def get_page_data(request, page, serialize, fields):
+	return {
+		'results': [select_fields(serialize(item), fields) for item in page],
+		'next': get_page_url(request, 'after', page.nextCursor),
+		'previous': get_page_url(request, 'before', page.previousCursor),
+	}
+
+
+def select_fields(data, fields):
+	return {field: data[field] for field in fields}
+
+
+def sum_tallies(countries):
+	"""Countries, filtered down to some of their tallies, with gold, silver, bronze and total summed over those."""
+	return countries.annotate(
+		country_id=F('fullName'),
+		gold=Sum('tallies__gold'),
+		silver=Sum('tallies__silver'),
+		bronze=Sum('tallies__bronze'),
+		total=Sum('tallies__total'),
+	)
+
+
+def serialize_tally(row):
+	# Rows are OverallMedalTallies, or Countries from sum_tallies()
+	country = row.country if isinstance(row, OverallMedalTally) else row
+	return {
+		'country': country.fullName,
+		'code': country.code,
+		'iso': country.iso,
+		'flag_url': country.flagURL,
+		'gold': row.gold,
+		'silver': row.silver,
+		'bronze': row.bronze,
+		'total': row.total,
+	}
+
+
+def serialize_host(host):
+	return {
+		'slug': host.slug,
+		'name': host.name,
+		'location': host.location,
+		'season': host.season,
+		'year': host.year,
+		'start_date': host.startDate.isoformat(),
+		'end_date': host.endDate.isoformat(),
+	}
+
+
+def serialize_winner(medal):
+	winner = medal.winner
+	if winner is None:
+		return None
+	return {
+		'type': 'athlete' if isinstance(winner, Athlete) else 'team',
+		'id': winner.pk,
+		'name': str(winner),
+	}
+
+
+def serialize_medal(medal):
+	event = medal.event
+	return {
+		'id': medal.id,
+		'rank': medal.rank,
+		'date': medal.date.isoformat() if medal.date else None,
+		'country': medal.country_id,
+		'event': {'id': event.id, 'name': event.name, 'gender': event.gender},
+		'discipline': {'code': event.discipline.code, 'name': event.discipline.name},
+		'host': {'slug': event.host.slug, 'name': event.host.name, 'year': event.host.year},
+		# Winners are only joined in when they're asked for
+		'winner': serialize_winner(medal) if Medal.athlete.is_cached(medal) else None,
+	}
+
+
+def serialize_event(event):
+	return {
+		'id': event.id,
+		'name': event.name,
+		'gender': event.gender,
+		'discipline': {'code': event.discipline.code, 'name': event.discipline.name},
+		'host': {'slug': event.host.slug, 'name': event.host.name, 'year': event.host.year},
+		'podium': [
+			{'rank': medal.rank, 'country': medal.country_id, 'winner': serialize_winner(medal)}
+			for medal in event.podium
+		] if hasattr(event, 'podium') else None,
+	}
+
+
+@api_view
+def tally(request):
+	"""The medal table over every Games (or every Games of a season)."""
+	sort, direction = get_tally_sort(request)
+	fields = get_fields(request, TALLY_FIELDS)
+
+	if (season := get_season(request)) is None:
+		page = get_overall_tally_page(sort, direction, pageSize=get_page_size(request),
+			after=request.GET.get('after'), before=request.GET.get('before'), withOffset=False)
+		return get_page_data(request, page, serialize_tally, fields)
+
+	countries = sum_tallies(Country.objects.filter(tallies__host__season=season))
+	return paginate(request, countries, get_tally_ordering(sort, direction), serialize_tally, TALLY_FIELDS)
+
+
+@api_view
+def host_tally(request, slug):
+	"""The medal table of one Games."""
+	host = get_object_or_404(Host, slug=slug)
+	sort, direction = get_tally_sort(request)
+
+	countries = sum_tallies(Country.objects.filter(tallies__host=host))
+	return paginate(request, countries, get_tally_ordering(sort, direction), serialize_tally, TALLY_FIELDS)
+
+
+@api_view
+def hosts(request):
+	"""Every Games, latest first."""
+	hosts = Host.objects.all()
+	if (season := get_season(request)) is not None:
+		hosts = hosts.filter(season=season)
+
+	return paginate(request, hosts, ['-year', '-id'], serialize_host, HOST_FIELDS)
+
+
+@api_view
+def country_medals(request, code):
+	"""A country's medals, latest Games first, filtered by season, host and discipline."""
+	country = get_object_or_404(Country, code=code)
+	fields = get_fields(request, MEDAL_FIELDS)
+
+	medals = get_country_medals(country).annotate(year=F('event__host__year'))
+	if (season := get_season(request)) is not None:
+		medals = medals.filter(event__host__season=season)
+	if 'host' in request.GET:
+		medals = medals.filter(event__host__slug=request.GET['host'])
+	if 'discipline' in request.GET:
+		medals = medals.filter(event__discipline_id=request.GET['discipline'])
+	if 'winner' in fields:
+		medals = with_winners(medals)
+
+	return paginate(request, medals, ['-year', '-id'], serialize_medal, MEDAL_FIELDS)
+
+
+def get_events(fields):
+	events = Event.objects.select_related('discipline', 'host')
+	if 'podium' in fields:
+		medals = with_winners(Medal.objects.order_by(RANK_ORDER, 'id'))
+		events = events.prefetch_related(Prefetch('medals', queryset=medals, to_attr='podium'))
+	return events
+
+
+@api_view
+def events(request):
+	"""Events and their podiums, filtered by season, host and discipline."""
+	fields = get_fields(request, EVENT_FIELDS)
+
+	events = get_events(fields)
+	if (season := get_season(request)) is not None:
+		events = events.filter(host__season=season)
+	if 'host' in request.GET:
+		events = events.filter(host__slug=request.GET['host'])
+	if 'discipline' in request.GET:
+		events = events.filter(discipline_id=request.GET['discipline'])
+
+	return paginate(request, events, ['id'], serialize_event, EVENT_FIELDS)
+
+
+@api_view
+def event(request, pk):
+	"""One event and its podium."""
+	fields = get_fields(request, EVENT_FIELDS)
+	return select_fields(serialize_event(get_object_or_404(get_events(fields), pk=pk)), fields)
+
+
+@require_safe
+def export_medals(request, format):
+	"""Stream every medal, with its winner, country, event, discipline and host, as CSV or NDJSON.
+
+	?gzip=1 sends it gzipped; ?season=, ?host=, ?discipline= and ?country= (a code) narrow it down.
+	"""
+	if format not in EXPORT_FORMATS:
+		return JsonResponse({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}, status=404)
+
+	medals = get_export_medals()
+	try:
+		if (season := get_season(request)) is not None:
+			medals = medals.filter(event__host__season=season)
+	except ApiError as e:
+		return JsonResponse({'error': str(e)}, status=e.status)
+	if 'host' in request.GET:
+		medals = medals.filter(event__host__slug=request.GET['host'])
+	if 'discipline' in request.GET:
+		medals = medals.filter(event__discipline_id=request.GET['discipline'])
+	if 'country' in request.GET:
+		medals = medals.filter(country__code=request.GET['country'])
+
+	compress = request.GET.get('gzip') in ('1', 'true')
+	filename = f'medals.{format}' + ('.gz' if compress else '')
+	response = StreamingHttpResponse(
+		iter_export(format, compress=compress, medals=medals),
+		content_type='application/gzip' if compress else EXPORT_FORMATS[format],
+	)
+	response['Content-Disposition'] = f'attachment; filename="{filename}"'
+	return response
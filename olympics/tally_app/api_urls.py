@@ -0,0 +1,15 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+	path('tally/', api.tally, name='tally'),
+	path('hosts/', api.hosts, name='hosts'),
+	path('hosts/<slug:slug>/tally/', api.host_tally, name='host_tally'),
+	path('countries/<slug:code>/medals/', api.country_medals, name='country_medals'),
+	path('events/', api.events, name='events'),
+	path('events/<int:pk>/', api.event, name='event'),
+	path('export/medals.<str:format>', api.export_medals, name='export_medals'),
+]
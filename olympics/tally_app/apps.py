@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TallyAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tally_app'
+
+    def ready(self):
+        # Keeps MedalTally in sync with Medal writes and the page cache with every change
+        from tally_app import signals
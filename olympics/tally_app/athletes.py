@@ -0,0 +1,116 @@
+import re
+import unicodedata
+from urllib.parse import urlparse
+
+from tally_app.models import Athlete
+
+
+GENDER_CODES = {
+	'male': 'M', 'men': 'M', 'm': 'M',
+	'female': 'W', 'women': 'W', 'w': 'W', 'f': 'W',
+	'mixed': 'X', 'x': 'X',
+}
+
+
+def get_gender_code(gender):
+	"""M, W or X for the gender spellings used across the datasets (O if unknown)."""
+	return GENDER_CODES.get(gender.strip().lower(), 'O')
+
+
+def normalize_athlete_name(name):
+	"""Case, accent, punctuation and word order insensitive form of a name.
+
+	"Marit BJOERGEN", "Bjoergen, Marit" and "marit  bjoergen" all normalize the same.
+	"""
+	name = unicodedata.normalize('NFKD', name)
+	name = ''.join(char for char in name if not unicodedata.combining(char)).casefold()
+	return ' '.join(sorted(re.findall(r'\w+', name)))
+
+
+def get_athlete_identity_key(name, countryCode):
+	"""Name and country, what a person is recognized by across the datasets.
+
+	Not the gender: the medal datasets only give the event's, and one person can win a Women's
+	and a Mixed event. AthleteIndex tells apart namesakes of different genders.
+	"""
+	return f'{normalize_athlete_name(name)}|{countryCode.upper()}'
+
+
+def is_same_gender(gender, otherGender):
+	"""Whether two genders (or event genders) can be the same person's: Mixed and Open events match either."""
+	codes = {get_gender_code(gender), get_gender_code(otherGender)}
+	return len(codes) == 1 or bool(codes & {'X', 'O'})
+
+
+def get_athlete_slug(url):
+	"""The last path segment of an athlete URL, e.g. 'marit-bjoergen' for https://olympics.com/en/athletes/marit-bjoergen."""
+	if not url:
+		return ''
+	return urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+
+
+class AthleteIndex:
+	"""In-memory lookup of existing Athletes by identity key and source slug.
+
+	All Athletes are loaded with a single query, after which every row of an import
+	resolves with dictionary hits. Athletes that aren't found are built (not saved)
+	and added to the index straight away, so repeated rows resolve to the same one;
+	save() writes them, along with slugs learned for existing athletes, in bulk.
+	"""
+
+	def __init__(self):
+		self.bySlug = None
+		self.byIdentity = None
+		self.new = []
+		self.slugUpdates = []
+
+	def load(self):
+		self.bySlug = {}
+		self.byIdentity = {}
+		for athlete in Athlete.objects.order_by('id').only('id', 'identityKey', 'sourceSlug', 'gender'):
+			self.add(athlete)
+
+	def add(self, athlete):
+		if athlete.sourceSlug:
+			self.bySlug.setdefault(athlete.sourceSlug, athlete)
+		if athlete.identityKey:
+			self.byIdentity.setdefault(athlete.identityKey, []).append(athlete)
+
+	def get(self, identityKey, slug='', gender=''):
+		if self.byIdentity is None:
+			self.load()
+
+		if slug and slug in self.bySlug:
+			return self.bySlug[slug]
+
+		for athlete in self.byIdentity.get(identityKey, []):
+			# Same name and country but a different athlete page, or a man and a woman: different people
+			if slug and athlete.sourceSlug and athlete.sourceSlug != slug:
+				continue
+			if is_same_gender(gender, athlete.gender):
+				return athlete
+		return None
+
+	def resolve(self, name, country, gender, url=''):
+		"""The Athlete for a medal row, building a new one if there isn't one yet."""
+		identityKey = get_athlete_identity_key(name, country.code)
+		slug = get_athlete_slug(url)
+
+		athlete = self.get(identityKey, slug, gender)
+		if athlete is None:
+			athlete = Athlete(name=name, gender=gender, country=country, identityKey=identityKey, sourceSlug=slug)
+			self.new.append(athlete)
+			self.add(athlete)
+		elif slug and not athlete.sourceSlug:
+			athlete.sourceSlug = slug
+			self.bySlug[slug] = athlete
+			if athlete.pk is not None:
+				self.slugUpdates.append(athlete)
+
+		return athlete
+
+	def save(self):
+		Athlete.objects.bulk_create(self.new)
+		Athlete.objects.bulk_update(self.slugUpdates, ['sourceSlug'])
+		self.new = []
+		self.slugUpdates = []
@@ -0,0 +1,349 @@
+import csv
+import json
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+
+from tally_app.models import Country, Discipline, Host
+from tally_app.flags import FlagResolver
+from tally_app.utils import QueryCounter
+
+
+DATA_DIR = Path(settings.BASE_DIR) / 'data'
+DATASET_DIR = DATA_DIR / 'paris_2024_olympic_summer_games'
+
+SYLLABLES = ['an', 'bo', 'ca', 'da', 'el', 'fi', 'go', 'ha', 'is', 'ju', 'ka', 'lo', 'ma', 'ne', 'or', 'pa', 'ri', 'sa', 'tu', 'va', 'yo', 'ze']
+EVENT_WORDS = ['Sprint', 'Relay', 'Individual', 'Pursuit', 'Freestyle', 'Team', 'Singles', 'Doubles', 'Slalom', 'Marathon']
+MEDAL_TYPES = ['Gold', 'Silver', 'Bronze']
+
+OLYMPIC_MEDALS_FIELDS = [
+	'discipline_title', 'slug_game', 'event_title', 'event_gender', 'medal_type', 'participant_type',
+	'participant_title', 'athlete_url', 'athlete_full_name', 'country_name', 'country_code', 'country_3_letter_code',
+]
+EVENTS_FIELDS = ['event', 'tag', 'sport', 'sport_code', 'sport_url']
+ATHLETES_FIELDS = [
+	'code', 'name', 'name_short', 'name_tv', 'gender', 'function', 'country_code', 'disciplines', 'events',
+	'birth_date', 'height', 'weight',
+]
+TEAMS_FIELDS = [
+	'code', 'current', 'team', 'team_gender', 'country_code', 'country', 'country_long', 'discipline', 'disciplines_code',
+	'events', 'athletes', 'coaches', 'athletes_codes', 'num_athletes', 'coaches_codes', 'num_coaches',
+]
+MEDALS_FIELDS = [
+	'medal_type', 'medal_code', 'medal_date', 'name', 'gender', 'discipline', 'event', 'event_type', 'url_event',
+	'code', 'country_code', 'country', 'country_long',
+]
+
+PARIS_HOST_ROW = {
+	'game_slug': 'paris-2024', 'game_end_date': '2024-08-11T21:00:00Z', 'game_start_date': '2024-07-26T17:30:00Z',
+	'game_location': 'France', 'game_name': 'Paris 2024', 'game_season': 'Summer', 'game_year': '2024',
+}
+
+
+def write_csv(filepath, fieldnames, rows):
+	with open(filepath, 'w', newline='') as file:
+		writer = csv.DictWriter(file, fieldnames=fieldnames)
+		writer.writeheader()
+		writer.writerows(rows)
+
+
+class SyntheticDataset:
+	"""Writes realistic, reproducible stand-ins for the Kaggle dataset files.
+
+	Every generated file has `numRows` rows and only refers to the given Disciplines,
+	Countries and Hosts, so the files import cleanly into a database seeded with them.
+	athletes.csv is generated as well since medals.csv refers to its athletes.
+	"""
+
+	def __init__(self, numRows, disciplines, countries, hosts, seed=2024):
+		self.numRows = numRows
+		self.disciplines = list(disciplines)
+		self.countries = list(countries)
+		self.hosts = [host for host in hosts if host.id != 'paris-2024']
+		self.rng = random.Random(seed)
+
+	def get_name(self, ii):
+		rng = random.Random(ii)
+		firstName = ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 3))).capitalize()
+		lastName = ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).upper()
+		return f'{firstName} {lastName}'
+
+	def get_country(self, ii):
+		return self.countries[ii % len(self.countries)]
+
+	def write(self, directory):
+		directory = Path(directory)
+		directory.mkdir(parents=True, exist_ok=True)
+		write_csv(directory / 'olympic_medals.csv', OLYMPIC_MEDALS_FIELDS, self.get_olympic_medals_rows())
+		write_csv(directory / 'events.csv', EVENTS_FIELDS, self.get_events_rows())
+		write_csv(directory / 'athletes.csv', ATHLETES_FIELDS, self.get_athletes_rows())
+		write_csv(directory / 'teams.csv', TEAMS_FIELDS, self.get_teams_rows())
+		write_csv(directory / 'medals.csv', MEDALS_FIELDS, self.get_medals_rows())
+		return directory
+
+	def get_olympic_medals_rows(self):
+		"""One event at a time: three medals, team medals having one row per team member."""
+		numAthletes = max(self.numRows // 3, 1)
+		numRows = 0
+		eventNumber = 0
+		while numRows < self.numRows:
+			eventNumber += 1
+			host = self.rng.choice(self.hosts)
+			discipline = self.rng.choice(self.disciplines)
+			gender = self.rng.choice(['Men', 'Women', 'Mixed'])
+			eventTitle = f'{self.rng.choice(EVENT_WORDS)} {eventNumber}'
+			teamSize = self.rng.choice([1, 1, 1, 2, 4])
+
+			for medalType in MEDAL_TYPES:
+				athletes = [self.rng.randrange(numAthletes) for _ in range(teamSize)]
+				country = self.get_country(athletes[0])
+				for athlete in athletes:
+					if numRows == self.numRows:
+						return
+					name = self.get_name(athlete)
+					numRows += 1
+					yield {
+						'discipline_title': discipline.name,
+						'slug_game': host.slug,
+						'event_title': eventTitle,
+						'event_gender': gender,
+						'medal_type': medalType.upper(),
+						'participant_type': 'Athlete' if teamSize == 1 else 'GameTeam',
+						'participant_title': country.fullName if teamSize > 1 else '',
+						'athlete_url': f"https://olympics.com/en/athletes/{name.lower().replace(' ', '-')}-{athlete}",
+						'athlete_full_name': name,
+						'country_name': country.fullName,
+						'country_code': country.iso,
+						'country_3_letter_code': country.code,
+					}
+
+	def get_event(self, ii):
+		discipline = self.disciplines[ii % len(self.disciplines)]
+		gender = ["Men's", "Women's", 'Mixed'][ii % 3]
+		return discipline, f'{gender} {EVENT_WORDS[ii % len(EVENT_WORDS)]} {ii}'
+
+	def get_events_rows(self):
+		for ii in range(self.numRows):
+			discipline, event = self.get_event(ii)
+			yield {
+				'event': event,
+				'tag': discipline.name.lower().replace(' ', '-'),
+				'sport': discipline.sport,
+				'sport_code': discipline.code,
+				'sport_url': f"https://olympics.com/en/paris-2024/sports/{discipline.name.lower().replace(' ', '-')}",
+			}
+
+	def get_athlete_code(self, ii):
+		return str(1_000_000 + ii)
+
+	def get_athletes_rows(self):
+		for ii in range(self.numRows):
+			name = self.get_name(ii)
+			discipline, event = self.get_event(ii)
+			yield {
+				'code': self.get_athlete_code(ii),
+				'name': name,
+				'name_short': name,
+				'name_tv': name,
+				'gender': 'Male' if ii % 2 else 'Female',
+				'function': 'Alternate Athlete' if ii % 20 == 0 else 'Athlete',
+				'country_code': self.get_country(ii).code,
+				'disciplines': f"['{discipline.name}']",
+				'events': f"['{event}']",
+				'birth_date': f'{1980 + ii % 25}-{1 + ii % 12:02d}-{1 + ii % 28:02d}',
+				'height': str(150 + ii % 50),
+				'weight': str(50 + ii % 60),
+			}
+
+	def get_team_code(self, ii):
+		"""<discipline><gender><8 char event><country><2-digit number>, the format of the official codes."""
+		discipline, event = self.get_event(ii)
+		return f'{discipline.code}{"MWX"[ii % 3]}E{ii:07d}{self.get_country(ii).code}01'
+
+	def get_teams_rows(self):
+		for ii in range(self.numRows):
+			discipline, event = self.get_event(ii)
+			country = self.get_country(ii)
+			members = [ii + jj for jj in range(3)]
+			yield {
+				'code': self.get_team_code(ii),
+				'current': 'True',
+				'team': country.fullName,
+				'team_gender': 'MWX'[ii % 3],
+				'country_code': country.code,
+				'country': country.fullName,
+				'country_long': country.fullName,
+				'discipline': discipline.name,
+				'disciplines_code': discipline.code,
+				'events': event,
+				'athletes': str([self.get_name(member) for member in members]),
+				'coaches': '',
+				'athletes_codes': str([self.get_athlete_code(member) for member in members]),
+				'num_athletes': f'{len(members)}.0',
+				'coaches_codes': '',
+				'num_coaches': '',
+			}
+
+	def get_medals_rows(self):
+		for ii in range(self.numRows):
+			# Spread the medals over the events three at a time
+			discipline, event = self.get_event(ii // 3)
+			winner = self.rng.randrange(self.numRows)
+			isTeam = self.rng.random() < 0.25
+			country = self.get_country(winner)
+			yield {
+				'medal_type': f'{MEDAL_TYPES[ii % 3]} Medal',
+				'medal_code': str(1 + ii % 3),
+				'medal_date': f'2024-{7 + ii % 2:02d}-{1 + ii % 28:02d}',
+				'name': country.fullName if isTeam else self.get_name(winner),
+				'gender': 'M',
+				'discipline': discipline.name,
+				'event': event,
+				'event_type': 'TEAM' if isTeam else 'ATH',
+				'url_event': f'/en/paris-2024/results/{ii // 3}',
+				'code': self.get_team_code(winner) if isTeam else self.get_athlete_code(winner),
+				'country_code': country.code,
+				'country': country.fullName,
+				'country_long': country.fullName,
+			}
+
+
+class Benchmark:
+	"""One import_olympic_data loader run over one file of a generated dataset.
+
+	`setup` lists (method, filename) loaders run beforehand, untimed, to import
+	what the file refers to.
+	"""
+
+	def __init__(self, name, method, filename, setup=()):
+		self.name = name
+		self.method = method
+		self.filename = filename
+		self.setup = tuple(setup)
+
+
+BENCHMARKS = [
+	Benchmark('olympic_medals', 'import_medals_all', 'olympic_medals.csv'),
+	Benchmark('olympic_medals_bulk', 'import_medals_all_bulk', 'olympic_medals.csv'),
+	Benchmark('events', 'import_events_paris2024', 'events.csv'),
+	Benchmark('teams', 'import_teams_paris2024', 'teams.csv'),
+	Benchmark('medals', 'import_medals_paris2024', 'medals.csv', setup=[
+		('import_events_paris2024', 'events.csv'),
+		('import_athletes_paris2024', 'athletes.csv'),
+		('import_teams_paris2024', 'teams.csv'),
+	]),
+]
+
+
+@contextmanager
+def use_database(filepath):
+	"""Point the default connection at another SQLite file for the duration of the block."""
+	originalName = connection.settings_dict['NAME']
+	connection.close()
+	connection.settings_dict['NAME'] = str(filepath)
+	try:
+		yield
+	finally:
+		connection.close()
+		connection.settings_dict['NAME'] = originalName
+
+
+def create_template_database(filepath, directory):
+	"""Migrate a new database and load the reference data every benchmark starts from."""
+	hostsPath = Path(directory) / 'olympic_hosts.csv'
+	with open(DATASET_DIR / 'olympic_hosts.csv', newline='') as file:
+		hostRows = list(csv.DictReader(file))
+	if not any(row['game_slug'] == PARIS_HOST_ROW['game_slug'] for row in hostRows):
+		hostRows.append(PARIS_HOST_ROW)
+	write_csv(hostsPath, list(PARIS_HOST_ROW), hostRows)
+
+	with use_database(filepath):
+		output = StringIO()
+		call_command('migrate', verbosity=0, stdout=output)
+		call_command('import_disciplines_data', str(DATA_DIR / 'summer_olympics_disciplines.csv'), stdout=output)
+		call_command('import_disciplines_data', str(DATA_DIR / 'winter_olympics_disciplines.csv'), stdout=output)
+		call_command('import_countries_data', str(DATA_DIR / 'countries.json'), offline=True, stdout=output)
+		get_command(output).import_hosts_all(hostsPath)
+
+		return list(Discipline.objects.order_by('code')), list(Country.objects.order_by('code')), list(Host.objects.order_by('id'))
+
+
+def get_command(stdout):
+	# Imported here to avoid a circular import: the command module imports this app's modules
+	from tally_app.management.commands.import_olympic_data import Command
+
+	command = Command(stdout=stdout, stderr=stdout)
+	command.flagResolver = FlagResolver(offline=True)
+	return command
+
+
+def run_benchmark(benchmark, datasetDir, databasePath, measureMemory=True):
+	"""Run a benchmark against databasePath and return its measurements."""
+	output = StringIO()
+	with use_database(databasePath):
+		command = get_command(output)
+		for method, filename in benchmark.setup:
+			getattr(command, method)(Path(datasetDir) / filename)
+
+		filepath = Path(datasetDir) / benchmark.filename
+		queryCounter = QueryCounter()
+		if measureMemory:
+			tracemalloc.start()
+
+		startTime = time.perf_counter()
+		with connection.execute_wrapper(queryCounter):
+			numRows = getattr(command, benchmark.method)(filepath)
+		elapsed = time.perf_counter() - startTime
+
+		peakMemory = None
+		if measureMemory:
+			peakMemory = tracemalloc.get_traced_memory()[1]
+			tracemalloc.stop()
+
+	return {
+		'benchmark': benchmark.name,
+		'rows': numRows,
+		'seconds': round(elapsed, 4),
+		'rowsPerSecond': round(numRows / elapsed, 1) if numRows and elapsed else None,
+		'queries': queryCounter.count,
+		'peakMemoryMB': round(peakMemory / 2**20, 2) if peakMemory is not None else None,
+		'failed': numRows is None,
+	}
+
+
+def compare_results(old, new, threshold=0.1):
+	"""Pair up the results of two runs by benchmark and size.
+
+	Returns a list of (key, oldResult, newResult, changes, isRegression) where
+	changes maps each measurement to its relative change. A benchmark regressed when
+	it got slower, or used more queries or memory, by more than `threshold`.
+	"""
+	def by_key(results):
+		return {(result['benchmark'], result['size']): result for result in results['results']}
+
+	oldResults = by_key(old)
+	newResults = by_key(new)
+	comparisons = []
+	for key in sorted(oldResults.keys() & newResults.keys()):
+		oldResult, newResult = oldResults[key], newResults[key]
+		changes = {}
+		for measurement in ('seconds', 'queries', 'peakMemoryMB'):
+			if oldResult.get(measurement) and newResult.get(measurement) is not None:
+				changes[measurement] = newResult[measurement] / oldResult[measurement] - 1
+
+		isRegression = newResult.get('failed', False) or any(change > threshold for change in changes.values())
+		comparisons.append((key, oldResult, newResult, changes, isRegression))
+
+	return comparisons
+
+
+def load_results(filepath):
+	with open(filepath) as file:
+		return json.load(file)
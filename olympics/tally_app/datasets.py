@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from zipfile import ZipFile
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from tally_app.ingest import get_file_hash
+
+
+DATASET_CACHE_DIR = Path(settings.BASE_DIR) / 'data' / '.dataset_cache'
+
+
+class DatasetUnavailable(Exception):
+	pass
+
+
+class KaggleBackend:
+	"""Fetches dataset files with the Kaggle API."""
+
+	def __init__(self):
+		# Imported here because importing kaggle reads credentials and prints warnings without them
+		from kaggle.api.kaggle_api_extended import KaggleApi
+
+		self.api = KaggleApi()
+		self.api.authenticate()
+
+	def get_version(self, dataset, filename):
+		"""A marker that changes whenever the file is replaced on Kaggle, or None if unknown."""
+		response = self.api.dataset_list_files(dataset)
+		for file in getattr(response, 'files', None) or []:
+			if getattr(file, 'name', None) == filename:
+				creationDate = getattr(file, 'creation_date', None) or getattr(file, 'creationDate', '')
+				size = getattr(file, 'total_bytes', None) or getattr(file, 'totalBytes', None) or getattr(file, 'size', '')
+				return f'{creationDate}:{size}'
+
+		return None
+
+	def download(self, dataset, filename, directory):
+		"""Download the file into `directory` and return its path."""
+		directory = Path(directory)
+		self.api.dataset_download_file(dataset, file_name=filename, path=directory, force=True)
+
+		# Unzip if it's a zip file
+		if (zipFilePath := directory / f'{filename}.zip').exists():
+			with ZipFile(zipFilePath) as zip:
+				zip.extractall(path=directory)
+
+			os.remove(zipFilePath)
+
+		return directory / filename
+
+
+class LocalBackend:
+	"""Serves dataset files from a local directory, standing in for Kaggle in tests."""
+
+	def __init__(self, directory):
+		self.directory = Path(directory)
+
+	def get_version(self, dataset, filename):
+		path = self.directory / filename
+		if not path.exists():
+			return None
+		stat = path.stat()
+		return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+	def download(self, dataset, filename, directory):
+		if not (self.directory / filename).exists():
+			raise DatasetUnavailable(f'{filename} is not in {self.directory}')
+		return Path(shutil.copy(self.directory / filename, Path(directory) / filename))
+
+
+class DatasetCache:
+	"""Content-addressed cache of downloaded dataset files.
+
+	Files are stored once under objects/<sha256>; index.json maps each dataset/filename
+	to the checksum and backend version it was last fetched at. fetch() only downloads
+	when the backend reports a different version, and never needs the network in
+	offline mode.
+	"""
+
+	def __init__(self, backend=None, cacheDir=DATASET_CACHE_DIR, offline=False):
+		self.backend = backend
+		self.cacheDir = Path(cacheDir)
+		self.offline = offline
+		self.indexPath = self.cacheDir / 'index.json'
+		self.index = self.load_index()
+
+	def load_index(self):
+		try:
+			with open(self.indexPath) as file:
+				return json.load(file)
+		except (OSError, json.JSONDecodeError):
+			return {}
+
+	def save_index(self):
+		self.cacheDir.mkdir(parents=True, exist_ok=True)
+		with open(self.indexPath, 'w') as file:
+			json.dump(self.index, file, indent=1, sort_keys=True)
+
+	def get_object_path(self, sha256):
+		return self.cacheDir / 'objects' / sha256
+
+	def get_cached(self, dataset, filename):
+		entry = self.index.get(f'{dataset}/{filename}')
+		if entry is not None and self.get_object_path(entry['sha256']).exists():
+			return entry
+		return None
+
+	def store(self, dataset, filename, filepath, version):
+		sha256 = get_file_hash(filepath)
+		objectPath = self.get_object_path(sha256)
+		if not objectPath.exists():
+			objectPath.parent.mkdir(parents=True, exist_ok=True)
+			shutil.copyfile(filepath, objectPath)
+
+		entry = self.index[f'{dataset}/{filename}'] = {'sha256': sha256, 'version': version, 'fetched': time.time()}
+		self.save_index()
+		return entry
+
+	def place(self, entry, destination):
+		"""Put the cached object at destination unless an identical file is already there."""
+		destination = Path(destination)
+		if destination.exists() and get_file_hash(destination) == entry['sha256']:
+			return
+		destination.parent.mkdir(parents=True, exist_ok=True)
+		shutil.copyfile(self.get_object_path(entry['sha256']), destination)
+
+	def fetch(self, dataset, filename, destination):
+		"""Make sure an up to date copy of dataset/filename is at destination.
+
+		Returns a short description of where the file came from.
+		"""
+		destination = Path(destination)
+		cached = self.get_cached(dataset, filename)
+
+		if self.offline:
+			if destination.exists():
+				return 'local copy (offline)'
+			if cached is not None:
+				self.place(cached, destination)
+				return 'cache (offline)'
+			raise DatasetUnavailable(f'{destination} does not exist and {dataset}/{filename} is not cached')
+
+		version = self.backend.get_version(dataset, filename)
+		if cached is not None and version is not None and cached['version'] == version:
+			self.place(cached, destination)
+			return 'cache (up to date)'
+
+		with tempfile.TemporaryDirectory() as directory:
+			downloadPath = self.backend.download(dataset, filename, directory)
+			entry = self.store(dataset, filename, downloadPath, version)
+
+		self.place(entry, destination)
+		return 'download'
+
+
+def get_dataset_backend():
+	"""Instantiate the backend named by the DATASET_BACKEND setting (Kaggle by default)."""
+	return import_string(getattr(settings, 'DATASET_BACKEND', 'tally_app.datasets.KaggleBackend'))()
@@ -0,0 +1,103 @@
+import csv
+import hashlib
+import json
+from pathlib import Path
+
+from tally_app.models import SourceRowFingerprint
+
+
+# Columns that identify a row of each source file. A row whose key is unchanged
+# but whose other fields differ is an update rather than a delete + insert.
+SOURCE_ROW_KEYS = {
+	'olympic_hosts.csv': ['game_slug'],
+	'olympic_medals.csv': [
+		'slug_game', 'discipline_title', 'event_title', 'event_gender', 'medal_type',
+		'participant_type', 'participant_title', 'athlete_url', 'athlete_full_name', 'country_3_letter_code',
+	],
+	'athletes.csv': ['code'],
+	'events.csv': ['sport_code', 'event'],
+	'medals.csv': ['discipline', 'event', 'medal_type', 'code'],
+	'teams.csv': ['code'],
+}
+
+
+def normalize_row(row):
+	return {column: (value or '').strip() for column, value in row.items() if column is not None}
+
+
+def get_row_key(filename, row):
+	row = normalize_row(row)
+	columns = SOURCE_ROW_KEYS.get(filename, sorted(row))
+	return hashlib.sha1('\x1f'.join(row.get(column, '') for column in columns).encode()).hexdigest()
+
+
+def get_row_fingerprint(row):
+	return hashlib.sha1(json.dumps(normalize_row(row), sort_keys=True).encode()).hexdigest()
+
+
+class Delta:
+	"""Which rows of a source file were inserted, updated or deleted since it was last imported."""
+
+	def __init__(self, filename, fingerprints, storedFingerprints):
+		self.filename = filename
+		self.fingerprints = fingerprints
+
+		newKeys, oldKeys = set(fingerprints), set(storedFingerprints)
+		self.inserted = newKeys - oldKeys
+		self.deleted = oldKeys - newKeys
+		self.updated = {key for key in newKeys & oldKeys if fingerprints[key] != storedFingerprints[key]}
+		self.numUnchanged = len(newKeys & oldKeys) - len(self.updated)
+
+	@property
+	def changed(self):
+		return self.inserted | self.updated
+
+	def includes(self, row):
+		return get_row_key(self.filename, row) in self.changed
+
+	def __str__(self):
+		return (
+			f'{self.filename}: {len(self.inserted)} to insert, {len(self.updated)} to update, '
+			f'{len(self.deleted)} to delete, {self.numUnchanged} unchanged'
+		)
+
+
+def compute_delta(filepath):
+	"""Fingerprint every row of a CSV and compare them with the fingerprints stored by the last import."""
+	filename = Path(filepath).name
+	fingerprints = {}
+	with open(filepath, newline='') as file:
+		for row in csv.DictReader(file):
+			fingerprints[get_row_key(filename, row)] = get_row_fingerprint(row)
+
+	storedFingerprints = dict(
+		SourceRowFingerprint.objects.filter(filename=filename).values_list('rowKey', 'fingerprint').iterator()
+	)
+	return Delta(filename, fingerprints, storedFingerprints)
+
+
+def save_fingerprints(filepath, delta, batchSize=1000):
+	"""Store the fingerprints of the rows that changed and return the stored data of the deleted rows."""
+	filename = Path(filepath).name
+	changed = delta.changed
+	newRows = []
+	with open(filepath, newline='') as file:
+		for row in csv.DictReader(file):
+			rowKey = get_row_key(filename, row)
+			if rowKey in changed:
+				newRows.append(SourceRowFingerprint(
+					filename=filename, rowKey=rowKey, fingerprint=delta.fingerprints[rowKey], data=normalize_row(row),
+				))
+
+			if len(newRows) >= batchSize:
+				SourceRowFingerprint.objects.bulk_create(newRows, update_conflicts=True,
+					unique_fields=['filename', 'rowKey'], update_fields=['fingerprint', 'data'])
+				newRows = []
+
+	SourceRowFingerprint.objects.bulk_create(newRows, update_conflicts=True,
+		unique_fields=['filename', 'rowKey'], update_fields=['fingerprint', 'data'])
+
+	deleted = SourceRowFingerprint.objects.filter(filename=filename, rowKey__in=delta.deleted)
+	deletedRows = [fingerprint.data for fingerprint in deleted]
+	deleted.delete()
+	return deletedRows
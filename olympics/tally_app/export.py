@@ -0,0 +1,118 @@
+import csv
+import json
+import zlib
+from itertools import batched
+
+from tally_app.models import Athlete, Medal, Team
+
+
+EXPORT_FORMATS = {
+	'csv': 'text/csv',
+	'ndjson': 'application/x-ndjson',
+}
+
+# All but the winner columns line up with MEDAL_VALUES
+EXPORT_COLUMNS = [
+	'medal_id', 'rank', 'date',
+	'country', 'country_code',
+	'host', 'host_year', 'season',
+	'discipline', 'discipline_code', 'event_id', 'event', 'event_gender',
+	'winner_type', 'winner_id', 'winner',
+]
+
+# Size of the pieces the export is streamed in, so lines aren't sent one at a time
+BLOCK_SIZE = 1 << 16
+
+
+def get_export_medals():
+	"""Every medal, in a stable order."""
+	return Medal.objects.order_by('id')
+
+
+# Read as plain tuples: building a Medal, Country, Event, Discipline and Host object for every
+# row would cost more than the rest of the export put together
+MEDAL_VALUES = [
+	'id', 'rank', 'date',
+	'country__fullName', 'country__code',
+	'event__host__slug', 'event__host__year', 'event__host__season',
+	'event__discipline__name', 'event__discipline__code', 'event_id', 'event__name', 'event__gender',
+	'athlete_id', 'team_id',
+]
+
+
+def get_winners(athleteIds, teamIds):
+	"""{('athlete', id) or ('team', id): name} for a batch of medal winners, a query per kind of winner."""
+	winners = {}
+	for winnerType, model, ids in [('athlete', Athlete, athleteIds), ('team', Team, teamIds)]:
+		if ids:
+			for winner in model.objects.select_related('country').filter(pk__in=ids):
+				winners[winnerType, winner.pk] = str(winner)
+
+	return winners
+
+
+def iter_export_rows(medals=None, chunkSize=2000):
+	"""Yield a dict of EXPORT_COLUMNS per medal.
+
+	Medals are read `chunkSize` at a time and each chunk's winners are looked up together,
+	so memory stays flat and the number of queries grows with the chunks, not the medals.
+	"""
+	medals = get_export_medals() if medals is None else medals
+	for chunk in batched(medals.values_list(*MEDAL_VALUES).iterator(chunk_size=chunkSize), chunkSize):
+		winners = get_winners({row[-2] for row in chunk if row[-2] is not None}, {row[-1] for row in chunk if row[-1] is not None})
+		for row in chunk:
+			winnerType, winnerId = ('athlete', row[-2]) if row[-2] is not None else ('team', row[-1])
+			yield {
+				**dict(zip(EXPORT_COLUMNS, row[:-2])),
+				'date': row[2].isoformat() if row[2] else None,
+				'winner_type': winnerType,
+				'winner_id': winnerId,
+				'winner': winners.get((winnerType, winnerId)),
+			}
+
+
+class Echo:
+	"""File-like object handing back what is written to it, for a csv.writer to format single lines."""
+
+	def write(self, value):
+		return value
+
+
+def iter_csv(rows):
+	writer = csv.writer(Echo())
+	yield writer.writerow(EXPORT_COLUMNS)
+	for row in rows:
+		yield writer.writerow(['' if row[column] is None else row[column] for column in EXPORT_COLUMNS])
+
+
+def iter_ndjson(rows):
+	for row in rows:
+		yield json.dumps(row, separators=(',', ':')) + '\n'
+
+
+def iter_blocks(lines, blockSize=BLOCK_SIZE):
+	"""Join lines of text into encoded blocks of about blockSize bytes."""
+	block, size = [], 0
+	for line in lines:
+		block.append(line)
+		size += len(line)
+		if size >= blockSize:
+			yield ''.join(block).encode()
+			block, size = [], 0
+	if block:
+		yield ''.join(block).encode()
+
+
+def iter_gzip(blocks):
+	compressor = zlib.compressobj(wbits=31)  # gzip container
+	for block in blocks:
+		if compressed := compressor.compress(block):
+			yield compressed
+	yield compressor.flush()
+
+
+def iter_export(format='csv', compress=False, medals=None, chunkSize=2000):
+	"""The export of `medals` (all of them by default) as a stream of bytes in `format`, optionally gzipped."""
+	formatRows = {'csv': iter_csv, 'ndjson': iter_ndjson}[format]
+	blocks = iter_blocks(formatRows(iter_export_rows(medals, chunkSize=chunkSize)))
+	return iter_gzip(blocks) if compress else blocks
@@ -0,0 +1,123 @@
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+
+
+FLAG_URL_TEMPLATE = "https://raw.githubusercontent.com/hampusborgos/country-flags/main/png250px/{iso}.png"
+MISSING_FLAG_URL = "https://upload.wikimedia.org/wikipedia/commons/2/2f/Missing_flag.png"
+
+SPECIFIC_FLAG_URLS_PATH = Path(settings.BASE_DIR) / 'data' / 'specific_flag_urls.csv'
+FLAG_CACHE_PATH = Path(settings.BASE_DIR) / 'data' / 'flag_url_cache.json'
+
+
+def load_specific_flag_urls(filepath=SPECIFIC_FLAG_URLS_PATH):
+	"""Return the hand-picked flag URLs from specific_flag_urls.csv keyed by IOC code."""
+	try:
+		with open(filepath, newline='') as file:
+			reader = csv.DictReader(file, skipinitialspace=True)
+			return {row['code']: row['url'] for row in reader}
+	except FileNotFoundError:
+		return {}
+
+
+class FlagResolver:
+	"""Resolves country flag URLs without ever prompting.
+
+	A country's flag is, in order of preference:
+		1. its entry in specific_flag_urls.csv (for historic teams whose ISO code maps to the wrong flag)
+		2. the country-flags PNG for its ISO code, if a HEAD request finds it
+		3. the missing-flag placeholder
+
+	HEAD results are stored in an on-disk JSON cache for `ttl` seconds so re-imports
+	skip the network. Candidates are checked concurrently on a thread pool that shares
+	one session whose connection pool is bounded to `maxWorkers` connections.
+	In offline mode no requests are made: cached results are used regardless of their
+	age and unchecked candidates are assumed to exist.
+	"""
+
+	def __init__(self, offline=False, cachePath=FLAG_CACHE_PATH, ttl=30 * 24 * 60 * 60, maxWorkers=8,
+			timeout=5, urlTemplate=FLAG_URL_TEMPLATE, specificFlagURLs=None):
+		self.offline = offline
+		self.cachePath = Path(cachePath) if cachePath else None
+		self.ttl = ttl
+		self.maxWorkers = maxWorkers
+		self.timeout = timeout
+		self.urlTemplate = urlTemplate
+		self.specificFlagURLs = load_specific_flag_urls() if specificFlagURLs is None else specificFlagURLs
+		self.cache = self.load_cache()
+
+	def load_cache(self):
+		if self.cachePath is None or not self.cachePath.exists():
+			return {}
+		try:
+			with open(self.cachePath) as file:
+				return json.load(file)
+		except (OSError, json.JSONDecodeError):
+			return {}
+
+	def save_cache(self):
+		if self.cachePath is None:
+			return
+		self.cachePath.parent.mkdir(parents=True, exist_ok=True)
+		with open(self.cachePath, 'w') as file:
+			json.dump(self.cache, file, indent=1, sort_keys=True)
+
+	def is_fresh(self, url):
+		entry = self.cache.get(url)
+		return entry is not None and (self.offline or time.time() - entry['checked'] < self.ttl)
+
+	def check_url(self, session, url):
+		try:
+			response = session.head(url, timeout=self.timeout)
+			return response.status_code == 200
+		except requests.RequestException:
+			return False
+
+	def check_urls(self, urls):
+		"""HEAD every url concurrently and record the results in the cache."""
+		session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=self.maxWorkers, pool_maxsize=self.maxWorkers)
+		session.mount('http://', adapter)
+		session.mount('https://', adapter)
+
+		with session, ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+			results = executor.map(lambda url: self.check_url(session, url), urls)
+			checkedAt = time.time()
+			for url, ok in zip(urls, results):
+				self.cache[url] = {'ok': ok, 'checked': checkedAt}
+
+	def resolve_many(self, countries):
+		"""Resolve flag URLs for an iterable of (IOC code, ISO code) pairs.
+
+		Returns a dictionary mapping each IOC code to its flag URL.
+		"""
+		candidates = {}
+		flagURLs = {}
+		for code, isoCode in countries:
+			if code in self.specificFlagURLs:
+				flagURLs[code] = self.specificFlagURLs[code]
+			elif isoCode:
+				candidates[code] = self.urlTemplate.format(iso=isoCode.lower())
+			else:
+				flagURLs[code] = MISSING_FLAG_URL
+
+		uncheckedURLs = sorted({url for url in candidates.values() if not self.is_fresh(url)})
+		if uncheckedURLs and not self.offline:
+			self.check_urls(uncheckedURLs)
+			self.save_cache()
+
+		for code, url in candidates.items():
+			entry = self.cache.get(url)
+			flagURLs[code] = url if entry is None or entry['ok'] else MISSING_FLAG_URL
+
+		return flagURLs
+
+	def resolve(self, code, isoCode):
+		return self.resolve_many([(code, isoCode)])[code]
@@ -0,0 +1,133 @@
+import csv
+import hashlib
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.db import transaction
+
+from tally_app.models import ImportCheckpoint
+
+
+class ChunkImportError(Exception):
+	"""Raised when a chunk fails. Every chunk before it has been committed."""
+
+	def __init__(self, firstRow, lastRow, error):
+		self.firstRow = firstRow
+		self.lastRow = lastRow
+		self.error = error
+		super().__init__(f'Error importing rows {firstRow}-{lastRow}: {error!r}')
+
+
+def get_file_hash(filepath):
+	"""SHA-256 of a file, read in blocks so large files aren't loaded into memory."""
+	digest = hashlib.sha256()
+	with open(filepath, 'rb') as file:
+		while block := file.read(1 << 20):
+			digest.update(block)
+
+	return digest.hexdigest()
+
+
+def count_rows(filepath):
+	with open(filepath, newline='') as file:
+		return max(sum(1 for _ in csv.reader(file)) - 1, 0)
+
+
+def iter_chunks(filepath, chunkSize, startRow=0):
+	"""Stream a CSV as lists of at most `chunkSize` row dictionaries, skipping the first `startRow` rows."""
+	with open(filepath, newline='') as file:
+		reader = csv.DictReader(file)
+		for _ in islice(reader, startRow):
+			pass
+
+		while rows := list(islice(reader, chunkSize)):
+			yield rows
+
+
+class ProgressReporter:
+	"""Keeps a single throughput / ETA line up to date on a command's stdout."""
+
+	def __init__(self, stdout, total=None, minInterval=0.5):
+		self.stdout = stdout
+		self.total = total
+		self.minInterval = minInterval
+		self.done = 0
+		self.startTime = time.perf_counter()
+		self.lastWrite = 0
+
+	@property
+	def elapsed(self):
+		return time.perf_counter() - self.startTime
+
+	@property
+	def rate(self):
+		return self.done / self.elapsed if self.elapsed else 0
+
+	def update(self, numRows, force=False):
+		self.done += numRows
+		if not force and time.perf_counter() - self.lastWrite < self.minInterval:
+			return
+
+		self.lastWrite = time.perf_counter()
+		line = f'{self.done} rows'
+		if self.total:
+			line = f'{self.done}/{self.total} rows ({100 * self.done / self.total:.0f}%)'
+		line += f', {self.rate:.0f} rows/sec'
+		if self.total and self.rate:
+			line += f', ETA {(self.total - self.done) / self.rate:.0f}s'
+
+		self.stdout.write(f'\r{line}', ending='')
+		self.stdout.flush()
+
+	def finish(self):
+		self.update(0, force=True)
+		self.stdout.write('')
+
+
+def ingest_csv(filepath, processChunk, chunkSize=1000, resume=False, progress=None, rowFilter=None):
+	"""Feed a CSV to `processChunk` in chunks of rows, committing each chunk atomically.
+
+	After every chunk a checkpoint (file hash + rows committed) is written in the same
+	transaction, so with `resume=True` a re-run of the same file skips every row that
+	was already committed. A changed file always starts again from the first row.
+	Only rows for which `rowFilter(row)` is true are passed on, if it is given.
+
+	Returns the number of rows processed by this run.
+	"""
+	filepath = Path(filepath)
+	fileHash = get_file_hash(filepath)
+
+	startRow = 0
+	if resume:
+		checkpoint = ImportCheckpoint.objects.filter(filename=filepath.name, fileHash=fileHash).first()
+		if checkpoint is not None:
+			startRow = checkpoint.rowOffset
+
+	if progress is not None:
+		progress.total = count_rows(filepath) - startRow
+
+	rowOffset = startRow
+	numProcessed = 0
+	for rows in iter_chunks(filepath, chunkSize, startRow=startRow):
+		selectedRows = rows if rowFilter is None else [row for row in rows if rowFilter(row)]
+		try:
+			with transaction.atomic():
+				if selectedRows:
+					processChunk(selectedRows)
+				ImportCheckpoint.objects.update_or_create(
+					filename=filepath.name,
+					defaults={'fileHash': fileHash, 'rowOffset': rowOffset + len(rows)},
+				)
+		except Exception as e:
+			raise ChunkImportError(rowOffset + 1, rowOffset + len(rows), e) from e
+
+		rowOffset += len(rows)
+		numProcessed += len(selectedRows)
+		if progress is not None:
+			progress.update(len(rows))
+
+	if progress is not None:
+		progress.finish()
+
+	return numProcessed
@@ -0,0 +1,40 @@
+from django.db.models import Case, When, IntegerField
+
+from tally_app.models import Medal
+
+
+# Gold, Silver, Bronze rather than alphabetical
+RANK_ORDER = Case(
+	When(rank=Medal.GOLD, then=0),
+	When(rank=Medal.SILVER, then=1),
+	When(rank=Medal.BRONZE, then=2),
+	default=3,
+	output_field=IntegerField(),
+)
+
+
+def get_country_medals(country, host=None):
+	"""A country's medals (at one Games, if given) with their event, discipline and host
+	joined in, ordered by discipline and then latest first.
+	"""
+	medals = Medal.objects.filter(country=country)
+	if host is not None:
+		medals = medals.filter(event__host=host)
+
+	return medals.select_related('event__discipline', 'event__host').order_by(
+		'event__discipline__name', '-date', 'event__name', RANK_ORDER,
+	)
+
+
+def group_by_discipline(medals):
+	"""{discipline: [medals]} in the order the medals come in."""
+	medalsPerDiscipline = {}
+	for medal in medals:
+		medalsPerDiscipline.setdefault(medal.event.discipline, []).append(medal)
+
+	return medalsPerDiscipline
+
+
+def with_winners(medals):
+	"""A Medal queryset whose medals come with their winners (and the winners' countries) joined in."""
+	return medals.select_related('athlete__country', 'team__country')
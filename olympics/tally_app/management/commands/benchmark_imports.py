@@ -0,0 +1,99 @@
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tally_app.benchmark import BENCHMARKS, SyntheticDataset, create_template_database, run_benchmark, compare_results, load_results
+
+
+class Command(BaseCommand):
+	help = "Benchmark the import_olympic_data loaders on generated datasets, or compare two benchmark results files"
+
+	def add_arguments(self, parser):
+		parser.add_argument('--sizes', type=int, nargs='+', default=[10_000],
+			help="Numbers of rows of the generated files, e.g. 10000 100000 1000000")
+		parser.add_argument('--benchmarks', nargs='+', choices=[benchmark.name for benchmark in BENCHMARKS],
+			help="Only run these benchmarks (default: all)")
+		parser.add_argument('--output', type=str, default='benchmark_results.json',
+			help="JSON file the results are written to")
+		parser.add_argument('--seed', type=int, default=2024,
+			help="Seed of the synthetic data generator")
+		parser.add_argument('--keep-data', type=str,
+			help="Write the generated datasets and databases to this directory instead of a temporary one")
+		parser.add_argument('--no-memory', action='store_true',
+			help="Don't trace memory allocations (they slow the loaders down)")
+		parser.add_argument('--compare', type=str, nargs=2, metavar=('OLD', 'NEW'),
+			help="Compare two results files instead of running the benchmarks")
+		parser.add_argument('--threshold', type=float, default=0.1,
+			help="Relative change in time, queries or memory counted as a regression by --compare")
+
+	def handle(self, *args, **options):
+		if options['compare']:
+			return self.compare(*options['compare'], threshold=options['threshold'])
+
+		benchmarks = [
+			benchmark for benchmark in BENCHMARKS
+			if not options['benchmarks'] or benchmark.name in options['benchmarks']
+		]
+
+		if options['keep_data']:
+			directory = Path(options['keep_data'])
+			directory.mkdir(parents=True, exist_ok=True)
+			self.run(benchmarks, directory, options)
+		else:
+			with tempfile.TemporaryDirectory() as directory:
+				self.run(benchmarks, Path(directory), options)
+
+	def run(self, benchmarks, directory, options):
+		templatePath = directory / 'template.sqlite3'
+		disciplines, countries, hosts = create_template_database(templatePath, directory)
+
+		results = []
+		for size in options['sizes']:
+			datasetDir = SyntheticDataset(size, disciplines, countries, hosts, seed=options['seed']).write(directory / f'dataset_{size}')
+			self.stdout.write(f'Generated {size} row dataset in {datasetDir}')
+
+			for benchmark in benchmarks:
+				databasePath = directory / f'{benchmark.name}_{size}.sqlite3'
+				shutil.copyfile(templatePath, databasePath)
+
+				result = run_benchmark(benchmark, datasetDir, databasePath, measureMemory=not options['no_memory'])
+				result['size'] = size
+				results.append(result)
+
+				style = self.style.ERROR if result['failed'] else self.style.SUCCESS
+				self.stdout.write(style(
+					f"{benchmark.name:<20} {size:>8} rows  {result['seconds']:9.2f}s  {result['rowsPerSecond'] or 0:9.0f} rows/sec  "
+					f"{result['queries']:>8} queries  {result['peakMemoryMB'] or 0:8.1f} MB"
+				))
+
+		with open(options['output'], 'w') as file:
+			json.dump({'created': datetime.now().isoformat(timespec='seconds'), 'results': results}, file, indent=1)
+
+		self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+	def compare(self, oldPath, newPath, threshold):
+		try:
+			comparisons = compare_results(load_results(oldPath), load_results(newPath), threshold=threshold)
+		except (OSError, ValueError, KeyError) as e:
+			raise CommandError(f'Could not compare {oldPath} and {newPath}: {e!r}')
+
+		numRegressions = 0
+		for (name, size), oldResult, newResult, changes, isRegression in comparisons:
+			line = f'{name:<20} {size:>8} rows  ' + '  '.join(
+				f'{measurement} {oldResult[measurement]} -> {newResult[measurement]} ({change:+.0%})'
+				for measurement, change in changes.items()
+			)
+			if isRegression:
+				numRegressions += 1
+				self.stdout.write(self.style.ERROR(line))
+			else:
+				self.stdout.write(line)
+
+		if numRegressions:
+			self.stdout.write(self.style.ERROR(f'{numRegressions} of {len(comparisons)} benchmarks regressed by more than {threshold:.0%}'))
+		else:
+			self.stdout.write(self.style.SUCCESS(f'No regressions in {len(comparisons)} benchmarks'))
@@ -0,0 +1,54 @@
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tally_app.export import EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+	help = "Export the full medal history, winners resolved, as CSV or NDJSON (optionally gzipped)"
+
+	def add_arguments(self, parser):
+		parser.add_argument('output', type=str,
+			help="File to write, or - for stdout. The format and compression follow its extension (.csv, .ndjson, .gz)")
+		parser.add_argument('--format', choices=EXPORT_FORMATS,
+			help="Format to write, if the file name doesn't say")
+		parser.add_argument('--gzip', action='store_true',
+			help="Gzip the output, if the file name doesn't end in .gz")
+		parser.add_argument('--chunk-size', type=int, default=2000,
+			help="Number of medals read, and winners resolved, at a time")
+		parser.add_argument('--memory', action='store_true',
+			help="Trace memory allocations and report the peak (slows the export down)")
+
+	def handle(self, *args, **options):
+		output = options['output']
+		compress = options['gzip'] or output.endswith('.gz')
+		format = options['format'] or output.removesuffix('.gz').rpartition('.')[2]
+		if format not in EXPORT_FORMATS:
+			raise CommandError(f'Could not tell the format of "{output}", pass --format')
+
+		startTime = time.perf_counter()
+		if options['memory']:
+			tracemalloc.start()
+		numBytes = 0
+		try:
+			file = sys.stdout.buffer if output == '-' else open(output, 'wb')
+			try:
+				for block in iter_export(format, compress=compress, chunkSize=options['chunk_size']):
+					file.write(block)
+					numBytes += len(block)
+			finally:
+				if file is not sys.stdout.buffer:
+					file.close()
+			peakMemory = tracemalloc.get_traced_memory()[1] if options['memory'] else None
+		finally:
+			tracemalloc.stop()
+
+		message = f'Successfully exported medals to {output} ({numBytes / 1e6:.1f} MB) in {time.perf_counter() - startTime:.2f}s'
+		if peakMemory is not None:
+			message += f', peak memory {peakMemory / 1e6:.1f} MB'
+		# Keep stdout for the export itself
+		report = self.stderr if output == '-' else self.stdout
+		report.write(self.style.SUCCESS(message))
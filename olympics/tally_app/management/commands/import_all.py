@@ -0,0 +1,110 @@
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from tally_app.flags import FlagResolver
+from tally_app.pipeline import Stage, StageResult, run_stages
+from tally_app.management.commands.import_olympic_data import Command as ImportOlympicDataCommand
+
+
+class Command(BaseCommand):
+	help = "Rebuild the database from the files in data/, running independent import stages concurrently"
+
+	def add_arguments(self, parser):
+		parser.add_argument('--data-dir', type=str, default='data',
+			help="Directory holding countries.json, the discipline CSVs and the dataset folder")
+		parser.add_argument('--dataset-dir', type=str, default='paris_2024_olympic_summer_games',
+			help="Folder inside --data-dir with the Kaggle dataset files")
+		parser.add_argument('--workers', type=int, default=4,
+			help="Maximum number of stages running at the same time")
+		parser.add_argument('--batch-size', type=int, default=1000,
+			help="Number of rows committed per transaction")
+		parser.add_argument('--offline', action='store_true',
+			help="Don't check flag URLs over the network")
+
+	def get_stages(self, options):
+		"""The import stages and the stages each one needs to have finished first.
+
+		hosts, disciplines and countries don't depend on anything; the Paris events,
+		teams and athletes need them; medals need everything they point to.
+		"""
+		dataDir = Path(options['data_dir'])
+		datasetDir = dataDir / options['dataset_dir']
+		flagResolver = FlagResolver(offline=options['offline'])
+		self.outputs = {}
+
+		def olympic_data(name, method, filename):
+			def run():
+				output = self.outputs[name] = StringIO()
+				command = ImportOlympicDataCommand(stdout=output, stderr=output)
+				command.flagResolver = flagResolver
+				command.batchSize = options['batch_size']
+				return getattr(command, method)(datasetDir / filename) is not None
+			return run
+
+		# A management command that fails raises CommandError, which fails its stage
+		def management_command(name, commandName, *args, **kwargs):
+			def run():
+				output = self.outputs[name] = StringIO()
+				call_command(commandName, *args, stdout=output, stderr=output, **kwargs)
+			return run
+
+		stages = [
+			Stage('hosts', olympic_data('hosts', 'import_hosts_all', 'olympic_hosts.csv')),
+			Stage('summer_disciplines', management_command(
+				'summer_disciplines', 'import_disciplines_data', str(dataDir / 'summer_olympics_disciplines.csv'))),
+			Stage('winter_disciplines', management_command(
+				'winter_disciplines', 'import_disciplines_data', str(dataDir / 'winter_olympics_disciplines.csv'))),
+			Stage('countries', management_command(
+				'countries', 'import_countries_data', str(dataDir / 'countries.json'), offline=options['offline'])),
+			Stage('events', olympic_data('events', 'import_events_paris2024', 'events.csv'),
+				dependencies=['hosts', 'summer_disciplines']),
+			# Athletes are linked to their disciplines and events, and teams to their athletes
+			Stage('athletes', olympic_data('athletes', 'import_athletes_paris2024', 'athletes.csv'),
+				dependencies=['countries', 'events', 'summer_disciplines']),
+			Stage('teams', olympic_data('teams', 'import_teams_paris2024', 'teams.csv'),
+				dependencies=['countries', 'athletes']),
+			Stage('olympic_medals', olympic_data('olympic_medals', 'import_medals_all_bulk', 'olympic_medals.csv'),
+				dependencies=['hosts', 'summer_disciplines', 'winter_disciplines', 'countries']),
+			Stage('medals', olympic_data('medals', 'import_medals_paris2024', 'medals.csv'),
+				dependencies=['events', 'athletes', 'teams']),
+		]
+
+		# Files that aren't there are left out, along with whatever needs them
+		missing = {
+			'athletes': datasetDir / 'athletes.csv',
+			'teams': datasetDir / 'teams.csv',
+			'events': datasetDir / 'events.csv',
+			'medals': datasetDir / 'medals.csv',
+			'olympic_medals': datasetDir / 'olympic_medals.csv',
+		}
+		missing = {name for name, path in missing.items() if not path.exists()}
+		for name in sorted(missing):
+			self.stdout.write(self.style.WARNING(f'No file for stage "{name}", leaving it out'))
+
+		return [
+			Stage(stage.name, stage.run, [name for name in stage.dependencies if name not in missing])
+			for stage in stages if stage.name not in missing
+		]
+
+	def handle(self, *args, **options):
+		stages = self.get_stages(options)
+		startTime = time.perf_counter()
+
+		def report(result):
+			style = self.style.SUCCESS if result.status == StageResult.OK else self.style.ERROR
+			self.stdout.write(style(str(result)))
+			if result.status == StageResult.FAILED and result.stage.name in self.outputs:
+				self.stdout.write(self.outputs[result.stage.name].getvalue().replace('\r', '\n').strip())
+
+		results = run_stages(stages, maxWorkers=options['workers'], onResult=report)
+
+		numFailed = sum(result.status != StageResult.OK for result in results)
+		elapsed = time.perf_counter() - startTime
+		if numFailed:
+			self.stdout.write(self.style.ERROR(f'{numFailed} of {len(results)} stages did not complete ({elapsed:.2f}s)'))
+		else:
+			self.stdout.write(self.style.SUCCESS(f'Imported all {len(results)} stages in {elapsed:.2f}s'))
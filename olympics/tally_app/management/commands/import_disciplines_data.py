@@ -1,5 +1,6 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from tally_app.models import Country, Athlete, Medal, Event, Discipline
+from tally_app.search import deferred_indexing
 
 
 class Command(BaseCommand):
@@ -12,7 +13,7 @@ class Command(BaseCommand):
 		filepath = options['filepath']
 
 		try:
-			with open(filepath, 'r') as file:
+			with open(filepath, 'r') as file, deferred_indexing():
 				file.readline()
 				for row in file.readlines():
 					sport, discipline, code = row.replace('\n', '').split(',')
@@ -40,4 +41,4 @@ class Command(BaseCommand):
 
 			self.stdout.write(self.style.SUCCESS(f'Successfully imported data from {filepath}'))
 		except FileNotFoundError:
-			self.stdout.write(self.style.ERROR(f'File "{filepath}" not found'))
+			raise CommandError(f'File "{filepath}" not found')
@@ -1,408 +1,613 @@
-import os
 from pathlib import Path
-from zipfile import ZipFile
 import csv
-import requests
+import time
 from datetime import date
 
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
-from django.contrib.contenttypes.models import ContentType
-from kaggle.api.kaggle_api_extended import KaggleApi
 
-from tally_app.models import Country, Athlete, Team, Medal, Event, Discipline, Host
-from tally_app.utils import fetch_medals_data
+from tally_app.models import Country, Athlete, Team, Medal, Event, Discipline, Host, SourceRowFingerprint
+from tally_app.utils import fetch_medals_data, QueryCounter
+from tally_app.flags import FlagResolver
+from tally_app.team_ids import TeamIdAllocator, get_team_id_prefix
+from tally_app.athletes import AthleteIndex, get_athlete_identity_key, get_athlete_slug
+from tally_app.rosters import ROSTER_HOST_ID, EventIndex, get_athlete_ids, get_discipline_ids, parse_names
+from tally_app.normalize import MedalsAllNormalizer
+from tally_app.page_cache import deferred_version_bump
+from tally_app.search import deferred_indexing
+from tally_app.tally import deferred_tallies, refresh_tallies
+from tally_app.ingest import ingest_csv, ChunkImportError, ProgressReporter
+from tally_app.delta import compute_delta, save_fingerprints
+from tally_app.datasets import DatasetCache, DatasetUnavailable, get_dataset_backend
 
 
 class Command(BaseCommand):
 	help = 'Update medals data from Kaggle API'
 
+	flagResolver = None
+	batchSize = 1000
+	resume = False
+	rowFilter = None
+
 	def add_arguments(self, parser):
 		parser.add_argument('dataset', type=str,
 			help='The Kaggle dataset indentifier.')
 		parser.add_argument('filename', type=str,
 			help='The file name within the dataset')
+		parser.add_argument('--bulk', action='store_true',
+			help='Resolve rows in memory and write them with batched bulk inserts (olympic_medals.csv only)')
+		parser.add_argument('--batch-size', type=int, default=1000,
+			help='Number of rows committed per transaction (and per bulk insert with --bulk)')
+		parser.add_argument('--resume', action='store_true',
+			help='Skip the rows a previous, interrupted import of the same file already committed')
+		parser.add_argument('--offline', action='store_true',
+			help="Don't use the network: import the file already in data/ (or the download cache) and don't check flag URLs")
+		parser.add_argument('--delta', action='store_true',
+			help='Only import the rows that were inserted, updated or deleted since the last import of the file')
+		parser.add_argument('--dry-run', action='store_true',
+			help='With --delta, only report how many rows would be inserted, updated and deleted')
 
 	def handle(self, *args, **options):
 		dataset = options['dataset']
 		filename = options['filename']
 		downloadPath = Path('data/paris_2024_olympic_summer_games')
 		filePath = downloadPath / filename
+		self.flagResolver = FlagResolver(offline=options['offline'])
+		self.batchSize = options['batch_size']
+		self.resume = options['resume']
 
-		# Initialize Kaggle API
-		api = KaggleApi()
-		api.authenticate()
-
-		# Download the dataset
-		api.dataset_download_file(dataset, file_name=filename, path=downloadPath, force=True)
-
-		# Unzip if it's a zip file
-		if (zipFilePath := Path(str(filePath) + '.zip')).exists():
-			with ZipFile(zipFilePath) as zip:
-				zip.extractall(path=downloadPath)
-
-			os.remove(zipFilePath)
+		# Fetch the dataset file, unless the cached copy is still current
+		try:
+			datasetCache = DatasetCache(
+				backend=None if options['offline'] else get_dataset_backend(),
+				offline=options['offline'],
+			)
+			source = datasetCache.fetch(dataset, filename, filePath)
+			self.stdout.write(f'Using {filePath} from {source}')
+		except DatasetUnavailable as e:
+			self.stdout.write(self.style.ERROR(str(e)))
+			return
 
 		# Check if file exists
 		if not filePath.exists():
 			self.stdout.write(self.style.ERROR(f'File {filePath} not found in the downloaded dataset'))
 
 		### Load file depending on what dataset it is
+		importFile = None
 		# 2024 Paris Olympics
 		if filename == 'athletes.csv':
-			self.import_athletes_paris2024(filePath)
+			importFile = self.import_athletes_paris2024
 		if filename == 'events.csv':
-			self.import_events_paris2024(filePath)
+			importFile = self.import_events_paris2024
 		if filename == 'medals.csv':
-			self.import_medals_paris2024(filePath)
+			importFile = self.import_medals_paris2024
 		if filename == 'teams.csv':
-			self.import_teams_paris2024(filePath)
+			importFile = self.import_teams_paris2024
 
 		# 1896–2022 Olympics
 		if filename == 'olympic_medals.csv':
-			self.import_medals_all(filePath)
+			importFile = self.import_medals_all_bulk if options['bulk'] else self.import_medals_all
 		if filename == 'olympic_hosts.csv':
-			self.import_hosts_all(filePath)
+			importFile = self.import_hosts_all
 
+		if importFile is None:
+			self.stdout.write(self.style.ERROR(f"Don't know how to import {filename}"))
+		elif options['delta']:
+			self.import_delta(filePath, importFile, dryRun=options['dry_run'])
+		else:
+			importFile(filePath)
 
-	def import_medals_all(self, filepath):
-		def handle_user_input(name, iso_code):
-			user_input = input(f"Custom flag URL for {name}? (leave blank to pass): ").strip()
 
-			return user_input if user_input else "https://upload.wikimedia.org/wikipedia/commons/2/2f/Missing_flag.png"
+	def get_flag_resolver(self):
+		if self.flagResolver is None:
+			self.flagResolver = FlagResolver()
+		return self.flagResolver
+
+	def ingest(self, filepath, processChunk):
+		"""Stream a CSV through processChunk(rows) in committed chunks and report the outcome.
 
+		Returns the number of rows imported, or None if the import failed.
+		"""
+		# Single saves leave the search index, the tallies and the dataset version alone, each is
+		# brought up to date once at the end. The version goes last, so no page is cached in between.
 		try:
-			with open(filepath, newline='') as file:
-				reader = csv.DictReader(file)
-				for row in reader:
-					print(row['country_name'])
-					print(row['country_3_letter_code'], '\n')
-					try:
-						country = Country.objects.get(code=row['country_3_letter_code'])
-
-					except Country.DoesNotExist:
-						print(row['country_name'])
-						print(row['country_3_letter_code'])
-
-						flagURL = f"https://raw.githubusercontent.com/hampusborgos/country-flags/main/png250px/{row['country_code'].lower()}.png"
-						try:
-							response = requests.head(flagURL)
-							if response.status_code != 200:
-								print(f"No flag found at {flagURL}. Status code: {response.status_code}")
-								flagURL = handle_user_input(row['country_name'], row['country_code'])
-
-						except requests.RequestException as e:
-							print(f"Error checking flag URL: {e}")
-							flagURL = handle_user_input(row['country_name'], row['country_code'])
-
-						country = Country.objects.create(code=row['country_3_letter_code'], fullName=row['country_name'], iso=row['country_code'], flagURL=flagURL)
-
-
-					eventName = row['event_title']
-					gender = row['event_gender']
-					#print(row['discipline_title'])
-					disciplineName = row['discipline_title']
-					if disciplineName == 'Volleyball':
-						disciplineName = 'Indoor Volleyball'
-					elif disciplineName == 'Baseball/Softball':
-						disciplineName = 'Baseball'
-
-					try:
-						discipline = Discipline.objects.get(name__iexact=disciplineName)
-					except ObjectDoesNotExist:
-						if disciplineName == 'Equestrian':
-							#print(f"{disciplineName} {eventName.split(' ')[0]}")
-							discipline = Discipline.objects.get(name=f"{disciplineName} {eventName.split(' ')[0]}")
-
-					year = int(row['slug_game'].split('-')[-1])
-
-					try:
-						host = Host.objects.get(slug=row['slug_game'])
-					except host.DoesNotExist:
-						self.stdout.write(self.style.ERROR(f'Host game does not exist for "{year}"'))
-
-					event, created = Event.objects.get_or_create(discipline=discipline, name=eventName, gender=gender, host=host)
-
-					if row['participant_type'] == 'Athlete':
-						winnerContentType = ContentType.objects.get_for_model(Athlete)
-						winner, created = Athlete.objects.get_or_create(
-							name=row['athlete_full_name'],
-							gender=gender,
-							country=country
+			with deferred_version_bump(), deferred_tallies(), deferred_indexing():
+				numRows = ingest_csv(filepath, processChunk, chunkSize=self.batchSize, resume=self.resume,
+					progress=ProgressReporter(self.stdout), rowFilter=self.rowFilter)
+		except FileNotFoundError:
+			self.stdout.write(self.style.ERROR(f'File "{filepath}" not found'))
+			return None
+		except ChunkImportError as e:
+			self.stdout.write('')
+			self.stdout.write(self.style.ERROR(
+				f'{e}\nRows before {e.firstRow} were committed, re-run with --resume to continue from there'
+			))
+			return None
+
+		self.stdout.write(self.style.SUCCESS(f'Successfully imported data from {filepath} ({numRows} rows)'))
+		return numRows
+
+	def ingest_rows(self, filepath, importRow):
+		"""ingest() for importers that write one row at a time."""
+		def processChunk(rows):
+			for row in rows:
+				importRow(row)
+
+		return self.ingest(filepath, processChunk)
+
+	def import_delta(self, filepath, importFile, dryRun=False):
+		"""Run importFile over only the rows that changed since the file was last imported.
+
+		Rows are matched up with the previous import by their key columns and compared by
+		fingerprint, so unchanged rows are never touched. Rows that disappeared from the
+		file are deleted from the database.
+		"""
+		delta = compute_delta(filepath)
+		self.stdout.write(str(delta))
+		if dryRun:
+			return
+
+		if delta.changed:
+			self.rowFilter = delta.includes
+			try:
+				numRows = importFile(filepath)
+			finally:
+				self.rowFilter = None
+
+			if numRows is None:
+				return
+
+		with transaction.atomic():
+			deletedRows = save_fingerprints(filepath, delta)
+			self.delete_rows(Path(filepath).name, deletedRows)
+
+		self.stdout.write(self.style.SUCCESS(f'Delta import of {filepath} complete'))
+
+	def delete_rows(self, filename, rows):
+		"""Delete what the given rows of a source file created, for rows removed from the file."""
+		if not rows:
+			return
+
+		deleteRow = {
+			'olympic_hosts.csv': lambda row: Host.objects.filter(id=row['game_slug']).delete(),
+			'athletes.csv': lambda row: Athlete.objects.filter(id=row['code']).delete(),
+			'teams.csv': lambda row: Team.objects.filter(codeRaw=row['code']).delete(),
+			'medals.csv': self.delete_medal_paris2024,
+			'olympic_medals.csv': self.delete_medal_all,
+		}.get(filename)
+
+		if deleteRow is None:
+			self.stdout.write(self.style.WARNING(f'Deleting rows of {filename} is not supported, {len(rows)} rows left in place'))
+			return
+
+		for row in rows:
+			deleteRow(row)
+
+	def delete_medal_all(self, row):
+		medals = Medal.objects.filter(
+			event__host__slug=row['slug_game'],
+			event__name=row['event_title'],
+			event__gender=row['event_gender'],
+			rank=row['medal_type'].capitalize(),
+			country__code=row['country_3_letter_code'],
+		)
+
+		if row['participant_type'] == 'Athlete':
+			athleteFilter = Q(identityKey=get_athlete_identity_key(row['athlete_full_name'], row['country_3_letter_code']))
+			if slug := get_athlete_slug(row['athlete_url']):
+				athleteFilter |= Q(sourceSlug=slug)
+			medals.filter(athlete__in=Athlete.objects.filter(athleteFilter)).delete()
+
+		# A team medal has one row per team member, so only delete it once none are left
+		elif not SourceRowFingerprint.objects.filter(
+			filename='olympic_medals.csv',
+			data__slug_game=row['slug_game'],
+			data__event_title=row['event_title'],
+			data__event_gender=row['event_gender'],
+			data__medal_type=row['medal_type'],
+			data__country_3_letter_code=row['country_3_letter_code'],
+		).exclude(data__participant_type='Athlete').exists():
+			medals.filter(team__isnull=False).delete()
+
+	def delete_medal_paris2024(self, row):
+		if 'ATH' in row['event_type']:
+			winner = {'athlete_id': row['code']}
+		else:
+			winner = {'team_id': f"{row['code'][:-2]}2024{row['code'][-2:]}"}
+
+		Medal.objects.filter(
+			event__host__year=2024,
+			event__name=row['event'],
+			rank=row['medal_type'].split(' Medal')[0],
+			**winner,
+		).delete()
+
+	def report_rejected(self, normalizer):
+		"""Report the rows the normalization stage couldn't resolve, grouped by reason."""
+		if not normalizer.rejected:
+			return
+
+		self.stdout.write(self.style.ERROR(f'{normalizer.numRejected} rows could not be resolved and were skipped:'))
+		for reason, count in normalizer.rejected.most_common():
+			self.stdout.write(self.style.ERROR(f'  {reason} ({count} rows)'))
+
+	def import_medals_all(self, filepath):
+		teamIdAllocator = TeamIdAllocator()
+		athleteIndex = AthleteIndex()
+		normalizer = MedalsAllNormalizer()
+
+		def import_row(row):
+			try:
+				country = Country.objects.get(code=row.country_code)
+
+			except Country.DoesNotExist:
+				flagURL = self.get_flag_resolver().resolve(row.country_code, row.country_iso)
+				country = Country.objects.create(code=row.country_code, fullName=row.country_name, iso=row.country_iso, flagURL=flagURL)
+
+			discipline = Discipline.objects.get(code=row.discipline_code)
+			event, created = Event.objects.get_or_create(discipline=discipline, name=row.event_name, gender=row.event_gender, host_id=row.host_id)
+
+			if row.participant_type == 'Athlete':
+				winnerField = 'athlete'
+				winner = athleteIndex.resolve(row.athlete_full_name, country, row.event_gender, row.athlete_url)
+				athleteIndex.save()
+
+			else:
+				winnerField = 'team'
+
+				# The CSV has one row per team member, every member's row goes to the Team of the team's medal
+				teamId = Medal.objects.filter(
+					event=event, country=country, rank=row.rank, team__isnull=False,
+				).values_list('team_id', flat=True).first()
+				if teamId is None:
+					teamIdPrefix = get_team_id_prefix(discipline.code, row.gender_code, row.event_name, country.code, row.year)
+					teamId = teamIdAllocator.next_id(teamIdPrefix)
+
+				winner, created = Team.objects.get_or_create(
+					id=teamId,
+					defaults=dict(
+						country=country,
+						gender=row.event_gender,
+						discipline=discipline,
+					)
+				)
+
+			Medal.objects.update_or_create(
+				country=country,
+				rank=row.rank,
+				event=event,
+				date=date(row.year, 1, 1),
+				**{winnerField: winner},
+			)
+
+		def import_chunk(rows):
+			for row in normalizer.normalize(rows).itertuples(index=False):
+				import_row(row)
+
+		numRows = self.ingest(filepath, import_chunk)
+		self.report_rejected(normalizer)
+		return numRows
+
+	def import_medals_all_bulk(self, filepath):
+		"""Bulk variant of import_medals_all.
+
+		Countries, Disciplines and existing Events/Athletes/Teams are loaded into
+		dictionaries once. Each chunk of rows goes through the normalization stage,
+		is resolved in memory and written with bulk inserts inside the chunk's
+		transaction.
+		"""
+		queryCounter = QueryCounter()
+		startTime = time.perf_counter()
+
+		with connection.execute_wrapper(queryCounter):
+			normalizer = MedalsAllNormalizer()
+			normalizer.load()
+			countries = {country.code: country for country in Country.objects.all()}
+			disciplines = Discipline.objects.in_bulk()
+			events = {
+				(event.discipline_id, event.name, event.gender, event.host_id): event
+				for event in Event.objects.all()
+			}
+			athleteIndex = AthleteIndex()
+			athleteIndex.load()
+
+			teamIdAllocator = TeamIdAllocator()
+			teamIdAllocator.load()
+
+			# The CSV has one row per team member, so every team medal resolves to one Team
+			teamIdsByMedal = {
+				((disciplineId, eventName, eventGender, hostId), countryId, rank): teamId
+				for disciplineId, eventName, eventGender, hostId, countryId, rank, teamId in Medal.objects.filter(
+					team__isnull=False
+				).values_list(
+					'event__discipline_id', 'event__name', 'event__gender', 'event__host_id', 'country_id', 'rank', 'team_id'
+				)
+			}
+
+			def import_chunk(rows):
+				newCountries, newEvents, newTeams = [], [], []
+				pendingMedals = []
+
+				for row in normalizer.normalize(rows).itertuples(index=False):
+					country = countries.get(row.country_code)
+					if country is None:
+						country = Country(
+							code=row.country_code,
+							fullName=row.country_name,
+							iso=row.country_iso,
 						)
+						countries[country.code] = country
+						newCountries.append(country)
 
-					else:
-						winnerContentType = ContentType.objects.get_for_model(Team)
+					discipline = disciplines[row.discipline_code]
+					eventKey = (discipline.code, row.event_name, row.event_gender, row.host_id)
+					event = events.get(eventKey)
+					if event is None:
+						event = Event(discipline=discipline, name=row.event_name, gender=row.event_gender, host_id=row.host_id)
+						events[eventKey] = event
+						newEvents.append(event)
 
-						if gender == "Women": genderCode = 'W'
-						elif gender == "Men": genderCode = 'M'
-						elif gender == "Mixed": genderCode = 'X'
-						else: genderCode = 'O'
+					rank = row.rank
 
-						eventCode = eventName[:8].ljust(8, '-')
+					if row.participant_type == 'Athlete':
+						winnerField = 'athlete'
+						winner = athleteIndex.resolve(row.athlete_full_name, country, row.event_gender, row.athlete_url)
 
-						teamIdPrefix = f'{discipline.code}{genderCode}{eventCode}{country.code}{year}'
-						existingTeams = Team.objects.filter(id__startswith=teamIdPrefix).order_by('-id')
+					else:
+						winnerField = 'team'
 
-						if existingTeams.exists():
-							# Extract the latest team number and increment it
-							latestTeam = existingTeams.first()
-							latestTeamNumber = int(latestTeam.id[-6:-4])  # Get the last two characters as an integer
-							newTeamNumber = latestTeamNumber + 1
-							teamNumberCode = f"{newTeamNumber:02d}"  # Format as 2 digits
+						teamKey = (eventKey, country.pk, rank)
+						if teamKey in teamIdsByMedal:
+							winner = Team(id=teamIdsByMedal[teamKey])
 						else:
-							teamNumberCode = '01'
-
-						teamId = f'{teamIdPrefix}{teamNumberCode}'.upper()
-						
-						winner, created = Team.objects.get_or_create(
-							id=teamId,
-							defaults=dict(
+							teamIdPrefix = get_team_id_prefix(discipline.code, row.gender_code, row.event_name, country.code, row.year)
+							winner = Team(
+								id=teamIdAllocator.next_id(teamIdPrefix),
 								country=country,
-								gender=gender,
-								discipline=discipline,
+								gender=row.event_gender,
+								discipline=discipline.name,
 							)
-						)
-
-					Medal.objects.update_or_create(
-						country=country,
-						rank=row['medal_type'].capitalize(),
-						event=event,
-						content_type=winnerContentType,
-						object_id=winner.id,
-						date=date(year, 1, 1),
+							teamIdsByMedal[teamKey] = winner.id
+							newTeams.append(winner)
+
+					pendingMedals.append((country, rank, event, winnerField, winner, date(row.year, 1, 1)))
+
+				flagURLs = self.get_flag_resolver().resolve_many((country.code, country.iso) for country in newCountries)
+				for country in newCountries:
+					country.flagURL = flagURLs[country.code]
+
+				Country.objects.bulk_create(newCountries)
+				Event.objects.bulk_create(newEvents)
+				athleteIndex.save()
+				Team.objects.bulk_create(newTeams, ignore_conflicts=True)
+
+				# Primary keys of the new parents are only known now, so build the medals last.
+				# Keyed on the unique constraints so a repeated row can't upsert the same medal twice.
+				medalsByWinnerField = {'athlete': {}, 'team': {}}
+				for country, rank, event, winnerField, winner, medalDate in pendingMedals:
+					medal = Medal(country=country, rank=rank, event=event, date=medalDate, **{winnerField: winner})
+					medalsByWinnerField[winnerField][(event.pk, rank, winner.pk)] = medal
+
+				# An athlete's and a team's medal are told apart by different constraints
+				for winnerField, medals in medalsByWinnerField.items():
+					Medal.objects.bulk_create(
+						medals.values(),
+						update_conflicts=True,
+						unique_fields=['event', 'rank', winnerField],
+						update_fields=['country', 'date'],
 					)
-
-			self.stdout.write(self.style.SUCCESS(f'Successfully imported data from {filepath}'))
-		except FileNotFoundError:
-			self.stdout.write(self.style.ERROR(f'File "{filepath}" not found'))
+				# bulk_create doesn't send the signals that keep the tallies up to date
+				refresh_tallies({
+					(medal.country_id, medal.event.host_id)
+					for medals in medalsByWinnerField.values() for medal in medals.values()
+				})
+
+			numRows = self.ingest(filepath, import_chunk)
+
+		self.report_rejected(normalizer)
+		if numRows is None:
+			return None
+
+		numSkipped = normalizer.numRejected
+		elapsed = time.perf_counter() - startTime
+		self.stdout.write(self.style.SUCCESS(
+			f'{numRows - numSkipped} rows imported ({numSkipped} skipped) in {elapsed:.2f}s, '
+			f'{numRows / elapsed if elapsed else 0:.0f} rows/sec, {queryCounter.count} queries'
+		))
+		return numRows
 
 	def import_hosts_all(self, filepath):
-		try:
-			with open(filepath, newline='') as file:
-				reader = csv.DictReader(file)
-				for row in reader:
-					Host.objects.update_or_create(
-						id=row['game_slug'],
-						name=row['game_name'],
-						slug=row['game_slug'],
-						location=row['game_location'],
-						season=row['game_season'],
-						year=row['game_year'],
-						startDate=row['game_start_date'],
-						endDate=row['game_end_date'],
-					)
-
-			self.stdout.write(self.style.SUCCESS(f'Successfully imported data from {filepath}'))
-		except FileNotFoundError:
-			self.stdout.write(self.style.ERROR(f'File "{filepath}" not found'))
-		except:
-			self.stdout.write(self.style.ERROR(f'Unknown error with the following row:\n{row}'))
+		def import_row(row):
+			Host.objects.update_or_create(
+				id=row['game_slug'],
+				defaults={
+					'name': row['game_name'],
+					'slug': row['game_slug'],
+					'location': row['game_location'],
+					'season': row['game_season'],
+					'year': row['game_year'],
+					'startDate': row['game_start_date'],
+					'endDate': row['game_end_date'],
+				}
+			)
+
+		return self.ingest_rows(filepath, import_row)
 
 	def import_teams_paris2024(self, filepath):
 		year = 2024
+		teamIdAllocator = TeamIdAllocator()
+
+		def import_row(row):
+			country, created = Country.objects.get_or_create(code=row['country_code'], defaults={'fullName': row['country']})
+
+			if row['current'] == 'True':
+				teamId = f"{row['code'][:-2]}{year}{row['code'][-2:]}"
+
+				disciplineCode = row['code'][0:3]
+				genderCode = row['code'][3]
+				eventCode = row['code'][4:12].replace('-', '')
+				countryCode = row['code'][12:15]
+				teamNumberCode = row['code'][15:17]
+
+			else:
+				disciplineCode = row['disciplines_code']
+				genderCode = row['team_gender']
+				if row['events']:
+					if "Women's" in row['events']:
+						eventName = row['events'].split("Women's ")[-1]
+					elif "Men's" in row['events']:
+						eventName = row['events'].split("Men's ")[-1]
+					elif "Mixed" in row['events']:
+						eventName = row['events'].split("Mixed ")[-1]
+					else:
+						eventName = row['events']
+				else:
+					eventName = row['discipline']
+
+				countryCode = row['country_code']
+
+				teamIdPrefix = get_team_id_prefix(disciplineCode, genderCode, eventName, countryCode, year)
+				teamId = teamIdAllocator.next_id(teamIdPrefix)
+
+			numAthletes = 0 if row['num_athletes'] == '' else int(float(row['num_athletes']))
+			team, created = Team.objects.update_or_create(
+				id=teamId,
+				defaults={
+					'country': country,
+					'gender': row['team_gender'],
+					'discipline': row['discipline'],
+					'athleteNames': row['athletes'],
+					'athleteIDs': row['athletes_codes'],
+					'numAthletes': numAthletes,
+					'codeRaw': row['code'],
+				}
+			)
+			# Members are linked once they've been imported, import athletes first
+			team.athletes.set(Athlete.objects.filter(id__in=get_athlete_ids(parse_names(row['athletes_codes']))))
+
+		# Reserve the official team codes first so generated IDs never collide with them
 		try:
 			with open(filepath, newline='') as file:
-				reader = csv.DictReader(file)
-				for row in reader:
-					country, created = Country.objects.get_or_create(code=row['country_code'], defaults={'fullName': row['country']})
-					
+				for row in csv.DictReader(file):
 					if row['current'] == 'True':
-						teamId = f"{row['code'][:-2]}{year}{row['code'][-2:]}"
-
-						disciplineCode = row['code'][0:3]
-						genderCode = row['code'][3]
-						eventCode = row['code'][4:12].replace('-', '')
-						countryCode = row['code'][12:15]
-						teamNumberCode = row['code'][15:17]
-
-					else:
-						disciplineCode = row['disciplines_code']
-						genderCode = row['team_gender']
-						if row['events']:
-							if "Women's" in row['events']:
-								eventName = row['events'].split("Women's ")[-1]
-							elif "Men's" in row['events']:
-								eventName = row['events'].split("Men's ")[-1]
-							elif "Mixed" in row['events']:
-								eventName = row['events'].split("Mixed ")[-1]
-							else:
-								eventName = row['events']
-						else:
-							eventName = row['discipline']
-
-						eventCode = eventName[:8].ljust(8, '-')
-						countryCode = row['country_code']
-
-						teamIdPrefix = f'{disciplineCode}{genderCode}{eventCode}{countryCode}{year}'
-						existingTeams = Team.objects.filter(id__startswith=teamIdPrefix).order_by('-id')
-
-						if existingTeams.exists():
-							# Extract the latest team number and increment it
-							latestTeam = existingTeams.first()
-							latestTeamNumber = int(latestTeam.id[-2:])  # Get the last two characters as an integer
-							newTeamNumber = latestTeamNumber + 1
-							teamNumberCode = f"{newTeamNumber:02d}"  # Format as 2 digits
-						else:
-							teamNumberCode = '01'
-
-						teamId = f'{teamIdPrefix}{teamNumberCode}'.upper()
-
-					numAthletes = 0 if row['num_athletes'] == '' else int(float(row['num_athletes']))
-					Team.objects.update_or_create(
-						id=teamId,
-						defaults={
-							'country': country,
-							'gender': row['team_gender'],
-							'discipline': row['discipline'],
-							'athleteNames': row['athletes'],
-							'athleteIDs': row['athletes_codes'],
-							'numAthletes': numAthletes,
-							'codeRaw': row['code'],
-						}
-					)
-
-			self.stdout.write(self.style.SUCCESS(f'Successfully imported data from {filepath}'))
+						teamIdAllocator.reserve(f"{row['code'][:-2]}{year}{row['code'][-2:]}")
 		except FileNotFoundError:
-			self.stdout.write(self.style.ERROR(f'File "{filepath}" not found'))
-		except:
-			self.stdout.write(self.style.ERROR(f'Unknown error with the following row:\n{row}'))
-
-
-	def import_events_paris2024(self, filepath):
-		try:
-			with open(filepath, newline='') as file:
-				reader = csv.DictReader(file)
-				for row in reader:
-
-					sport = row['sport']
-					if "Men" in row['event'] or 'Boy' in row['event']:
-						gender = 'M'
-						name = row['event'].replace('Men', '').replace("'s", "").strip()
-					elif "Women" in row['event'] or "Girl" in row['event']:
-						gender = 'W'
-						name = row['event'].replace('Women', '').replace("'s", "").strip()
-					elif "Mixed" in row['event']:
-						gender = 'X'
-						name = row['event'].replace('Mixed', '').strip()
-					elif sport in ['Artistic Swimming', 'Rhythmic Gymnastics']:
-						name = row['event']
-						gender = 'W'
-					elif sport == 'Equestrian':
-						name = row['event']
-						gender = 'O'
-					else:
-						self.stdout.write(self.style.ERROR(f"Event {row['event']} can't be coerced into GENDER / EVENTNAME"))
+			pass
 
-					try:
-						discipline = Discipline.objects.get(code=row['sport_code'])
+		return self.ingest_rows(filepath, import_row)
 
-					except ObjectDoesNotExist:
-						print(sport)
-						if sport== 'Equestrian':
-							print(f"{sport} {row['event'].split(' ')[0]}")
-							discipline = Discipline.objects.get(name=f"{sport} {row['event'].split(' ')[0]}")
-						else:
-							print(f'Discipline {row['sport_code']} does not exist')
-							discipline = Discipline.objects.get_or_create(code='OTH')
 
-					event, created = Event.objects.update_or_create(
-						discipline=discipline,
-						name=name,
-						gender=gender,
-						host=Host.objects.get(id='paris-2024')
-					)
-
-			self.stdout.write(self.style.SUCCESS(f'Successfully imported data from {filepath}'))
-		except FileNotFoundError:
-			self.stdout.write(self.style.ERROR(f'File "{filepath}" not found'))
+	def import_events_paris2024(self, filepath):
+		def import_row(row):
+			sport = row['sport']
+			if "Men" in row['event'] or 'Boy' in row['event']:
+				gender = 'M'
+				name = row['event'].replace('Men', '').replace("'s", "").strip()
+			elif "Women" in row['event'] or "Girl" in row['event']:
+				gender = 'W'
+				name = row['event'].replace('Women', '').replace("'s", "").strip()
+			elif "Mixed" in row['event']:
+				gender = 'X'
+				name = row['event'].replace('Mixed', '').strip()
+			elif sport in ['Artistic Swimming', 'Rhythmic Gymnastics']:
+				name = row['event']
+				gender = 'W'
+			elif sport == 'Equestrian':
+				name = row['event']
+				gender = 'O'
+			else:
+				self.stdout.write(self.style.ERROR(f"Event {row['event']} can't be coerced into GENDER / EVENTNAME"))
+
+			try:
+				discipline = Discipline.objects.get(code=row['sport_code'])
+
+			except ObjectDoesNotExist:
+				if sport== 'Equestrian':
+					discipline = Discipline.objects.get(name=f"{sport} {row['event'].split(' ')[0]}")
+				else:
+					self.stdout.write(self.style.ERROR(f'Discipline {row['sport_code']} does not exist'))
+					discipline = Discipline.objects.get_or_create(code='OTH')
+
+			event, created = Event.objects.update_or_create(
+				discipline=discipline,
+				name=name,
+				gender=gender,
+				host=Host.objects.get(id='paris-2024')
+			)
+
+		return self.ingest_rows(filepath, import_row)
 
 
 	def import_medals_paris2024(self, filepath):
 		year = 2024
 		host = Host.objects.get(year=year)
-		try:
-			with open(filepath, newline='') as file:
-				reader = csv.DictReader(file)
-				for row in reader:
-					country, created = Country.objects.get_or_create(code=row['country_code'])
-
-					# Make sure the event exists
-					split = row['event'].split("'s ")
-					if len(split) == 1:
-						name = split[0]
-						gender = 'Mixed'
-					elif len(split) == 2:
-						name = split[1]
-						gender = split[0]
-					else:
-						self.stdout.write(self.style.ERROR(f"Event {row['event']} can't be coerced into GENDER / EVENTNAME"))
-
-					print(row['discipline'])
-					try:
-						discipline = Discipline.objects.get(name=row['discipline'])
-					except ObjectDoesNotExist:
-						if row['discipline'] == 'Equestrian':
-							print(f"{row['discipline']} {row['event'].split(' ')[0]}")
-							discipline = Discipline.objects.get(name=f"{row['discipline']} {row['event'].split(' ')[0]}")
-
-					print(discipline)
-					event, created = Event.objects.get_or_create(name=row['event'], discipline=discipline, gender=gender, host=host)
-
-					if 'ATH' in row['event_type']:
-						winnerContentType = ContentType.objects.get_for_model(Athlete)
-						winner = Athlete.objects.get(id=row['code'])
-					else:
-						winnerContentType = ContentType.objects.get_for_model(Team)
-						winner = Team.objects.get(id=f"{row['code'][:-2]}{year}{row['code'][-2:]}")
 
-					Medal.objects.update_or_create(
-						country=country,
-						rank=row['medal_type'].split(' Medal')[0],
-						event=event,
-						content_type=winnerContentType,
-						object_id=winner.id,
-						defaults={'date': row['medal_date']},
-					)
+		def import_row(row):
+			country, created = Country.objects.get_or_create(code=row['country_code'])
 
-			self.stdout.write(self.style.SUCCESS(f'Successfully imported data from {filepath}'))
-		except FileNotFoundError:
-			self.stdout.write(self.style.ERROR(f'File "{filepath}" not found'))
+			# Make sure the event exists
+			split = row['event'].split("'s ")
+			if len(split) == 1:
+				name = split[0]
+				gender = 'Mixed'
+			elif len(split) == 2:
+				name = split[1]
+				gender = split[0]
+			else:
+				self.stdout.write(self.style.ERROR(f"Event {row['event']} can't be coerced into GENDER / EVENTNAME"))
 
-		#except:	
-			#self.stdout.write(self.style.ERROR(f'Unknown error with the following row:\n{row}'))
+			try:
+				discipline = Discipline.objects.get(name=row['discipline'])
+			except ObjectDoesNotExist:
+				if row['discipline'] == 'Equestrian':
+					discipline = Discipline.objects.get(name=f"{row['discipline']} {row['event'].split(' ')[0]}")
 
+			event, created = Event.objects.get_or_create(name=row['event'], discipline=discipline, gender=gender, host=host)
 
-	def import_athletes_paris2024(self, filepath):
-		try:
-			with open(filepath, newline='') as file:
-				reader = csv.DictReader(file)
-				for row in reader:
-					print(row['country_code'])
-				
-					country = Country.objects.get(code=row['country_code'])
-
-					print(country)
-					#self.stdout.write(self.style.SUCCESS(f'Country {country.fullName} created or found'))
-					Athlete.objects.update_or_create(
-							id = row['code'],
-							name = row['name'],
-							shortName = row['name_short'],
-							displayName = row['name_tv'],
-							gender = row['gender'],
-							country = country,
-							disciplines = row['disciplines'],
-							events = row['events'],
-							dob=row['birth_date'],
-							height=row['height'] if row['height'] != '' else 0.0,
-							weight=row['weight'] if row['weight'] != '' else 0.0,
-							isAlternate=True if row['function'] == 'Alternate Athlete' else False
-						)
+			if 'ATH' in row['event_type']:
+				winner = {'athlete': Athlete.objects.get(id=row['code'])}
+			else:
+				winner = {'team': Team.objects.get(id=f"{row['code'][:-2]}{year}{row['code'][-2:]}")}
 
-			self.stdout.write(self.style.SUCCESS(f'Successfully imported data from {filepath}'))
-		except FileNotFoundError:
-			self.stdout.write(self.style.ERROR(f'File "{filepath}" not found'))
-		except:
-			self.stdout.write(self.style.ERROR(f'Unknown error with the following row:\n{row}'))
+			Medal.objects.update_or_create(
+				country=country,
+				rank=row['medal_type'].split(' Medal')[0],
+				event=event,
+				defaults={'date': row['medal_date']},
+				**winner,
+			)
 
+		return self.ingest_rows(filepath, import_row)
 
+
+	def import_athletes_paris2024(self, filepath):
+		disciplineIdsByName = {name.lower(): code for code, name in Discipline.objects.values_list('code', 'name')}
+		eventIndex = EventIndex(Event.objects.filter(host_id=ROSTER_HOST_ID).values_list('id', 'discipline_id', 'name', 'gender'))
+
+		def import_row(row):
+			country = Country.objects.get(code=row['country_code'])
+
+			athlete, created = Athlete.objects.update_or_create(
+					id = row['code'],
+					defaults = {
+						'name': row['name'],
+						'shortName': row['name_short'],
+						'displayName': row['name_tv'],
+						'gender': row['gender'],
+						'country': country,
+						'disciplinesRaw': row['disciplines'],
+						'eventsRaw': row['events'],
+						'dob': row['birth_date'],
+						'height': row['height'] if row['height'] != '' else 0.0,
+						'weight': row['weight'] if row['weight'] != '' else 0.0,
+						'isAlternate': True if row['function'] == 'Alternate Athlete' else False,
+					}
+				)
+
+			disciplineIds = get_discipline_ids(parse_names(row['disciplines']), disciplineIdsByName)
+			athlete.disciplines.set(disciplineIds)
+			athlete.events.set(eventIndex.resolve(parse_names(row['events']), disciplineIds))
+
+		return self.ingest_rows(filepath, import_row)
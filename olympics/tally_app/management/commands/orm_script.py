@@ -2,8 +2,10 @@ from django.contrib.contenttypes.models import ContentType
 from tally_app.models import Country, Athlete, Team, Event, Medal
 from django.db import connection
 
+from tally_app.listings import with_winners
+
 
 def run():
-	medals = Medal.objects.all()
+	medals = with_winners(Medal.objects.all())
 	for medal in medals:
-		print(medal.content_object)
\ No newline at end of file
+		print(medal.winner)
\ No newline at end of file
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tally_app.prerender import prerender
+
+
+class Command(BaseCommand):
+	help = "Render every page of the site to static HTML, only those whose data changed since the last run"
+
+	def add_arguments(self, parser):
+		parser.add_argument('--output', type=str, default=settings.PRERENDER_ROOT,
+			help="Directory the pages are written to, by URL (/tally/host/<slug>/ to tally/host/<slug>/index.html)")
+		parser.add_argument('--workers', type=int,
+			help="Number of processes rendering pages (one per CPU by default)")
+		parser.add_argument('--full', action='store_true',
+			help="Render every page, not just those whose data changed")
+		parser.add_argument('--verbose-pages', action='store_true',
+			help="List every page as it is rendered")
+
+	def handle(self, *args, **options):
+		def log(url, status):
+			if status != 200:
+				self.stdout.write(self.style.ERROR(f'{url}: {status}'))
+			elif options['verbose_pages']:
+				self.stdout.write(url)
+
+		startTime = time.perf_counter()
+		result = prerender(options['output'], workers=options['workers'], full=options['full'], log=log)
+
+		self.stdout.write(
+			f'{len(result.rendered)} pages rendered ({result.numBytes / 1e6:.1f} MB), {len(result.unchanged)} unchanged, '
+			f'{len(result.removed)} removed in {time.perf_counter() - startTime:.2f}s'
+		)
+		if result.failed:
+			raise CommandError(f'{len(result.failed)} pages failed to render, they will be tried again next time')
+		self.stdout.write(self.style.SUCCESS(f'Successfully prerendered the site to {options["output"]}'))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tally_app.page_cache import bump_dataset_version
+from tally_app.tally import rebuild_tallies
+
+
+class Command(BaseCommand):
+	help = "Recount the materialized medal tally of every country at every Games from the Medal table"
+
+	def handle(self, *args, **options):
+		startTime = time.perf_counter()
+		numTallies = rebuild_tallies()
+		bump_dataset_version()
+		self.stdout.write(self.style.SUCCESS(
+			f'Successfully rebuilt {numTallies} medal tallies in {time.perf_counter() - startTime:.2f}s'
+		))
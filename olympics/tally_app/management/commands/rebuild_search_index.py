@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from tally_app.page_cache import bump_dataset_version
+from tally_app.search import has_full_text_index, rebuild_full_text_index, refresh_search_index
+
+
+class Command(BaseCommand):
+	help = "Index every athlete, country, event and discipline for the site search, and rebuild the full-text index"
+
+	def handle(self, *args, **options):
+		startTime = time.perf_counter()
+		counts = refresh_search_index()
+		# Also puts back the index and triggers a table rebuild by a migration drops on SQLite
+		rebuild_full_text_index(connection)
+		bump_dataset_version()
+
+		for kind, (numInserted, numUpdated, numDeleted) in counts.items():
+			self.stdout.write(f'{kind:<12} {numInserted} inserted, {numUpdated} updated, {numDeleted} deleted')
+		if not has_full_text_index(connection):
+			self.stdout.write(self.style.WARNING('No full-text index on this database, searches scan every document'))
+		self.stdout.write(self.style.SUCCESS(
+			f'Successfully rebuilt the search index in {time.perf_counter() - startTime:.2f}s'
+		))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tally_app.startup import STARTUP_BUDGET_MS, profile_startup
+
+
+class Command(BaseCommand):
+	help = "Time a cold start: import the WSGI app in a new interpreter and serve one page, like a serverless deploy"
+
+	def add_arguments(self, parser):
+		parser.add_argument('--url', type=str, default='/',
+			help="Path (and query string) of the first request")
+		parser.add_argument('--top', type=int, default=20,
+			help="Number of slowest imports to list")
+		parser.add_argument('--depth', type=int,
+			help="Only list imports nested at most this deep (0 for top-level imports)")
+		parser.add_argument('--budget', type=float, default=STARTUP_BUDGET_MS,
+			help="Milliseconds allowed from the first import to the first response")
+		parser.add_argument('--database', type=str,
+			help="SQLite database file to serve the request from instead of the configured one")
+
+	def handle(self, *args, **options):
+		try:
+			profile = profile_startup(options['url'], database=options['database'])
+		except RuntimeError as e:
+			raise CommandError(str(e))
+
+		self.stdout.write(f'Imports of {len(profile.imports)} modules, slowest first (cumulative / self ms):')
+		for module in profile.get_slowest_imports(options['top'], maxDepth=options['depth']):
+			self.stdout.write(f'{module.cumulativeTime / 1000:9.1f} {module.selfTime / 1000:8.1f}  {"  " * module.depth}{module.name}')
+
+		self.stdout.write('')
+		self.stdout.write(f'GET {profile.url}: {profile.status}, {profile.size} bytes')
+		self.stdout.write(f'Imports done         {profile.importSeconds * 1000:9.1f} ms')
+		self.stdout.write(f'First response       {profile.responseSeconds * 1000:9.1f} ms')
+		self.stdout.write(f'Process (wall time)  {profile.wallSeconds * 1000:9.1f} ms')
+
+		if profile.heavyModules:
+			self.stdout.write(self.style.WARNING(f'Heavy modules imported before the first response: {", ".join(profile.heavyModules)}'))
+
+		responseMs = profile.responseSeconds * 1000
+		if responseMs > options['budget']:
+			raise CommandError(f'First response took {responseMs:.0f} ms, over the budget of {options["budget"]:.0f} ms')
+		self.stdout.write(self.style.SUCCESS(f'First response within the budget of {options["budget"]:.0f} ms'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tally_app', '0002_alter_event_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='medal',
+            constraint=models.UniqueConstraint(fields=('event', 'rank', 'content_type', 'object_id'), name='unique_medal_winner'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-17 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tally_app', '0003_medal_unique_winner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('filename', models.CharField(max_length=264, primary_key=True, serialize=False)),
+                ('fileHash', models.CharField(max_length=64)),
+                ('rowOffset', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-17 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tally_app', '0004_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceRowFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=264)),
+                ('rowKey', models.CharField(max_length=40)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('data', models.JSONField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('filename', 'rowKey'), name='unique_source_row')],
+            },
+        ),
+    ]
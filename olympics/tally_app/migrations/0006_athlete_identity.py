@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-17 11:26
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# tally_app.athletes as of this migration, frozen so replaying it doesn't change with the app
+GENDER_CODES = {
+    'male': 'M', 'men': 'M', 'm': 'M',
+    'female': 'W', 'women': 'W', 'w': 'W', 'f': 'W',
+    'mixed': 'X', 'x': 'X',
+}
+
+
+def normalize_athlete_name(name):
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(char for char in name if not unicodedata.combining(char)).casefold()
+    return ' '.join(sorted(re.findall(r'\w+', name)))
+
+
+def get_athlete_identity_key(name, countryCode, gender):
+    return f'{normalize_athlete_name(name)}|{countryCode.upper()}|{GENDER_CODES.get(gender.strip().lower(), "O")}'
+
+
+def set_identity_keys(apps, schema_editor):
+    Athlete = apps.get_model('tally_app', 'Athlete')
+    athletes = list(Athlete.objects.select_related('country'))
+    for athlete in athletes:
+        athlete.identityKey = get_athlete_identity_key(athlete.name, athlete.country.code, athlete.gender)
+
+    Athlete.objects.bulk_update(athletes, ['identityKey'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tally_app', '0005_sourcerowfingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='athlete',
+            name='identityKey',
+            field=models.CharField(blank=True, db_index=True, max_length=400),
+        ),
+        migrations.AddField(
+            model_name='athlete',
+            name='sourceSlug',
+            field=models.CharField(blank=True, max_length=264),
+        ),
+        migrations.AddConstraint(
+            model_name='athlete',
+            constraint=models.UniqueConstraint(condition=models.Q(('sourceSlug', ''), _negated=True), fields=('sourceSlug',), name='unique_athlete_source_slug'),
+        ),
+        migrations.RunPython(set_identity_keys, migrations.RunPython.noop),
+    ]
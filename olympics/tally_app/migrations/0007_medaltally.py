@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-17 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+
+
+def count_medal_tallies(apps, schema_editor):
+    Medal = apps.get_model('tally_app', 'Medal')
+    MedalTally = apps.get_model('tally_app', 'MedalTally')
+    counts = Medal.objects.values('country_id', host_id=F('event__host_id')).annotate(
+        gold=Count('id', filter=Q(rank='Gold')),
+        silver=Count('id', filter=Q(rank='Silver')),
+        bronze=Count('id', filter=Q(rank='Bronze')),
+        total=Count('id'),
+    ).order_by()
+    MedalTally.objects.bulk_create((MedalTally(**row) for row in counts), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tally_app', '0006_athlete_identity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedalTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gold', models.IntegerField(default=0)),
+                ('silver', models.IntegerField(default=0)),
+                ('bronze', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='tally_app.country')),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='tally_app.host')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('country', 'host'), name='unique_medal_tally')],
+            },
+        ),
+        migrations.RunPython(count_medal_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-17 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tally_app', '0007_medaltally'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['host', 'discipline'], name='event_host_discipline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='host',
+            index=models.Index(fields=['season', 'year'], name='host_season_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medal',
+            index=models.Index(fields=['country', 'rank'], name='medal_country_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medal',
+            index=models.Index(fields=['event', 'rank'], name='medal_event_rank_idx'),
+        ),
+    ]
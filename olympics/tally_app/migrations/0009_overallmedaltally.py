@@ -0,0 +1,45 @@
+# Generated by Django 5.1.1 on 2026-10-17 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+
+def sum_overall_tallies(apps, schema_editor):
+    Country = apps.get_model('tally_app', 'Country')
+    OverallMedalTally = apps.get_model('tally_app', 'OverallMedalTally')
+    totals = Country.objects.annotate(
+        gold=Coalesce(Sum('tallies__gold'), 0),
+        silver=Coalesce(Sum('tallies__silver'), 0),
+        bronze=Coalesce(Sum('tallies__bronze'), 0),
+        total=Coalesce(Sum('tallies__total'), 0),
+    ).values_list('fullName', 'gold', 'silver', 'bronze', 'total')
+    OverallMedalTally.objects.bulk_create((
+        OverallMedalTally(country_id=countryId, gold=gold, silver=silver, bronze=bronze, total=total)
+        for countryId, gold, silver, bronze, total in totals
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tally_app', '0008_medal_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverallMedalTally',
+            fields=[
+                ('country', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='overall_tally', serialize=False, to='tally_app.country')),
+                ('gold', models.IntegerField(default=0)),
+                ('silver', models.IntegerField(default=0)),
+                ('bronze', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gold', 'silver', 'bronze', 'country'], name='overall_gold_idx'), models.Index(fields=['silver', 'gold', 'bronze', 'country'], name='overall_silver_idx'), models.Index(fields=['bronze', 'gold', 'silver', 'country'], name='overall_bronze_idx'), models.Index(fields=['total', 'gold', 'silver', 'bronze', 'country'], name='overall_total_idx')],
+            },
+        ),
+        migrations.RunPython(sum_overall_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Cast, Coalesce
+
+
+def get_winner_content_types(apps):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    athleteType, _ = ContentType.objects.get_or_create(app_label='tally_app', model='athlete')
+    teamType, _ = ContentType.objects.get_or_create(app_label='tally_app', model='team')
+    return athleteType, teamType
+
+
+def recount_tallies(apps):
+    """Count MedalTally and OverallMedalTally again from the medals, as 0007 and 0009 first did."""
+    Country = apps.get_model('tally_app', 'Country')
+    Medal = apps.get_model('tally_app', 'Medal')
+    MedalTally = apps.get_model('tally_app', 'MedalTally')
+    OverallMedalTally = apps.get_model('tally_app', 'OverallMedalTally')
+
+    counts = Medal.objects.values('country_id', host_id=F('event__host_id')).annotate(
+        gold=Count('id', filter=Q(rank='Gold')),
+        silver=Count('id', filter=Q(rank='Silver')),
+        bronze=Count('id', filter=Q(rank='Bronze')),
+        total=Count('id'),
+    ).order_by()
+    MedalTally.objects.all().delete()
+    MedalTally.objects.bulk_create((MedalTally(**row) for row in counts), batch_size=1000)
+
+    totals = Country.objects.annotate(
+        gold=Coalesce(Sum('tallies__gold'), 0),
+        silver=Coalesce(Sum('tallies__silver'), 0),
+        bronze=Coalesce(Sum('tallies__bronze'), 0),
+        total=Coalesce(Sum('tallies__total'), 0),
+    ).values_list('fullName', 'gold', 'silver', 'bronze', 'total')
+    OverallMedalTally.objects.all().delete()
+    OverallMedalTally.objects.bulk_create((
+        OverallMedalTally(country_id=countryId, gold=gold, silver=silver, bronze=bronze, total=total)
+        for countryId, gold, silver, bronze, total in totals
+    ), batch_size=1000)
+
+
+def backfill_winners(apps, schema_editor):
+    Athlete = apps.get_model('tally_app', 'Athlete')
+    Team = apps.get_model('tally_app', 'Team')
+    Medal = apps.get_model('tally_app', 'Medal')
+    athleteType, teamType = get_winner_content_types(apps)
+
+    # A medal whose winner is gone can't have exactly one winner, as the next migration requires
+    athleteIds = Athlete.objects.annotate(objectId=Cast('id', models.CharField())).values('objectId')
+    numDeleted, _ = Medal.objects.exclude(content_type=athleteType, object_id__in=athleteIds).exclude(
+        content_type=teamType, object_id__in=Team.objects.values('id'),
+    ).delete()
+    # Historical models send none of the app's signals, the tallies still count the deleted medals
+    if numDeleted:
+        recount_tallies(apps)
+
+    Medal.objects.filter(content_type=athleteType).update(athlete_id=Cast('object_id', models.BigIntegerField()))
+    Medal.objects.filter(content_type=teamType).update(team_id=F('object_id'))
+
+
+def restore_generic_winners(apps, schema_editor):
+    Medal = apps.get_model('tally_app', 'Medal')
+    athleteType, teamType = get_winner_content_types(apps)
+
+    Medal.objects.filter(athlete__isnull=False).update(content_type=athleteType, object_id=Cast('athlete_id', models.CharField()))
+    Medal.objects.filter(team__isnull=False).update(content_type=teamType, object_id=F('team_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tally_app', '0009_overallmedaltally'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medal',
+            name='athlete',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='medals', to='tally_app.athlete'),
+        ),
+        migrations.AddField(
+            model_name='medal',
+            name='team',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='medals', to='tally_app.team'),
+        ),
+        # Nullable on the way out, so that 0011 can be reversed before the winners are restored
+        migrations.AlterField(
+            model_name='medal',
+            name='content_type',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype'),
+        ),
+        migrations.AlterField(
+            model_name='medal',
+            name='object_id',
+            field=models.CharField(max_length=264, null=True),
+        ),
+        migrations.RunPython(backfill_winners, restore_generic_winners),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tally_app', '0010_medal_winner_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='medal',
+            name='unique_medal_winner',
+        ),
+        migrations.RemoveIndex(
+            model_name='medal',
+            name='tally_app_m_content_f9c72d_idx',
+        ),
+        migrations.RemoveField(
+            model_name='medal',
+            name='content_type',
+        ),
+        migrations.RemoveField(
+            model_name='medal',
+            name='object_id',
+        ),
+        migrations.AddConstraint(
+            model_name='medal',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('athlete__isnull', False), ('team__isnull', True)), models.Q(('athlete__isnull', True), ('team__isnull', False)), _connector='OR'), name='medal_has_one_winner'),
+        ),
+        migrations.AddConstraint(
+            model_name='medal',
+            constraint=models.UniqueConstraint(fields=('event', 'rank', 'athlete'), name='unique_medal_athlete'),
+        ),
+        migrations.AddConstraint(
+            model_name='medal',
+            constraint=models.UniqueConstraint(fields=('event', 'rank', 'team'), name='unique_medal_team'),
+        ),
+    ]
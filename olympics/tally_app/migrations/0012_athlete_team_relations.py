@@ -0,0 +1,134 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:06
+
+import ast
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+# tally_app.rosters as of this migration, frozen so replaying it doesn't change with the app
+ROSTER_HOST_ID = 'paris-2024'
+GENDER_CODES = {'Men': 'M', 'Women': 'W', 'Mixed': 'X'}
+
+
+def parse_names(value):
+    value = (value or '').strip()
+    if value.startswith('['):
+        try:
+            items = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            items = value[1:-1].split(',')
+    else:
+        items = value.split(',')
+
+    names = (str(item).strip().strip('\'"').strip() for item in items)
+    return [name for name in names if name]
+
+
+def split_event_name(name):
+    for prefix, genderCode in (("Women's ", 'W'), ("Men's ", 'M'), ('Mixed ', 'X')):
+        if name.startswith(prefix):
+            return genderCode, name[len(prefix):].strip()
+    return None, name.strip()
+
+
+def get_discipline_ids(names, disciplineIdsByName):
+    return {disciplineIdsByName[name.lower()] for name in names if name.lower() in disciplineIdsByName}
+
+
+def get_athlete_ids(codes):
+    return {int(code) for code in codes if code.isdigit()}
+
+
+class EventIndex:
+
+    def __init__(self, events):
+        self.eventsByKey = {}
+        for eventId, disciplineId, name, gender in events:
+            for key in [(None, name.lower()), (GENDER_CODES.get(gender, gender), name.lower())]:
+                self.eventsByKey.setdefault(key, set()).add((eventId, disciplineId))
+
+    def resolve(self, names, disciplineIds=()):
+        eventIds = set()
+        for name in names:
+            genderCode, shortName = split_event_name(name)
+            for key in [(None, name.lower()), (genderCode, shortName.lower())]:
+                for eventId, disciplineId in self.eventsByKey.get(key, ()):
+                    if not disciplineIds or disciplineId in disciplineIds:
+                        eventIds.add(eventId)
+
+        return eventIds
+
+
+def link_rosters(apps, schema_editor):
+    Athlete = apps.get_model('tally_app', 'Athlete')
+    Discipline = apps.get_model('tally_app', 'Discipline')
+    Event = apps.get_model('tally_app', 'Event')
+    Team = apps.get_model('tally_app', 'Team')
+
+    disciplineIdsByName = {name.lower(): code for code, name in Discipline.objects.values_list('code', 'name')}
+    eventIndex = EventIndex(Event.objects.filter(host_id=ROSTER_HOST_ID).values_list('id', 'discipline_id', 'name', 'gender'))
+
+    athleteDisciplines, athleteEvents = [], []
+    athletes = Athlete.objects.filter(~Q(disciplinesRaw='') | ~Q(eventsRaw='')).values_list('id', 'disciplinesRaw', 'eventsRaw')
+    for athleteId, disciplines, events in athletes.iterator():
+        disciplineIds = get_discipline_ids(parse_names(disciplines), disciplineIdsByName)
+        athleteDisciplines += [
+            Athlete.disciplines.through(athlete_id=athleteId, discipline_id=disciplineId) for disciplineId in disciplineIds
+        ]
+        athleteEvents += [
+            Athlete.events.through(athlete_id=athleteId, event_id=eventId)
+            for eventId in eventIndex.resolve(parse_names(events), disciplineIds)
+        ]
+
+    # Only the team members that were imported can be linked
+    athleteIds = set(Athlete.objects.values_list('id', flat=True))
+    teamAthletes = [
+        Team.athletes.through(team_id=teamId, athlete_id=athleteId)
+        for teamId, codes in Team.objects.exclude(athleteIDs='').values_list('id', 'athleteIDs').iterator()
+        for athleteId in get_athlete_ids(parse_names(codes)) & athleteIds
+    ]
+
+    for through, links in [
+        (Athlete.disciplines.through, athleteDisciplines),
+        (Athlete.events.through, athleteEvents),
+        (Team.athletes.through, teamAthletes),
+    ]:
+        through.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tally_app', '0011_remove_medal_generic_winner'),
+    ]
+
+    operations = [
+        # The lists as the datasets give them are kept, the relations are parsed from them
+        migrations.RenameField(
+            model_name='athlete',
+            old_name='disciplines',
+            new_name='disciplinesRaw',
+        ),
+        migrations.RenameField(
+            model_name='athlete',
+            old_name='events',
+            new_name='eventsRaw',
+        ),
+        migrations.AddField(
+            model_name='athlete',
+            name='disciplines',
+            field=models.ManyToManyField(blank=True, related_name='athletes', to='tally_app.discipline'),
+        ),
+        migrations.AddField(
+            model_name='athlete',
+            name='events',
+            field=models.ManyToManyField(blank=True, related_name='athletes', to='tally_app.event'),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='athletes',
+            field=models.ManyToManyField(blank=True, related_name='teams', to='tally_app.athlete'),
+        ),
+        migrations.RunPython(link_rosters, migrations.RunPython.noop),
+    ]
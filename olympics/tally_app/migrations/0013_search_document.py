@@ -0,0 +1,79 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:11
+
+from django.db import OperationalError, migrations, models
+
+# The FTS5 index of tally_app.search as of this migration, frozen so replaying it doesn't change with the app
+FTS_TABLE = 'tally_app_searchdocument_fts'
+
+CREATE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, text,
+        content='tally_app_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON tally_app_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON tally_app_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON tally_app_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END""",
+]
+
+DROP_FTS_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def create_search_index(apps, schema_editor):
+    # Only SQLite has the FTS5 index, elsewhere searches scan SearchDocument.text
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            for sql in CREATE_FTS_SQL:
+                cursor.execute(sql)
+    except OperationalError:
+        # SQLite built without FTS5
+        pass
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            for sql in DROP_FTS_SQL:
+                cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tally_app', '0012_athlete_team_relations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('athlete', 'Athlete'), ('country', 'Country'), ('event', 'Event'), ('discipline', 'Discipline')], max_length=10)),
+                ('objectId', models.CharField(max_length=264)),
+                ('title', models.CharField(max_length=264)),
+                ('detail', models.CharField(blank=True, max_length=264)),
+                ('url', models.CharField(max_length=264)),
+                ('text', models.TextField()),
+                ('boost', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'objectId'), name='unique_search_document')],
+            },
+        ),
+        # Filled in by the importers, or by `manage.py rebuild_search_index` for data already imported
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
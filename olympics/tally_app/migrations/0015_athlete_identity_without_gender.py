@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-17 12:40
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+# tally_app.athletes as of this migration, frozen so replaying it doesn't change with the app
+def normalize_athlete_name(name):
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(char for char in name if not unicodedata.combining(char)).casefold()
+    return ' '.join(sorted(re.findall(r'\w+', name)))
+
+
+def get_athlete_identity_key(name, countryCode):
+    return f'{normalize_athlete_name(name)}|{countryCode.upper()}'
+
+
+def set_identity_keys(apps, schema_editor):
+    # Athletes are matched by name and country now, their gender no longer is part of the key
+    Athlete = apps.get_model('tally_app', 'Athlete')
+    athletes = list(Athlete.objects.select_related('country').only('id', 'name', 'country__code'))
+    for athlete in athletes:
+        athlete.identityKey = get_athlete_identity_key(athlete.name, athlete.country.code)
+
+    Athlete.objects.bulk_update(athletes, ['identityKey'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tally_app', '0014_dataset_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_identity_keys, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,4 @@
 from django.db import models
-from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
-from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
 from django.utils.text import slugify
 
@@ -30,6 +28,11 @@ class Host(models.Model):
 	startDate = models.DateTimeField()
 	endDate = models.DateTimeField()
 
+	class Meta:
+		indexes = [
+			models.Index(fields=["season", "year"], name="host_season_year_idx"),
+		]
+
 	def get_latest_host():
 		return Host.objects.order_by('-year').first()
 
@@ -57,14 +60,31 @@ class Athlete(models.Model):
 	displayName = models.CharField(max_length=264, blank=True)
 	gender = models.CharField(max_length=6, choices=GENDER_CHOICES)
 	country = models.ForeignKey(Country, related_name='athletes', on_delete=models.CASCADE)
-	disciplines = models.CharField(max_length=1000, blank=True)
-	events = models.CharField(max_length=1000, blank=True)
+	# As listed by the dataset, see tally_app.rosters; query disciplines and events instead
+	disciplinesRaw = models.CharField(max_length=1000, blank=True)
+	eventsRaw = models.CharField(max_length=1000, blank=True)
+	disciplines = models.ManyToManyField('Discipline', related_name='athletes', blank=True)
+	events = models.ManyToManyField('Event', related_name='athletes', blank=True)
 	dob = models.DateField(null=True)
 	height = models.DecimalField(max_digits=5, decimal_places=2, null=True)
 	weight = models.DecimalField(max_digits=5, decimal_places=2, null=True)
 	isAlternate = models.BooleanField(null=True)
 
-	medals = GenericRelation('Medal')
+	# Used to match rows of the medal datasets to existing athletes, see tally_app.athletes
+	identityKey = models.CharField(max_length=400, blank=True, db_index=True)
+	sourceSlug = models.CharField(max_length=264, blank=True)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=["sourceSlug"], condition=~models.Q(sourceSlug=''), name="unique_athlete_source_slug"),
+		]
+
+	def save(self, *args, **kwargs):
+		if self.country_id is not None:
+			from tally_app.athletes import get_athlete_identity_key
+			self.identityKey = get_athlete_identity_key(self.name, self.country.code)
+
+		super().save(*args, **kwargs)
 	
 	def __str__(self):
 		return f"{self.displayName if self.displayName != '' else self.name}"
@@ -83,13 +103,13 @@ class Team(models.Model):
 	country = models.ForeignKey(Country, related_name='teams', on_delete=models.CASCADE)
 	gender = models.CharField(max_length=5, choices=GENDER_CHOICES)
 	discipline = models.CharField(max_length=264)
+	# As listed by the dataset, the athletes that were imported are linked in athletes
 	athleteNames = models.CharField(max_length=1000, blank=True)
 	athleteIDs = models.CharField(max_length=1000, blank=True)
+	athletes = models.ManyToManyField(Athlete, related_name='teams', blank=True)
 	numAthletes = models.IntegerField(null=True)
 	codeRaw = models.CharField(max_length=30, blank=True)
 
-	medals = GenericRelation('Medal')
-
 	def __str__(self):
 		return f"{self.gender} {self.discipline} from {self.country}"
 
@@ -120,6 +140,9 @@ class Event(models.Model):
 	
 	class Meta:
 		unique_together = ('discipline', 'name', 'gender', 'host')
+		indexes = [
+			models.Index(fields=["host", "discipline"], name="event_host_discipline_idx"),
+		]
 
 	def __str__(self):
 		return f"{self.gender}'s {self.discipline}{': ' if self.name else ''}{self.name}"
@@ -144,20 +167,26 @@ class Medal(models.Model):
 
 	country = models.ForeignKey(Country, related_name='medals', on_delete=models.CASCADE)
 
-	content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
-	object_id = models.CharField(max_length=264)
-	# winner = models.ForeignKey(
-	# 	Athlete,
-	# 	related_name='medals',
-	# 	on_delete=models.CASCADE
-	# )
-	content_object = GenericForeignKey('content_type', 'object_id')
+	# The winner is an athlete or a team, exactly one of the two is set
+	athlete = models.ForeignKey(Athlete, related_name='medals', on_delete=models.CASCADE, null=True, blank=True)
+	team = models.ForeignKey(Team, related_name='medals', on_delete=models.CASCADE, null=True, blank=True)
 
 	date = models.DateField(null=True)
 
 	class Meta:
 		indexes = [
-			models.Index(fields=["content_type", "object_id"]),
+			models.Index(fields=["country", "rank"], name="medal_country_rank_idx"),
+			models.Index(fields=["event", "rank"], name="medal_event_rank_idx"),
+		]
+		constraints = [
+			models.CheckConstraint(
+				condition=models.Q(athlete__isnull=False, team__isnull=True) | models.Q(athlete__isnull=True, team__isnull=False),
+				name="medal_has_one_winner",
+			),
+			# Let the bulk importer upsert medals with bulk_create(update_conflicts=True). A NULL
+			# never conflicts, so each only applies to the medals of its kind of winner.
+			models.UniqueConstraint(fields=["event", "rank", "athlete"], name="unique_medal_athlete"),
+			models.UniqueConstraint(fields=["event", "rank", "team"], name="unique_medal_team"),
 		]
 
 	# def save(self, *args, **kwargs):
@@ -168,3 +197,135 @@ class Medal(models.Model):
 
 	def __str__(self):
 		return f"{self.event} [{self.rank}]"
+
+	@property
+	def winner(self):
+		"""The Athlete or Team the medal was won by."""
+		return self.athlete if self.athlete_id is not None else self.team
+
+	@winner.setter
+	def winner(self, winner):
+		self.athlete, self.team = (winner, None) if isinstance(winner, Athlete) else (None, winner)
+
+
+class MedalTally(models.Model):
+	"""Medal counts of a country at one Games, kept up to date as Medals are written.
+
+	See tally_app.tally; rebuild from scratch with `manage.py rebuild_medal_tally`.
+	"""
+
+	country = models.ForeignKey(Country, related_name='tallies', on_delete=models.CASCADE)
+	host = models.ForeignKey(Host, related_name='tallies', on_delete=models.CASCADE)
+	gold = models.IntegerField(default=0)
+	silver = models.IntegerField(default=0)
+	bronze = models.IntegerField(default=0)
+	total = models.IntegerField(default=0)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=["country", "host"], name="unique_medal_tally"),
+		]
+
+	def __str__(self):
+		return f"{self.country} at {self.host} [{self.gold}/{self.silver}/{self.bronze}]"
+
+
+class OverallMedalTally(models.Model):
+	"""A country's medal counts over every Games, one row per country (zeros included).
+
+	Kept in sync with MedalTally by tally_app.tally. Each way the overall table can be sorted
+	has an index, ending in the country as the tie-breaker, for keyset pagination.
+	"""
+
+	country = models.OneToOneField(Country, related_name='overall_tally', primary_key=True, on_delete=models.CASCADE)
+	gold = models.IntegerField(default=0)
+	silver = models.IntegerField(default=0)
+	bronze = models.IntegerField(default=0)
+	total = models.IntegerField(default=0)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['gold', 'silver', 'bronze', 'country'], name='overall_gold_idx'),
+			models.Index(fields=['silver', 'gold', 'bronze', 'country'], name='overall_silver_idx'),
+			models.Index(fields=['bronze', 'gold', 'silver', 'country'], name='overall_bronze_idx'),
+			models.Index(fields=['total', 'gold', 'silver', 'bronze', 'country'], name='overall_total_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.country} overall [{self.gold}/{self.silver}/{self.bronze}]"
+
+
+class DatasetVersion(models.Model):
+	"""The single row holding the dataset version, see tally_app.page_cache.
+
+	It's kept in the database, not the cache, so every process serving the site sees the
+	bumps the importers make from theirs.
+	"""
+
+	version = models.BigIntegerField()
+
+	def __str__(self):
+		return f"{self.version:x}"
+
+
+class ImportCheckpoint(models.Model):
+	"""How far an import of a source file has been committed, for `--resume`."""
+
+	filename = models.CharField(max_length=264, primary_key=True)
+	fileHash = models.CharField(max_length=64)
+	rowOffset = models.IntegerField(default=0)
+	updated = models.DateTimeField(auto_now=True)
+
+	def __str__(self):
+		return f"{self.filename} [{self.rowOffset} rows]"
+
+
+class SourceRowFingerprint(models.Model):
+	"""Hash of a source CSV row as of the last import, used by the `--delta` import mode."""
+
+	filename = models.CharField(max_length=264)
+	rowKey = models.CharField(max_length=40)
+	fingerprint = models.CharField(max_length=40)
+	data = models.JSONField()
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=["filename", "rowKey"], name="unique_source_row"),
+		]
+
+	def __str__(self):
+		return f"{self.filename} [{self.rowKey}]"
+
+
+class SearchDocument(models.Model):
+	"""An athlete, country, event or discipline as the site search finds it, see tally_app.search.
+
+	On SQLite the rows are indexed by the FTS5 table tally_app_searchdocument_fts, kept up to
+	date by triggers; rebuild both with `manage.py rebuild_search_index`.
+	"""
+
+	ATHLETE = 'athlete'; COUNTRY = 'country'; EVENT = 'event'; DISCIPLINE = 'discipline'
+	KIND_CHOICES = [
+		(ATHLETE, "Athlete"),
+		(COUNTRY, "Country"),
+		(EVENT, "Event"),
+		(DISCIPLINE, "Discipline"),
+	]
+
+	kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+	objectId = models.CharField(max_length=264)
+	title = models.CharField(max_length=264)
+	detail = models.CharField(max_length=264, blank=True)
+	url = models.CharField(max_length=264)
+	# Every name the object is searched by, lowercased and without accents
+	text = models.TextField()
+	# Added to the relevance of a match, so the better known of similar matches come first
+	boost = models.FloatField(default=0)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=["kind", "objectId"], name="unique_search_document"),
+		]
+
+	def __str__(self):
+		return f"{self.title} [{self.kind}]"
@@ -0,0 +1,36 @@
+from django.core.cache import cache
+
+from tally_app.models import Country, Host
+from tally_app.page_cache import PAGE_CACHE_TIMEOUT, get_dataset_version
+from tally_app.tally import annotate_medal_totals
+
+
+NAVIGATION_CACHE_KEY = 'tally_app:navigation'
+NUM_TOP_COUNTRIES = 10
+
+
+def get_navigation(version=None):
+	"""The hosts and top countries shown in the base.html navigation, cached per dataset version.
+
+	`version` is the current dataset version, if it has been looked up already.
+	"""
+	key = f'{NAVIGATION_CACHE_KEY}:{version or get_dataset_version():x}'
+	navigation = cache.get(key)
+	if navigation is None:
+		topCountries = annotate_medal_totals(Country.objects.all()).order_by('-total_medals', 'fullName')
+		navigation = {
+			'hosts': list(Host.objects.order_by('-year')),
+			'top_countries': list(topCountries[:NUM_TOP_COUNTRIES]),
+		}
+		cache.set(key, navigation, PAGE_CACHE_TIMEOUT)
+
+	return navigation
+
+
+def navigation(request):
+	"""Context processor adding `hosts` and `top_countries` to every template.
+
+	Views can still pass their own `hosts` or `top_countries` (a season filter, a single
+	Games' leaders), which take precedence over these.
+	"""
+	return get_navigation(getattr(request, 'datasetVersion', None))
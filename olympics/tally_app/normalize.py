@@ -0,0 +1,95 @@
+from collections import Counter
+
+import pandas as pd
+
+from tally_app.models import Discipline, Host, Medal
+from tally_app.athletes import GENDER_CODES
+
+
+# Disciplines named differently in the historical medals dataset
+DISCIPLINE_RENAMES = {
+	'Volleyball': 'Indoor Volleyball',
+	'Baseball/Softball': 'Baseball',
+}
+
+MEDALS_ALL_COLUMNS = [
+	'discipline_title', 'slug_game', 'event_title', 'event_gender', 'medal_type', 'participant_type',
+	'participant_title', 'athlete_url', 'athlete_full_name', 'country_name', 'country_code', 'country_3_letter_code',
+]
+
+
+class MedalsAllNormalizer:
+	"""Turns chunks of olympic_medals.csv rows into clean, typed DataFrames.
+
+	Every rule is applied to whole columns at once and Disciplines and Hosts are
+	resolved by joining against frames loaded once from the database. Rows that
+	can't be resolved are dropped from the result and counted by reason in
+	`rejected`, so they can be reported together once the import has finished.
+	"""
+
+	def __init__(self):
+		self.disciplineCodes = None
+		self.hostIds = None
+		self.rejected = Counter()
+
+	def load(self):
+		disciplines = pd.DataFrame.from_records(Discipline.objects.values('code', 'name'), columns=['code', 'name'])
+		self.disciplineCodes = disciplines.set_index(disciplines['name'].str.lower())['code']
+		self.disciplineCodes = self.disciplineCodes[~self.disciplineCodes.index.duplicated()]
+
+		hosts = pd.DataFrame.from_records(Host.objects.values('id', 'slug'), columns=['id', 'slug'])
+		self.hostIds = hosts.set_index('slug')['id']
+
+	@property
+	def numRejected(self):
+		return sum(self.rejected.values())
+
+	def reject(self, frame, mask, reasons):
+		for reason, count in reasons.reindex(frame.index)[mask].value_counts().items():
+			self.rejected[reason] += int(count)
+		return frame[~mask]
+
+	def normalize(self, rows):
+		"""Normalize a list of row dictionaries (or a DataFrame) from olympic_medals.csv.
+
+		The result has one row per resolvable input row with the columns
+		discipline_code, event_name, event_gender, gender_code, host_id, year (int),
+		rank, participant_type, athlete_full_name, athlete_url, country_code,
+		country_name and country_iso.
+		"""
+		if self.disciplineCodes is None:
+			self.load()
+
+		raw = pd.DataFrame(rows, columns=MEDALS_ALL_COLUMNS, dtype='string').fillna('')
+
+		disciplineNames = raw['discipline_title'].replace(DISCIPLINE_RENAMES)
+		disciplineCodes = disciplineNames.str.lower().map(self.disciplineCodes)
+		# Equestrian medals are split into disciplines named after the first word of the event
+		isEquestrian = disciplineCodes.isna() & (disciplineNames == 'Equestrian')
+		equestrianNames = 'equestrian ' + raw['event_title'].str.split(' ').str[0].str.lower()
+		disciplineCodes = disciplineCodes.fillna(equestrianNames.where(isEquestrian).map(self.disciplineCodes))
+
+		frame = pd.DataFrame({
+			'discipline_code': disciplineCodes,
+			'event_name': raw['event_title'],
+			'event_gender': raw['event_gender'],
+			'gender_code': raw['event_gender'].str.strip().str.lower().map(GENDER_CODES).fillna('O'),
+			'host_id': raw['slug_game'].map(self.hostIds),
+			'year': pd.to_numeric(raw['slug_game'].str.rsplit('-', n=1).str[-1], errors='coerce'),
+			'rank': raw['medal_type'].str.capitalize(),
+			'participant_type': raw['participant_type'],
+			'athlete_full_name': raw['athlete_full_name'],
+			'athlete_url': raw['athlete_url'],
+			'country_code': raw['country_3_letter_code'],
+			'country_name': raw['country_name'],
+			'country_iso': raw['country_code'],
+		})
+
+		frame = self.reject(frame, frame['discipline_code'].isna(), 'Discipline "' + disciplineNames + '" does not exist')
+		frame = self.reject(frame, frame['host_id'].isna(), 'Host game "' + raw['slug_game'] + '" does not exist')
+		frame = self.reject(frame, frame['year'].isna(), 'No year in game slug "' + raw['slug_game'] + '"')
+		frame = self.reject(frame, ~frame['rank'].isin([Medal.GOLD, Medal.SILVER, Medal.BRONZE]), 'Unknown medal type "' + raw['medal_type'] + '"')
+
+		return frame.astype({
+			'discipline_code': 'string', 'gender_code': 'string', 'host_id': 'string', 'year': 'int64',
+		}).reset_index(drop=True)
@@ -0,0 +1,111 @@
+import contextlib
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from tally_app.models import DatasetVersion
+
+
+PAGE_CACHE_KEY_PREFIX = 'tally_app:page'
+
+# Pages cached under an old dataset version are never read again, let them expire
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Primary key of the DatasetVersion row
+DATASET_VERSION_ID = 1
+
+
+def get_dataset_version():
+	"""The current dataset version, a nanosecond timestamp of when the data last changed.
+
+	A single primary key lookup, shared by every process using the database, so each serves
+	the same ETags and sees the bumps made by importers running elsewhere.
+	"""
+	version = DatasetVersion.objects.filter(pk=DATASET_VERSION_ID).values_list('version', flat=True).first()
+	if version is None:
+		DatasetVersion.objects.bulk_create([DatasetVersion(pk=DATASET_VERSION_ID, version=time.time_ns())], ignore_conflicts=True)
+		version = DatasetVersion.objects.values_list('version', flat=True).get(pk=DATASET_VERSION_ID)
+	return version
+
+
+def bump_dataset_version():
+	"""Start a new dataset version, making every page and menu cached so far stale.
+
+	Returns the new version, or None inside a deferred_version_bump() block.
+	"""
+	if getattr(_deferred, 'depth', 0) > 0:
+		return None
+
+	# Always moves forward, even if clocks of processes on different machines disagree
+	updated = DatasetVersion.objects.filter(pk=DATASET_VERSION_ID).update(
+		version=Greatest(F('version') + 1, Value(time.time_ns())),
+	)
+	if not updated:
+		return get_dataset_version()
+	return DatasetVersion.objects.values_list('version', flat=True).get(pk=DATASET_VERSION_ID)
+
+
+_deferred = threading.local()
+
+
+@contextlib.contextmanager
+def deferred_version_bump():
+	"""Bump the dataset version once at the end instead of on every save in this thread.
+
+	The bump at the end happens whatever the block did, bulk writes included, as they send no signals.
+	"""
+	_deferred.depth = getattr(_deferred, 'depth', 0) + 1
+	try:
+		yield
+	finally:
+		_deferred.depth -= 1
+		if not _deferred.depth:
+			bump_dataset_version()
+
+
+def get_page_cache_key(request, version):
+	fullPath = hashlib.sha256(request.get_full_path().encode()).hexdigest()
+	return f'{PAGE_CACHE_KEY_PREFIX}:{version:x}:{fullPath}'
+
+
+def cache_page_per_dataset(view):
+	"""Cache a view's responses by URL and query string until the dataset version changes.
+
+	Responses carry an ETag and Last-Modified from the dataset version, and a request whose
+	If-None-Match (or If-Modified-Since) is still current gets a 304 without the view running.
+	A repeat request costs the dataset version lookup and a cache read. The version lives in
+	the database, so the cache itself needn't be shared between processes.
+	"""
+
+	@wraps(view)
+	def cached_view(request, *args, **kwargs):
+		if request.method not in ('GET', 'HEAD'):
+			return view(request, *args, **kwargs)
+
+		version = get_dataset_version()
+		# For the navigation context processor, saving it a second lookup
+		request.datasetVersion = version
+		etag = quote_etag(f'{version:x}')
+		lastModified = version // 10**9
+
+		response = get_conditional_response(request, etag=etag, last_modified=lastModified)
+		if response is None:
+			key = get_page_cache_key(request, version)
+			response = cache.get(key)
+			if response is None:
+				response = view(request, *args, **kwargs)
+				if response.status_code == 200 and not response.streaming and not response.cookies:
+					cache.set(key, response, PAGE_CACHE_TIMEOUT)
+
+		response.headers.setdefault('ETag', etag)
+		response.headers.setdefault('Last-Modified', http_date(lastModified))
+		return response
+
+	return cached_view
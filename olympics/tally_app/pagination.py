@@ -0,0 +1,102 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+	pass
+
+
+def encode_cursor(values):
+	"""An opaque, URL safe cursor holding the sort key of a row."""
+	data = json.dumps(list(values), separators=(',', ':')).encode()
+	return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor, numValues):
+	try:
+		values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+	except (binascii.Error, UnicodeDecodeError, ValueError):
+		raise InvalidCursor(f'Malformed cursor {cursor!r}')
+
+	if not isinstance(values, list) or len(values) != numValues:
+		raise InvalidCursor(f'Cursor {cursor!r} does not match the sort order')
+	return values
+
+
+def get_keyset_filter(ordering, values, before=False):
+	"""A filter for the rows after (or before) the row with sort key `values` in `ordering`.
+
+	For an ordering a, -b it reads a >= x AND (a > x OR (a = x AND b < y)): the leading range
+	on the first column lets the database seek into an index on the ordering columns.
+	"""
+	keyset = Q(pk__in=[])
+	equal = Q()
+	for field, value in zip(ordering, values):
+		name = field.lstrip('-')
+		descending = field.startswith('-') != before
+		keyset |= equal & Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+		equal &= Q(**{name: value})
+
+	firstField, firstValue = ordering[0].lstrip('-'), values[0]
+	descending = ordering[0].startswith('-') != before
+	return Q(**{f'{firstField}__{"lte" if descending else "gte"}': firstValue}) & keyset
+
+
+def reverse_ordering(ordering):
+	return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPage:
+	"""One page of rows, with cursors for the pages either side (None at either end)."""
+
+	def __init__(self, items, ordering, hasNext, hasPrevious, offset=None):
+		self.items = items
+		self.ordering = ordering
+		self.offset = offset
+		self.nextCursor = self.get_cursor(items[-1]) if hasNext and items else None
+		self.previousCursor = self.get_cursor(items[0]) if hasPrevious and items else None
+
+	def get_cursor(self, item):
+		return encode_cursor(getattr(item, field.lstrip('-')) for field in self.ordering)
+
+	def __iter__(self):
+		return iter(self.items)
+
+	def __len__(self):
+		return len(self.items)
+
+
+def paginate_keyset(queryset, ordering, pageSize, after=None, before=None, withOffset=False):
+	"""Fetch the page of `queryset` in `ordering` after the `after` cursor or before `before`.
+
+	The ordering has to end in a unique field, so that every row has its own sort key, and its
+	fields have to be attributes of the rows. Pages are found by seeking past the cursor rather
+	than with OFFSET, so every page costs the same however deep it is. `withOffset` also counts
+	the rows ahead of the page, for numbering them.
+	"""
+	ordering = list(ordering)
+	if before is not None:
+		values = decode_cursor(before, len(ordering))
+		rows = list(queryset.filter(get_keyset_filter(ordering, values, before=True)).order_by(
+			*reverse_ordering(ordering))[:pageSize + 1])
+		items = rows[:pageSize][::-1]
+		hasPrevious, hasNext = len(rows) > pageSize, True
+	else:
+		rows = queryset
+		if after is not None:
+			rows = rows.filter(get_keyset_filter(ordering, decode_cursor(after, len(ordering))))
+		rows = list(rows.order_by(*ordering)[:pageSize + 1])
+		items = rows[:pageSize]
+		hasPrevious, hasNext = after is not None, len(rows) > pageSize
+
+	offset = None
+	if withOffset:
+		offset = 0
+		if hasPrevious and items:
+			firstValues = [getattr(items[0], field.lstrip('-')) for field in ordering]
+			offset = queryset.filter(get_keyset_filter(ordering, firstValues, before=True)).count()
+
+	return KeysetPage(items, ordering, hasNext, hasPrevious, offset)
@@ -0,0 +1,115 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from django.db import connections
+
+
+class Stage:
+	"""One step of an import pipeline.
+
+	`run` is called with no arguments and should return False (or raise) if it failed.
+	A stage only starts once every stage named in `dependencies` has succeeded.
+	"""
+
+	def __init__(self, name, run, dependencies=()):
+		self.name = name
+		self.run = run
+		self.dependencies = tuple(dependencies)
+
+	def __repr__(self):
+		return f'Stage({self.name!r})'
+
+
+class StageResult:
+	OK = 'ok'
+	FAILED = 'failed'
+	SKIPPED = 'skipped'
+
+	def __init__(self, stage, status, elapsed=0.0, error=None):
+		self.stage = stage
+		self.status = status
+		self.elapsed = elapsed
+		self.error = error
+
+	def __str__(self):
+		line = f'{self.stage.name:<24} {self.status:<8} {self.elapsed:7.2f}s'
+		if self.error is not None:
+			line += f'  {self.error!r}'
+		return line
+
+
+def run_stage(stage):
+	startTime = time.perf_counter()
+	try:
+		succeeded = stage.run() is not False
+		error = None
+	except Exception as e:
+		succeeded = False
+		error = e
+	finally:
+		# Every worker thread gets its own database connections, close them before the thread is reused
+		connections.close_all()
+
+	return StageResult(stage, StageResult.OK if succeeded else StageResult.FAILED, time.perf_counter() - startTime, error)
+
+
+def check_stages(stages):
+	"""Raise ValueError for unknown dependencies or dependency cycles."""
+	names = {stage.name for stage in stages}
+	for stage in stages:
+		unknown = set(stage.dependencies) - names
+		if unknown:
+			raise ValueError(f'Stage {stage.name!r} depends on unknown stages {sorted(unknown)}')
+
+	remaining = {stage.name: set(stage.dependencies) for stage in stages}
+	while remaining:
+		ready = [name for name, dependencies in remaining.items() if not dependencies]
+		if not ready:
+			raise ValueError(f'Dependency cycle between stages {sorted(remaining)}')
+		for name in ready:
+			del remaining[name]
+		for dependencies in remaining.values():
+			dependencies.difference_update(ready)
+
+
+def run_stages(stages, maxWorkers=4, onResult=None):
+	"""Run stages on a thread pool as soon as their dependencies have succeeded.
+
+	Independent stages run concurrently; a stage waits at the barrier formed by its
+	dependencies. When a stage fails, every stage that depends on it (directly or not)
+	is skipped while unrelated stages carry on. `onResult` is called with each
+	StageResult as it becomes available.
+
+	Returns the StageResults in the order the stages finished.
+	"""
+	check_stages(stages)
+
+	pending = list(stages)
+	results = {}
+	running = {}
+
+	def finish(result):
+		results[result.stage.name] = result
+		if onResult is not None:
+			onResult(result)
+
+	with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+		while pending or running:
+			for stage in list(pending):
+				statuses = [results[name].status if name in results else None for name in stage.dependencies]
+				if any(status in (StageResult.FAILED, StageResult.SKIPPED) for status in statuses):
+					pending.remove(stage)
+					finish(StageResult(stage, StageResult.SKIPPED))
+				elif all(status == StageResult.OK for status in statuses):
+					pending.remove(stage)
+					running[executor.submit(run_stage, stage)] = stage
+
+			if not running:
+				continue
+
+			done, _ = wait(running, return_when=FIRST_COMPLETED)
+			for future in done:
+				del running[future]
+				finish(future.result())
+
+	return list(results.values())
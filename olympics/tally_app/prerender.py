@@ -0,0 +1,245 @@
+import contextlib
+import functools
+import hashlib
+import json
+import multiprocessing
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+from tally_app.export import iter_export_rows
+from tally_app.models import Country, Event, Host, MedalTally, OverallMedalTally
+from tally_app.navigation import get_navigation
+from tally_app.static_assets import get_plotly_js_path
+
+
+# Kept next to the pages, recording what each was rendered from
+MANIFEST_NAME = '.prerender.json'
+
+
+class Page:
+	"""A URL to render, and the keys of the data it shows (see get_fingerprints())."""
+
+	def __init__(self, url, dependencies):
+		self.url = url
+		self.dependencies = sorted(set(dependencies))
+
+	def __repr__(self):
+		return f'Page({self.url!r})'
+
+
+def get_pages():
+	"""Every page of the site without a query string, the pages a static host can serve."""
+	countryCodesPerHost = {}
+	pairs = MedalTally.objects.values_list('country__code', 'host__slug').order_by('host__slug', 'country__code')
+	for code, slug in pairs:
+		countryCodesPerHost.setdefault(slug, []).append(code)
+
+	# Any page listing countries by their name or flag depends on 'countries' as well
+	pages = [
+		Page(reverse('index'), ['tally', 'countries']),
+		Page(reverse('games'), ['hosts']),
+		Page(reverse('countries'), ['tally', 'countries']),
+	]
+	for slug in Host.objects.order_by('slug').values_list('slug', flat=True):
+		pages.append(Page(reverse('tally:host_tally', kwargs={'slug': slug}), [f'host:{slug}']))
+		for code in countryCodesPerHost.get(slug, []):
+			pages.append(Page(reverse('tally:country_tally_for_host', kwargs={'code': code, 'slug': slug}), [f'host:{slug}']))
+	for code in Country.objects.order_by('code').values_list('code', flat=True):
+		pages.append(Page(reverse('tally:country', kwargs={'code': code}), [f'country:{code}']))
+		pages.append(Page(reverse('tally:country_stats', kwargs={'code': code}), [f'country:{code}']))
+	for pk in Event.objects.order_by('id').values_list('id', flat=True):
+		pages.append(Page(reverse('tally:event_detail', kwargs={'pk': pk}), [f'event:{pk}']))
+
+	return pages
+
+
+def get_fingerprints():
+	"""A digest of the data behind each dependency key, changing whenever what a page shows could.
+
+	host:<slug>, country:<code> and event:<id> cover the row of the host, country or event and
+	every medal of it, along with the medal's winner and country; tally, countries and hosts
+	cover the overall medal table, every country and every host.
+	"""
+	digests = {}
+
+	def add(key, values):
+		digests.setdefault(key, hashlib.sha256()).update(json.dumps(values, default=str).encode())
+
+	for host in Host.objects.order_by('slug').values():
+		add(f'host:{host["slug"]}', host)
+		add('hosts', host)
+	countries = {country['code']: country for country in Country.objects.order_by('code').values()}
+	for code, country in countries.items():
+		add(f'country:{code}', country)
+		add('countries', country)
+	for tally in OverallMedalTally.objects.order_by('country_id').values():
+		add('tally', tally)
+	for event in Event.objects.order_by('id').values('id', 'name', 'gender', 'discipline_id', 'discipline__name', 'host__slug'):
+		add(f'event:{event["id"]}', event)
+
+	for medal in iter_export_rows():
+		for key in (f'host:{medal["host"]}', f'country:{medal["country_code"]}', f'event:{medal["event_id"]}'):
+			add(key, [medal, countries[medal['country_code']]])
+
+	return {key: digest.hexdigest() for key, digest in digests.items()}
+
+
+def get_site_fingerprint():
+	"""A digest of what every page shares: the templates, the code rendering them and the menus.
+
+	When it changes every page is rendered again.
+	"""
+	digest = hashlib.sha256()
+	templateDirs = [Path(directory) for template in settings.TEMPLATES for directory in template['DIRS']]
+	for directory in [*templateDirs, Path(__file__).parent]:
+		for path in sorted(directory.rglob('*')):
+			if path.suffix in ('.html', '.py') and '__pycache__' not in path.parts:
+				digest.update(str(path.relative_to(directory)).encode())
+				digest.update(path.read_bytes())
+
+	navigation = get_navigation()
+	digest.update(json.dumps([
+		[(host.slug, host.name, host.season) for host in navigation['hosts']],
+		[(country.code, country.fullName) for country in navigation['top_countries']],
+		get_plotly_js_path(),
+	]).encode())
+	return digest.hexdigest()
+
+
+def get_output_path(outputDir, url):
+	"""Where a static host looks for `url`: the index.html of the directory named after it."""
+	return Path(outputDir) / url.strip('/') / 'index.html'
+
+
+def get_render_host():
+	"""A host name the site accepts, for the requests the pages are rendered from."""
+	allowedHosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+	return allowedHosts[0] if allowedHosts else 'localhost'
+
+
+@functools.cache
+def get_client():
+	from django.test import Client
+
+	return Client(HTTP_HOST=get_render_host())
+
+
+def render_page(url, outputDir):
+	"""Render `url` through the full request handling and write it out. Returns (url, status, size)."""
+	response = get_client().get(url)
+	if response.status_code != 200:
+		return url, response.status_code, 0
+
+	path = get_output_path(outputDir, url)
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_bytes(response.content)
+	return url, response.status_code, len(response.content)
+
+
+def read_manifest(outputDir):
+	try:
+		with open(Path(outputDir) / MANIFEST_NAME) as file:
+			return json.load(file)
+	except (FileNotFoundError, ValueError):
+		return {'site': None, 'fingerprints': {}, 'pages': {}}
+
+
+def write_manifest(outputDir, manifest):
+	path = Path(outputDir) / MANIFEST_NAME
+	path.parent.mkdir(parents=True, exist_ok=True)
+	temporaryPath = path.with_suffix('.tmp')
+	with open(temporaryPath, 'w') as file:
+		json.dump(manifest, file)
+	temporaryPath.replace(path)
+
+
+class PrerenderResult:
+
+	def __init__(self):
+		self.rendered = []
+		self.unchanged = []
+		self.removed = []
+		self.failed = []  # (url, status)
+		self.numBytes = 0
+
+
+def get_changed_pages(pages, manifest, fingerprints, siteFingerprint, outputDir):
+	"""The pages whose data changed since the build recorded in `manifest`, or that aren't on disk."""
+	if manifest['site'] != siteFingerprint:
+		return list(pages)
+
+	oldFingerprints = manifest['fingerprints']
+	return [
+		page for page in pages
+		if manifest['pages'].get(page.url) != page.dependencies
+		or any(oldFingerprints.get(key) != fingerprints.get(key) for key in page.dependencies)
+		or not get_output_path(outputDir, page.url).exists()
+	]
+
+
+def remove_page(outputDir, url):
+	path = get_output_path(outputDir, url)
+	path.unlink(missing_ok=True)
+	# Tidy up the directories left empty, up to the output directory
+	for directory in path.parents:
+		if directory == Path(outputDir) or any(directory.iterdir()):
+			break
+		directory.rmdir()
+
+
+def prerender(outputDir, workers=None, full=False, log=None):
+	"""Render the site's pages to static HTML files in `outputDir`, in `workers` processes.
+
+	Only the pages whose data changed since the last build into `outputDir` are rendered again
+	(all of them when `full`), and the pages of hosts, countries and events that are gone are
+	removed. `log` is called with (url, status) as pages are rendered.
+	"""
+	outputDir = Path(outputDir)
+	manifest = {'site': None, 'fingerprints': {}, 'pages': {}} if full else read_manifest(outputDir)
+	pages = get_pages()
+	fingerprints = get_fingerprints()
+	siteFingerprint = get_site_fingerprint()
+
+	result = PrerenderResult()
+	changedPages = get_changed_pages(pages, manifest, fingerprints, siteFingerprint, outputDir)
+	changedUrls = {page.url for page in changedPages}
+	result.unchanged = [page.url for page in pages if page.url not in changedUrls]
+
+	renderedPage = functools.partial(render_page, outputDir=outputDir)
+	workers = workers or multiprocessing.cpu_count()
+	with contextlib.ExitStack() as stack:
+		if workers > 1 and len(changedPages) > 1:
+			# Worker processes open their own connections, none may be inherited mid-query
+			connections.close_all()
+			pool = stack.enter_context(multiprocessing.get_context().Pool(workers, initializer=django.setup))
+			results = pool.imap_unordered(renderedPage, [page.url for page in changedPages], chunksize=16)
+		else:
+			results = (renderedPage(page.url) for page in changedPages)
+
+		for url, status, size in results:
+			if status == 200:
+				result.rendered.append(url)
+				result.numBytes += size
+			else:
+				result.failed.append((url, status))
+			if log is not None:
+				log(url, status)
+
+	urls = {page.url for page in pages}
+	for url in manifest['pages']:
+		if url not in urls:
+			remove_page(outputDir, url)
+			result.removed.append(url)
+
+	# Failed pages are left out, so the next build tries them again
+	failedUrls = {url for url, status in result.failed}
+	write_manifest(outputDir, {
+		'site': siteFingerprint,
+		'fingerprints': fingerprints,
+		'pages': {page.url: page.dependencies for page in pages if page.url not in failedUrls},
+	})
+	return result
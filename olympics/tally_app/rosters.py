@@ -0,0 +1,69 @@
+import ast
+
+
+# Host whose datasets list the disciplines and events of every athlete
+ROSTER_HOST_ID = 'paris-2024'
+
+# Event genders as the medal importers write them, to the codes the event importer uses
+GENDER_CODES = {'Men': 'M', 'Women': 'W', 'Mixed': 'X'}
+
+
+def parse_names(value):
+	"""The items of a list as the Paris 2024 datasets write them, "['A', 'B']", or of a plain "A, B"."""
+	value = (value or '').strip()
+	if value.startswith('['):
+		try:
+			items = ast.literal_eval(value)
+		except (ValueError, SyntaxError):
+			# "['Men's 100m']" isn't a valid literal
+			items = value[1:-1].split(',')
+	else:
+		items = value.split(',')
+
+	names = (str(item).strip().strip('\'"').strip() for item in items)
+	return [name for name in names if name]
+
+
+def split_event_name(name):
+	"""(gender code, name) of an event name like "Women's 4 x 100m Relay", as import_events_paris2024 stores it."""
+	for prefix, genderCode in (("Women's ", 'W'), ("Men's ", 'M'), ('Mixed ', 'X')):
+		if name.startswith(prefix):
+			return genderCode, name[len(prefix):].strip()
+	return None, name.strip()
+
+
+def get_discipline_ids(names, disciplineIdsByName):
+	"""Codes of the disciplines named, ignoring names that aren't a Discipline."""
+	return {disciplineIdsByName[name.lower()] for name in names if name.lower() in disciplineIdsByName}
+
+
+def get_athlete_ids(codes):
+	"""Athlete primary keys from a team's list of athlete codes, skipping anything that can't be one."""
+	return {int(code) for code in codes if code.isdigit()}
+
+
+class EventIndex:
+	"""Finds the Events that athletes' event entries (like "Men's 100m") refer to.
+
+	The medal importers store that as the event's name, with a gender of Men, while the event
+	importer splits it into a gender code M and the name 100m; both are matched.
+	"""
+
+	def __init__(self, events):
+		"""`events` are (id, discipline code, name, gender) of the events entries can refer to."""
+		self.eventsByKey = {}
+		for eventId, disciplineId, name, gender in events:
+			for key in [(None, name.lower()), (GENDER_CODES.get(gender, gender), name.lower())]:
+				self.eventsByKey.setdefault(key, set()).add((eventId, disciplineId))
+
+	def resolve(self, names, disciplineIds=()):
+		"""IDs of the events named, only of `disciplineIds` if any are given."""
+		eventIds = set()
+		for name in names:
+			genderCode, shortName = split_event_name(name)
+			for key in [(None, name.lower()), (genderCode, shortName.lower())]:
+				for eventId, disciplineId in self.eventsByKey.get(key, ()):
+					if not disciplineIds or disciplineId in disciplineIds:
+						eventIds.add(eventId)
+
+		return eventIds
@@ -0,0 +1,328 @@
+import contextlib
+import math
+import re
+import threading
+import unicodedata
+
+from django.db import OperationalError, connections, router
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from tally_app.models import Athlete, Country, Discipline, Event, Medal, OverallMedalTally, SearchDocument
+
+
+# FTS5 index over SearchDocument on SQLite. It is an external content table: the text lives in
+# SearchDocument only, and the triggers below keep the index in step with its rows. Prefixes of
+# 2 and 3 characters are indexed as well, so the short queries typed into the search box are
+# answered from the index rather than by scanning every term.
+FTS_TABLE = 'tally_app_searchdocument_fts'
+
+CREATE_FTS_SQL = [
+	f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+		title, text,
+		content='tally_app_searchdocument', content_rowid='id',
+		tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+	)""",
+	f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON tally_app_searchdocument BEGIN
+		INSERT INTO {FTS_TABLE}(rowid, title, text) VALUES (new.id, new.title, new.text);
+	END""",
+	f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON tally_app_searchdocument BEGIN
+		INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+	END""",
+	f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON tally_app_searchdocument BEGIN
+		INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+		INSERT INTO {FTS_TABLE}(rowid, title, text) VALUES (new.id, new.title, new.text);
+	END""",
+]
+
+DROP_FTS_SQL = [
+	f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+	f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+	f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+	f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+# A title match counts for this many matches elsewhere in the text
+TITLE_WEIGHT = 10.0
+
+# Up to about half the boost of an athlete with a medal
+FIRST_GAMES_YEAR = 1896
+EVENT_BOOST_PER_YEAR = 0.0025
+
+DEFAULT_LIMIT = 20
+MAX_QUERY_TERMS = 8
+
+
+def normalize_text(text):
+	"""Lowercased words of `text` without accents, separated by single spaces: "Ángel Martínez" -> "angel martinez"."""
+	text = text or ''
+	if not text.isascii():
+		text = unicodedata.normalize('NFKD', text)
+		text = ''.join(char for char in text if not unicodedata.combining(char))
+	return ' '.join(re.findall(r'\w+', text.casefold()))
+
+
+def get_terms(query):
+	"""The words of a search query, at most MAX_QUERY_TERMS of them."""
+	return normalize_text(query).split()[:MAX_QUERY_TERMS]
+
+
+### The full-text index
+
+def create_full_text_index(connection):
+	"""Create the FTS5 table and its triggers, if the database is SQLite with FTS5.
+
+	Returns whether the index exists. A table rebuild of SearchDocument by a later
+	migration drops the triggers, run `manage.py rebuild_search_index` after one.
+	"""
+	if connection.vendor != 'sqlite':
+		return False
+
+	try:
+		with connection.cursor() as cursor:
+			for sql in CREATE_FTS_SQL:
+				cursor.execute(sql)
+	except OperationalError:
+		# SQLite built without FTS5
+		return False
+
+	has_full_text_index.cache_clear()
+	return True
+
+
+def drop_full_text_index(connection):
+	if connection.vendor == 'sqlite':
+		with connection.cursor() as cursor:
+			for sql in DROP_FTS_SQL:
+				cursor.execute(sql)
+		has_full_text_index.cache_clear()
+
+
+def rebuild_full_text_index(connection):
+	"""Index every SearchDocument row again, e.g. after rows were written with the triggers missing."""
+	if create_full_text_index(connection):
+		with connection.cursor() as cursor:
+			cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class FullTextIndexCache:
+	"""Whether each database has the FTS5 table, looked up once per database."""
+
+	def __init__(self):
+		self.found = {}
+
+	def __call__(self, connection):
+		key = (connection.alias, connection.settings_dict['NAME'])
+		if key not in self.found:
+			self.found[key] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+		return self.found[key]
+
+	def cache_clear(self):
+		self.found.clear()
+
+
+has_full_text_index = FullTextIndexCache()
+
+
+### Documents
+
+# Builders yield (objectId, values of these fields) per object. Plain tuples, and URLs formatted from
+# one reverse() per view, keep a refresh of every document to a fraction of a second.
+DOCUMENT_FIELDS = ['title', 'detail', 'url', 'text', 'boost']
+
+
+def get_url_format(viewName, **kwargs):
+	"""reverse() with the placeholder values in kwargs swapped for {name}, to fill in with str.format()."""
+	url = reverse(viewName, kwargs=kwargs)
+	for name, placeholder in kwargs.items():
+		url = url.replace(str(placeholder), f'{{{name}}}')
+	return url
+
+
+def get_athlete_documents(athleteIds=None):
+	athletes = Athlete.objects.all() if athleteIds is None else Athlete.objects.filter(pk__in=athleteIds)
+	medals = Medal.objects.filter(athlete__in=athletes)
+	eventUrl = get_url_format('tally:event_detail', pk=999999999)
+	countryUrl = get_url_format('tally:country', code='COUNTRYCODE')
+
+	# Athletes have no page of their own, their latest medal's event stands in for one
+	numMedals, latestMedals = {}, {}
+	for athleteId, eventId in medals.values_list('athlete_id', 'event_id').order_by('event__host__year', 'id'):
+		numMedals[athleteId] = numMedals.get(athleteId, 0) + 1
+		latestMedals[athleteId] = eventId
+
+	values = athletes.values_list('id', 'name', 'shortName', 'displayName', 'country__code', 'country__fullName')
+	for athleteId, name, shortName, displayName, code, countryName in values.iterator():
+		if athleteId in latestMedals:
+			url = eventUrl.format(pk=latestMedals[athleteId])
+		else:
+			url = countryUrl.format(code=code)
+		yield str(athleteId), (
+			displayName or name,
+			countryName,
+			url,
+			normalize_text(' '.join([name, shortName, displayName, countryName])),
+			math.log1p(numMedals.get(athleteId, 0)),
+		)
+
+
+def get_country_documents(codes=None):
+	countries = Country.objects.all() if codes is None else Country.objects.filter(code__in=codes)
+	totals = dict(OverallMedalTally.objects.filter(country__in=countries).values_list('country__code', 'total'))
+	countryUrl = get_url_format('tally:country', code='COUNTRYCODE')
+
+	for fullName, code in countries.values_list('fullName', 'code'):
+		yield code, (
+			fullName,
+			code,
+			countryUrl.format(code=code),
+			normalize_text(f'{fullName} {code}'),
+			math.log1p(max(totals.get(code) or 0, 0)),
+		)
+
+
+def get_event_documents(eventIds=None):
+	events = Event.objects.all() if eventIds is None else Event.objects.filter(pk__in=eventIds)
+	genders = dict(Event.GENDER_CHOICES)
+	eventUrl = get_url_format('tally:event_detail', pk=999999999)
+
+	values = events.values_list('id', 'name', 'gender', 'discipline__name', 'host__name', 'host__year')
+	for eventId, name, gender, disciplineName, hostName, year in values.iterator():
+		# Medal importers store the gender as Men, Women or Mixed, the event importer as M, W or X
+		gender = genders.get(gender, gender)
+		yield str(eventId), (
+			f'{disciplineName} {name}' if name else disciplineName,
+			f'{gender}, {hostName}',
+			eventUrl.format(pk=eventId),
+			normalize_text(f'{name} {disciplineName} {gender} {hostName}'),
+			# The same event is held at every Games, the latest ones come first
+			(year - FIRST_GAMES_YEAR) * EVENT_BOOST_PER_YEAR,
+		)
+
+
+def get_discipline_documents(codes=None):
+	disciplines = Discipline.objects.all() if codes is None else Discipline.objects.filter(code__in=codes)
+
+	for code, name, sport, numEvents in disciplines.annotate(numEvents=Count('events')).values_list('code', 'name', 'sport', 'numEvents'):
+		yield code, (
+			name,
+			sport if sport != name else '',
+			# Disciplines have no page, their events do
+			f"{reverse('search')}?{urlencode({'q': name, 'kind': SearchDocument.EVENT})}",
+			normalize_text(f'{name} {sport}'),
+			math.log1p(numEvents),
+		)
+
+
+DOCUMENT_BUILDERS = {
+	SearchDocument.ATHLETE: get_athlete_documents,
+	SearchDocument.COUNTRY: get_country_documents,
+	SearchDocument.EVENT: get_event_documents,
+	SearchDocument.DISCIPLINE: get_discipline_documents,
+}
+
+
+def save_documents(kind, documents, objectIds=None):
+	"""Bring the index of `kind` in line with `documents`, for the objects in `objectIds` (all by default).
+
+	Only rows that changed are written, so a refresh after a small import is a small write.
+	Returns the number of rows (inserted, updated, deleted).
+	"""
+	existing = SearchDocument.objects.filter(kind=kind)
+	if objectIds is not None:
+		existing = existing.filter(objectId__in=[str(objectId) for objectId in objectIds])
+	existing = {row[1]: (row[0], row[2:]) for row in existing.values_list('id', 'objectId', *DOCUMENT_FIELDS)}
+
+	inserts, updates = [], []
+	for objectId, values in documents:
+		pk, currentValues = existing.pop(objectId, (None, None))
+		if values != currentValues:
+			document = SearchDocument(pk=pk, kind=kind, objectId=objectId, **dict(zip(DOCUMENT_FIELDS, values)))
+			(inserts if pk is None else updates).append(document)
+
+	# Concurrent import stages may refresh at the same time, a row another one inserted is left to it
+	SearchDocument.objects.bulk_create(inserts, batch_size=500, ignore_conflicts=True)
+	SearchDocument.objects.bulk_update(updates, DOCUMENT_FIELDS, batch_size=500)
+	SearchDocument.objects.filter(pk__in=[pk for pk, values in existing.values()]).delete()
+	return len(inserts), len(updates), len(existing)
+
+
+def refresh_search_index(kinds=None):
+	"""Index every athlete, country, event and discipline (or those of `kinds`) as they are now."""
+	counts = {}
+	for kind in kinds or DOCUMENT_BUILDERS:
+		counts[kind] = save_documents(kind, DOCUMENT_BUILDERS[kind]())
+	return counts
+
+
+def index_objects(kind, objectIds):
+	"""Index the given objects of `kind` again, dropping those that no longer exist."""
+	if not is_indexing_deferred():
+		objectIds = list(objectIds)
+		save_documents(kind, DOCUMENT_BUILDERS[kind](objectIds), objectIds)
+
+
+_deferred = threading.local()
+
+
+def is_indexing_deferred():
+	return getattr(_deferred, 'depth', 0) > 0
+
+
+@contextlib.contextmanager
+def deferred_indexing():
+	"""Leave single saves unindexed in this thread, and refresh the whole index once at the end.
+
+	Importers write thousands of rows, many of them with bulk writes that send no signals;
+	one refresh afterwards is both cheaper and complete.
+	"""
+	_deferred.depth = getattr(_deferred, 'depth', 0) + 1
+	try:
+		yield
+	finally:
+		_deferred.depth -= 1
+		if not _deferred.depth:
+			refresh_search_index()
+
+
+### Searching
+
+def search(query, kind=None, limit=DEFAULT_LIMIT):
+	"""SearchDocuments matching every word of `query` as a word prefix, best matches first.
+
+	Matches are ranked by BM25, with title matches weighing more, plus each document's boost.
+	"""
+	terms = get_terms(query)
+	if not terms or limit < 1:
+		return []
+
+	connection = connections[router.db_for_read(SearchDocument)]
+	if has_full_text_index(connection):
+		return search_full_text(terms, kind, limit)
+	return search_fallback(terms, kind, limit)
+
+
+def search_full_text(terms, kind, limit):
+	# Terms are runs of word characters, quoting them keeps FTS5 from reading any as an operator
+	match = ' '.join(f'"{term}"*' for term in terms)
+	kindFilter = 'AND document.kind = %s' if kind else ''
+	return list(SearchDocument.objects.raw(
+		f"""SELECT document.* FROM {FTS_TABLE}
+		JOIN tally_app_searchdocument document ON document.id = {FTS_TABLE}.rowid
+		WHERE {FTS_TABLE} MATCH %s {kindFilter}
+		ORDER BY bm25({FTS_TABLE}, {TITLE_WEIGHT}, 1.0) - document.boost, document.title
+		LIMIT %s""",
+		[match, *([kind] if kind else []), limit],
+	))
+
+
+def search_fallback(terms, kind, limit):
+	"""search() for databases without the FTS5 index: a scan of the text, ranked by boost alone."""
+	documents = SearchDocument.objects.all()
+	if kind:
+		documents = documents.filter(kind=kind)
+	for term in terms:
+		documents = documents.filter(Q(text__startswith=term) | Q(text__contains=f' {term}'))
+
+	return list(documents.order_by('-boost', 'title')[:limit])
@@ -0,0 +1,120 @@
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from tally_app.models import Athlete, Country, Discipline, Event, Host, Medal, OverallMedalTally, SearchDocument, Team
+from tally_app.page_cache import bump_dataset_version
+from tally_app.search import index_objects
+from tally_app.tally import add_medal, defer_tally, is_tally_deferred
+
+
+def get_tally_key(medal):
+	if medal.event_id is None:
+		return None
+	# Use the event if it's loaded already, rather than fetching all of it for its host
+	if Medal.event.is_cached(medal):
+		hostId = medal.event.host_id
+	else:
+		hostId = Event.objects.filter(pk=medal.event_id).values_list('host_id', flat=True).first()
+	return medal.country_id, hostId, medal.rank
+
+
+@receiver(pre_save, sender=Medal)
+def remember_previous_tally_key(sender, instance, **kwargs):
+	instance._previousTallyKey = None
+	if instance.pk is not None:
+		instance._previousTallyKey = Medal.objects.filter(pk=instance.pk).values_list(
+			'country_id', 'event__host_id', 'rank'
+		).first()
+
+
+@receiver(post_save, sender=Medal)
+def update_tally_on_save(sender, instance, **kwargs):
+	# Pages show more of a medal than its tally (its date, its winner), any save makes them stale
+	bump_dataset_version()
+
+	previousKey = getattr(instance, '_previousTallyKey', None)
+	currentKey = get_tally_key(instance)
+	if previousKey == currentKey:
+		return
+
+	# Importers recount the tallies once they're done, see tally_app.tally.deferred_tallies
+	if is_tally_deferred():
+		for countryId, hostId, rank in filter(None, [previousKey, currentKey]):
+			defer_tally(countryId, hostId)
+		return
+
+	if previousKey is not None:
+		add_medal(*previousKey, count=-1)
+	if currentKey is not None:
+		add_medal(*currentKey)
+
+
+@receiver(post_delete, sender=Medal)
+def update_tally_on_delete(sender, instance, **kwargs):
+	tallyKey = get_tally_key(instance)
+	if tallyKey is not None and is_tally_deferred():
+		defer_tally(*tallyKey[:2])
+	elif tallyKey is not None:
+		add_medal(*tallyKey, count=-1)
+	bump_dataset_version()
+
+
+@receiver(post_save, sender=Country)
+def create_overall_tally(sender, instance, created, raw=False, **kwargs):
+	# Every country has a row in the overall table, medals or not
+	if created and not raw:
+		OverallMedalTally.objects.get_or_create(country=instance)
+
+
+@receiver([post_save, post_delete], sender=Host)
+@receiver([post_save, post_delete], sender=Country)
+@receiver([post_save, post_delete], sender=Discipline)
+@receiver([post_save, post_delete], sender=Event)
+@receiver([post_save, post_delete], sender=Athlete)
+@receiver([post_save, post_delete], sender=Team)
+def bump_dataset_version_on_change(sender, **kwargs):
+	bump_dataset_version()
+
+
+@receiver([post_save, post_delete], sender=Athlete)
+@receiver([post_save, post_delete], sender=Country)
+@receiver([post_save, post_delete], sender=Event)
+@receiver([post_save, post_delete], sender=Discipline)
+def update_search_index(sender, instance, raw=False, **kwargs):
+	# Importers defer this and refresh the whole index once they're done, see tally_app.search
+	if raw:
+		return
+	if sender is Athlete:
+		index_objects(SearchDocument.ATHLETE, [instance.pk])
+	elif sender is Country:
+		index_objects(SearchDocument.COUNTRY, [instance.code])
+	elif sender is Event:
+		index_objects(SearchDocument.EVENT, [instance.pk])
+	else:
+		index_objects(SearchDocument.DISCIPLINE, [instance.pk])
+		# Events are found by the name of their discipline too
+		if kwargs['signal'] is post_save:
+			index_objects(SearchDocument.EVENT, instance.events.values_list('pk', flat=True))
+
+
+def is_deleted_with(origin, model, pk):
+	"""Whether the delete that started at `origin` (a post_delete argument) also deletes `model` object `pk`."""
+	if isinstance(origin, model):
+		return origin.pk == pk
+	if isinstance(origin, QuerySet) and origin.model is model:
+		# Cascades delete the Medals first, the rows of the origin are still there
+		return origin.filter(pk=pk).exists()
+	return False
+
+
+@receiver([post_save, post_delete], sender=Medal)
+def update_search_index_of_winner(sender, instance, raw=False, origin=None, **kwargs):
+	# Athletes link to their latest medal, and athletes and countries rank by their medal counts.
+	# When the winner or country goes along with the medal, it leaves the index itself.
+	if raw:
+		return
+	if instance.athlete_id is not None and not is_deleted_with(origin, Athlete, instance.athlete_id):
+		index_objects(SearchDocument.ATHLETE, [instance.athlete_id])
+	if not is_deleted_with(origin, Country, instance.country_id):
+		index_objects(SearchDocument.COUNTRY, Country.objects.filter(pk=instance.country_id).values_list('code', flat=True))
@@ -0,0 +1,116 @@
+import json
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+
+# Milliseconds from the start of the WSGI entry point's imports to the first rendered response
+STARTUP_BUDGET_MS = 2000
+
+# Packages the site must not import before it has served a page
+HEAVY_MODULES = ('pandas', 'numpy', 'plotly', 'kaggle')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+# Run in a fresh interpreter, the way a serverless function starts: import the WSGI entry
+# point and serve one request through it
+STARTUP_SCRIPT = '''
+import json, os, sys, time
+from wsgiref.util import setup_testing_defaults
+
+startTime = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'olympics.settings')
+from django.conf import settings
+if {database!r}:
+	settings.DATABASES['default']['NAME'] = {database!r}
+settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'startup-profile']
+
+from olympics.wsgi import app
+importedTime = time.perf_counter()
+
+path, _, query = {url!r}.partition('?')
+environ = {{'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_HOST': 'startup-profile'}}
+setup_testing_defaults(environ)
+statuses = []
+body = b''.join(app(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+respondedTime = time.perf_counter()
+
+print(json.dumps({{
+	'status': int(statuses[0].split()[0]),
+	'size': len(body),
+	'importSeconds': importedTime - startTime,
+	'responseSeconds': respondedTime - startTime,
+	'modules': sorted(sys.modules),
+}}))
+'''
+
+
+class ModuleImport:
+	"""One line of `python -X importtime` output, times in microseconds."""
+
+	def __init__(self, name, selfTime, cumulativeTime, depth):
+		self.name = name
+		self.selfTime = selfTime
+		self.cumulativeTime = cumulativeTime
+		self.depth = depth
+
+	def __repr__(self):
+		return f'ModuleImport({self.name!r}, {self.selfTime}, {self.cumulativeTime})'
+
+
+def parse_importtime(output):
+	"""The ModuleImports in `-X importtime` output, ignoring any other lines."""
+	imports = []
+	for line in output.splitlines():
+		if match := IMPORTTIME_LINE.match(line):
+			selfTime, cumulativeTime, indent, name = match.groups()
+			imports.append(ModuleImport(name, int(selfTime), int(cumulativeTime), len(indent) // 2))
+	return imports
+
+
+class StartupProfile:
+
+	def __init__(self, url, status, size, importSeconds, responseSeconds, wallSeconds, imports, modules):
+		self.url = url
+		self.status = status
+		self.size = size
+		self.importSeconds = importSeconds
+		self.responseSeconds = responseSeconds
+		self.wallSeconds = wallSeconds
+		self.imports = imports
+		self.modules = set(modules)
+
+	@property
+	def heavyModules(self):
+		return [name for name in HEAVY_MODULES if name in self.modules]
+
+	def get_slowest_imports(self, count=20, maxDepth=None):
+		"""The imports taking the longest including what they import, optionally only down to maxDepth."""
+		imports = [module for module in self.imports if maxDepth is None or module.depth <= maxDepth]
+		return sorted(imports, key=lambda module: module.cumulativeTime, reverse=True)[:count]
+
+
+def profile_startup(url='/', database=None):
+	"""Start a new interpreter, import the site and serve `url` once, and report how long it took.
+
+	`database` replaces the default database's NAME in that interpreter.
+	"""
+	script = STARTUP_SCRIPT.format(url=url, database=str(database or ''))
+	startTime = time.perf_counter()
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', script],
+		cwd=settings.BASE_DIR, capture_output=True, text=True,
+	)
+	wallSeconds = time.perf_counter() - startTime
+
+	if result.returncode != 0:
+		raise RuntimeError(f'Startup profile of {url} failed:\n{result.stderr[-2000:]}')
+
+	data = json.loads(result.stdout.strip().splitlines()[-1])
+	return StartupProfile(
+		url, data['status'], data['size'], data['importSeconds'], data['responseSeconds'], wallSeconds,
+		parse_importtime(result.stderr), data['modules'],
+	)
@@ -0,0 +1,49 @@
+import functools
+import importlib.util
+from pathlib import Path
+
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.files.storage import FileSystemStorage
+
+from tally_app.ingest import get_file_hash
+
+
+def get_plotly_js_source():
+	"""The plotly.js bundle shipped inside the plotly package, found without importing plotly."""
+	spec = importlib.util.find_spec('plotly')
+	return Path(spec.submodule_search_locations[0]) / 'package_data' / 'plotly.min.js'
+
+
+@functools.cache
+def get_plotly_js_path():
+	"""Static path of the plotly.js bundle, named after its contents so it can be cached for good."""
+	return f'tally_app/js/plotly.{get_file_hash(get_plotly_js_source())[:12]}.min.js'
+
+
+class PlotlyJsStorage(FileSystemStorage):
+	"""Read-only storage holding just the plotly.js bundle under its fingerprinted name."""
+
+	def path(self, name):
+		if name != get_plotly_js_path():
+			raise FileNotFoundError(name)
+		return str(get_plotly_js_source())
+
+
+class PlotlyJsFinder(BaseFinder):
+	"""Static files finder serving plotly.js from the installed plotly package.
+
+	The bundle is several megabytes, so rather than keeping a copy in static/ it is picked up
+	from the package by collectstatic (and runserver), under get_plotly_js_path().
+	"""
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.storage = PlotlyJsStorage()
+
+	def find(self, path, all=False, **kwargs):
+		if path == get_plotly_js_path():
+			return [self.storage.path(path)] if all else self.storage.path(path)
+		return []
+
+	def list(self, ignore_patterns):
+		yield get_plotly_js_path(), self.storage
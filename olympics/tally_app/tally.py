@@ -0,0 +1,189 @@
+import contextlib
+import threading
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from tally_app.models import Country, Host, Medal, MedalTally, OverallMedalTally
+from tally_app.pagination import paginate_keyset
+
+
+RANK_FIELDS = {
+	Medal.GOLD: 'gold',
+	Medal.SILVER: 'silver',
+	Medal.BRONZE: 'bronze',
+}
+
+# How the overall table sorts by each column, in ascending order; each matches an index on OverallMedalTally
+OVERALL_TALLY_ORDERINGS = {
+	'country': ['country_id'],
+	'gold': ['gold', 'silver', 'bronze', 'country_id'],
+	'silver': ['silver', 'gold', 'bronze', 'country_id'],
+	'bronze': ['bronze', 'gold', 'silver', 'country_id'],
+	'total': ['total', 'gold', 'silver', 'bronze', 'country_id'],
+}
+
+
+def count_medals(medals):
+	"""Medal counts of a Medal queryset per (country, host), as MedalTally field values."""
+	return medals.values(
+		'country_id', host_id=F('event__host_id'),
+	).annotate(
+		gold=Count('id', filter=Q(rank=Medal.GOLD)),
+		silver=Count('id', filter=Q(rank=Medal.SILVER)),
+		bronze=Count('id', filter=Q(rank=Medal.BRONZE)),
+		total=Count('id'),
+	).order_by()
+
+
+def add_medal(countryId, hostId, rank, count=1):
+	"""Add `count` medals of `rank` to a country's tally at a Games (remove them if negative)."""
+	updates = {'total': F('total') + count}
+	if rank in RANK_FIELDS:
+		updates[RANK_FIELDS[rank]] = F(RANK_FIELDS[rank]) + count
+
+	tallies = MedalTally.objects.filter(country_id=countryId, host_id=hostId)
+	if count > 0:
+		MedalTally.objects.get_or_create(country_id=countryId, host_id=hostId)
+	tallies.update(**updates)
+	if count < 0:
+		tallies.filter(total__lte=0).delete()
+
+	# Removing medals never creates a row: the country may be being deleted along with them
+	overallTallies = OverallMedalTally.objects.filter(country_id=countryId)
+	if count > 0:
+		OverallMedalTally.objects.get_or_create(country_id=countryId)
+	overallTallies.update(**updates)
+	if count < 0:
+		overallTallies.filter(total__lte=0).delete()
+
+
+def refresh_tallies(pairs):
+	"""Recount the tallies of the given (country, host) pairs, e.g. after a bulk insert of Medals."""
+	pairs = set(pairs)
+	if not pairs:
+		return
+
+	countryIds = {countryId for countryId, hostId in pairs}
+	hostIds = {hostId for countryId, hostId in pairs}
+	tallies = [
+		MedalTally(**counts)
+		for counts in count_medals(Medal.objects.filter(country_id__in=countryIds, event__host_id__in=hostIds))
+		if (counts['country_id'], counts['host_id']) in pairs
+	]
+	MedalTally.objects.bulk_create(
+		tallies,
+		update_conflicts=True,
+		unique_fields=['country', 'host'],
+		update_fields=['gold', 'silver', 'bronze', 'total'],
+	)
+
+	emptyPairs = pairs - {(tally.country_id, tally.host_id) for tally in tallies}
+	if emptyPairs:
+		MedalTally.objects.filter(pk__in=[
+			pk for pk, countryId, hostId in MedalTally.objects.filter(
+				country_id__in=countryIds, host_id__in=hostIds
+			).values_list('pk', 'country_id', 'host_id')
+			if (countryId, hostId) in emptyPairs
+		]).delete()
+
+	refresh_overall_tallies(countryIds)
+
+
+_deferred = threading.local()
+
+
+def is_tally_deferred():
+	return getattr(_deferred, 'depth', 0) > 0
+
+
+def defer_tally(countryId, hostId):
+	"""Recount a country's tally at a Games when the current deferred_tallies() block ends."""
+	_deferred.pairs.add((countryId, hostId))
+
+
+@contextlib.contextmanager
+def deferred_tallies():
+	"""Leave the tallies alone on single Medal saves in this thread, and recount the ones they touched at the end.
+
+	Keeping a tally in step with each save costs several queries; a row by row import of
+	thousands of Medals is better off with one refresh_tallies() afterwards.
+	"""
+	if not is_tally_deferred():
+		_deferred.pairs = set()
+	_deferred.depth = getattr(_deferred, 'depth', 0) + 1
+	try:
+		yield
+	finally:
+		_deferred.depth -= 1
+		if not _deferred.depth:
+			refresh_tallies(_deferred.pairs)
+			_deferred.pairs = None
+
+
+def refresh_overall_tallies(countryIds=None):
+	"""Sum the tallies of the given countries (all of them by default) into their overall tallies."""
+	countries = Country.objects.all() if countryIds is None else Country.objects.filter(pk__in=countryIds)
+	OverallMedalTally.objects.bulk_create(
+		[
+			OverallMedalTally(country_id=countryId, gold=gold, silver=silver, bronze=bronze, total=total)
+			for countryId, gold, silver, bronze, total in annotate_medal_totals(countries).values_list(
+				'pk', 'num_gold_medals', 'num_silver_medals', 'num_bronze_medals', 'total_medals'
+			)
+		],
+		update_conflicts=True,
+		unique_fields=['country'],
+		update_fields=['gold', 'silver', 'bronze', 'total'],
+	)
+
+
+def rebuild_tallies():
+	"""Throw away every tally and count them again from the Medal table. Returns the number of tallies."""
+	with transaction.atomic():
+		MedalTally.objects.all().delete()
+		tallies = MedalTally.objects.bulk_create(MedalTally(**counts) for counts in count_medals(Medal.objects.all()))
+		refresh_overall_tallies()
+
+	return len(tallies)
+
+
+def annotate_medal_totals(queryset, tallyFilter=None):
+	"""Annotate Countries or Hosts with num_gold_medals, num_silver_medals, num_bronze_medals
+	and total_medals summed over their tallies (only those matching tallyFilter, if given).
+	"""
+	return queryset.annotate(
+		num_gold_medals=Coalesce(Sum('tallies__gold', filter=tallyFilter), 0),
+		num_silver_medals=Coalesce(Sum('tallies__silver', filter=tallyFilter), 0),
+		num_bronze_medals=Coalesce(Sum('tallies__bronze', filter=tallyFilter), 0),
+		total_medals=Coalesce(Sum('tallies__total', filter=tallyFilter), 0),
+	)
+
+
+def get_tally_ordering(sort, direction='asc'):
+	"""The keyset ordering of a medal table sorted by `sort` ('gold', 'country'...) in `direction`."""
+	ordering = OVERALL_TALLY_ORDERINGS[sort]
+	return [f'-{field}' for field in ordering] if direction == 'desc' else list(ordering)
+
+
+def get_overall_tally_page(sort='gold', direction='desc', pageSize=50, after=None, before=None, withOffset=True):
+	"""A page of the all-time medal table, read from OverallMedalTally with keyset pagination.
+
+	Raises KeyError for an unknown sort and InvalidCursor for a bad cursor.
+	"""
+	tallies = OverallMedalTally.objects.select_related('country')
+	return paginate_keyset(tallies, get_tally_ordering(sort, direction), pageSize, after=after, before=before, withOffset=withOffset)
+
+
+def get_medal_series(country, season=None):
+	"""A country's medal counts at every Games (of one season, if given) in year order, as lists."""
+	hosts = Host.objects.all() if season is None else Host.objects.filter(season=season)
+	medalData = annotate_medal_totals(hosts, tallyFilter=Q(tallies__country=country)).order_by('year').values_list(
+		'year', 'num_gold_medals', 'num_silver_medals', 'num_bronze_medals', 'total_medals'
+	)
+
+	series = {'year': [], 'gold': [], 'silver': [], 'bronze': [], 'total': []}
+	for row in medalData:
+		for values, value in zip(series.values(), row):
+			values.append(value)
+	return series
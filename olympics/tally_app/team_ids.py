@@ -0,0 +1,42 @@
+from tally_app.models import Team
+
+
+def get_team_id_prefix(disciplineCode, genderCode, eventName, countryCode, year):
+	"""Team IDs are <discipline><gender><first 8 chars of event><country><year><2-digit number>."""
+	eventCode = eventName[:8].ljust(8, '-')
+	return f'{disciplineCode}{genderCode}{eventCode}{countryCode}{year}'.upper()
+
+
+class TeamIdAllocator:
+	"""Hands out the next free Team ID for a prefix from memory.
+
+	The latest team number of every prefix is loaded from the database with a single
+	query the first time an ID is needed, after which allocation needs no queries.
+	One allocator should be used for the whole of an import run so IDs it has handed
+	out (or that were reserved explicitly) are never handed out again.
+	"""
+
+	def __init__(self):
+		self.latestNumbers = None
+
+	def load(self):
+		self.latestNumbers = {}
+		for teamId in Team.objects.values_list('id', flat=True):
+			self.reserve(teamId)
+
+	def reserve(self, teamId):
+		"""Record an ID that was built elsewhere (e.g. from an official team code)."""
+		if self.latestNumbers is None:
+			self.load()
+
+		prefix, number = teamId[:-2].upper(), teamId[-2:]
+		if number.isdigit():
+			self.latestNumbers[prefix] = max(self.latestNumbers.get(prefix, 0), int(number))
+
+	def next_id(self, prefix):
+		if self.latestNumbers is None:
+			self.load()
+
+		prefix = prefix.upper()
+		self.latestNumbers[prefix] = self.latestNumbers.get(prefix, 0) + 1
+		return f'{prefix}{self.latestNumbers[prefix]:02d}'
@@ -1,3 +1,1515 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.apps import apps
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from tally_app.models import Country, Athlete, Team, Medal, Event, Discipline, Host, MedalTally, OverallMedalTally, ImportCheckpoint, SearchDocument
+from tally_app.flags import FlagResolver, MISSING_FLAG_URL
+from tally_app.team_ids import TeamIdAllocator, get_team_id_prefix
+from tally_app.athletes import normalize_athlete_name
+from tally_app.normalize import MedalsAllNormalizer
+from tally_app.ingest import ingest_csv, iter_chunks, ChunkImportError
+from tally_app.delta import compute_delta
+from tally_app.pipeline import Stage, StageResult, run_stage, run_stages, check_stages
+from tally_app.datasets import DatasetCache, DatasetUnavailable, LocalBackend
+from tally_app.benchmark import SyntheticDataset, compare_results
+from tally_app.tally import OVERALL_TALLY_ORDERINGS, get_overall_tally_page, rebuild_tallies
+from tally_app.listings import with_winners
+from tally_app.pagination import InvalidCursor, decode_cursor
+from tally_app.navigation import get_navigation
+from tally_app.page_cache import bump_dataset_version, get_dataset_version
+from tally_app.static_assets import PlotlyJsFinder, get_plotly_js_path, get_plotly_js_source
+from tally_app.startup import STARTUP_BUDGET_MS, parse_importtime, profile_startup
+from tally_app.export import EXPORT_COLUMNS, iter_export
+from tally_app.prerender import get_output_path, prerender
+from tally_app.rosters import EventIndex, parse_names
+from tally_app.search import get_terms, has_full_text_index, index_objects, search, search_fallback
+from tally_app.management.commands.import_olympic_data import Command as ImportOlympicDataCommand
+from tally_app.management.commands.import_all import Command as ImportAllCommand
+
+
+MEDALS_ALL_FIELDS = [
+	'discipline_title', 'slug_game', 'event_title', 'event_gender', 'medal_type', 'participant_type',
+	'participant_title', 'athlete_url', 'athlete_full_name', 'country_name', 'country_code', 'country_3_letter_code',
+]
+
+
+def write_csv(rows, fieldnames):
+	"""Write rows to a temporary CSV file and return its path."""
+	file = tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False)
+	with file:
+		writer = csv.DictWriter(file, fieldnames=fieldnames)
+		writer.writeheader()
+		writer.writerows(rows)
+
+	return file.name
+
+
+def medals_all_row(**kwargs):
+	row = {
+		'discipline_title': 'Curling',
+		'slug_game': 'beijing-2022',
+		'event_title': 'Mixed Doubles',
+		'event_gender': 'Mixed',
+		'medal_type': 'GOLD',
+		'participant_type': 'GameTeam',
+		'participant_title': 'Italy',
+		'athlete_url': '',
+		'athlete_full_name': '',
+		'country_name': 'Italy',
+		'country_code': 'IT',
+		'country_3_letter_code': 'ITA',
+	}
+	row.update(kwargs)
+	return row
+
+
+class ImportTestCase(TestCase):
+
+	@classmethod
+	def setUpTestData(cls):
+		Country.objects.create(fullName='Italy', code='ITA', iso='IT', flagURL='https://example.com/it.png')
+		Country.objects.create(fullName='Norway', code='NOR', iso='NO', flagURL='https://example.com/no.png')
+		Discipline.objects.create(code='CUR', name='Curling', sport='Curling')
+		Discipline.objects.create(code='BTH', name='Biathlon', sport='Biathlon')
+		Host.objects.create(
+			id='beijing-2022', name='Beijing 2022', slug='beijing-2022', location='China', season='Winter',
+			year=2022, startDate='2022-02-04T15:00:00Z', endDate='2022-02-20T12:00:00Z',
+		)
+
+	def setUp(self):
+		# Rolling back a test doesn't send signals, so nothing cached may outlive it
+		cache.clear()
+		self.command = ImportOlympicDataCommand(stdout=StringIO(), stderr=StringIO())
+
+	def write_csv(self, rows, fieldnames):
+		path = write_csv(rows, fieldnames)
+		self.addCleanup(os.remove, path)
+		return path
+
+
+class ImportMedalsAllBulkTests(ImportTestCase):
+
+	def get_rows(self):
+		return [
+			medals_all_row(athlete_full_name='Stefania CONSTANTINI'),
+			medals_all_row(athlete_full_name='Amos MOSANER'),
+			medals_all_row(
+				discipline_title='Biathlon', event_title='Men 20km Individual', event_gender='Men',
+				participant_type='Athlete', athlete_full_name='Quentin FILLON MAILLET',
+				country_name='Norway', country_code='NO', country_3_letter_code='NOR', medal_type='SILVER',
+			),
+			medals_all_row(discipline_title='Luge', athlete_full_name='Unknown Discipline'),
+		]
+
+	def test_bulk_import_creates_medals(self):
+		path = self.write_csv(self.get_rows(), MEDALS_ALL_FIELDS)
+		self.command.import_medals_all_bulk(path)
+
+		self.assertEqual(Event.objects.count(), 2)
+		self.assertEqual(Athlete.objects.count(), 1)
+		# Both team member rows resolve to a single team medal
+		self.assertEqual(Team.objects.count(), 1)
+		self.assertEqual(Medal.objects.filter(rank=Medal.GOLD, country__code='ITA').count(), 1)
+		self.assertEqual(Medal.objects.filter(rank=Medal.SILVER, country__code='NOR').count(), 1)
+		self.assertIn('1 skipped', self.command.stdout.getvalue())
+		self.assertIn('queries', self.command.stdout.getvalue())
+
+	def test_bulk_import_is_idempotent(self):
+		path = self.write_csv(self.get_rows(), MEDALS_ALL_FIELDS)
+		self.command.import_medals_all_bulk(path)
+		self.command.import_medals_all_bulk(path)
+
+		self.assertEqual(Medal.objects.count(), 2)
+		self.assertEqual(Team.objects.count(), 1)
+		self.assertEqual(Athlete.objects.count(), 1)
+
+	def test_row_by_row_import_of_team_members_is_idempotent(self):
+		path = self.write_csv(self.get_rows(), MEDALS_ALL_FIELDS)
+		self.command.import_medals_all(path)
+		self.command.import_medals_all(path)
+
+		self.assertEqual(Team.objects.count(), 1)
+		self.assertEqual(Medal.objects.filter(rank=Medal.GOLD, country__code='ITA').count(), 1)
+		self.assertEqual(Medal.objects.count(), 2)
+		self.assertEqual(MedalTally.objects.get(country__code='ITA', host_id='beijing-2022').gold, 1)
+
+	def test_bulk_import_creates_missing_countries_without_prompting(self):
+		self.command.flagResolver = FlagResolver(offline=True, cachePath=None, specificFlagURLs={})
+		path = self.write_csv([
+			medals_all_row(country_name='Sweden', country_code='SE', country_3_letter_code='SWE'),
+		], MEDALS_ALL_FIELDS)
+		self.command.import_medals_all_bulk(path)
+
+		sweden = Country.objects.get(code='SWE')
+		self.assertTrue(sweden.flagURL.endswith('/se.png'))
+		self.assertEqual(sweden.medals.count(), 1)
+
+	def test_bulk_import_query_count_is_independent_of_row_count(self):
+		def count_queries(numRows, season):
+			rows = [
+				medals_all_row(
+					discipline_title='Biathlon', event_title=f'{season} {ii}km', event_gender='Men', participant_type='Athlete',
+					athlete_full_name=f'{season} Athlete {ii}', country_name='Norway', country_code='NO', country_3_letter_code='NOR',
+				)
+				for ii in range(numRows)
+			]
+			path = self.write_csv(rows, MEDALS_ALL_FIELDS)
+			with CaptureQueriesContext(connection) as queries:
+				self.command.import_medals_all_bulk(path)
+			return len(queries)
+
+		self.assertEqual(count_queries(5, 'Small'), count_queries(50, 'Large'))
+		self.assertEqual(Medal.objects.count(), 55)
+
+
+class MedalsAllNormalizerTests(ImportTestCase):
+
+	@classmethod
+	def setUpTestData(cls):
+		super().setUpTestData()
+		Discipline.objects.create(code='VVO', name='Indoor Volleyball', sport='Volleyball')
+		Discipline.objects.create(code='EDR', name='Equestrian Dressage', sport='Equestrian')
+
+	def test_rules_are_applied_to_whole_columns(self):
+		frame = MedalsAllNormalizer().normalize([
+			medals_all_row(medal_type='GOLD'),
+			medals_all_row(discipline_title='Volleyball', event_title='Women', event_gender='Women', medal_type='bronze'),
+			medals_all_row(discipline_title='Equestrian', event_title='Dressage Individual', event_gender='Mixed'),
+		])
+
+		self.assertEqual(list(frame['discipline_code']), ['CUR', 'VVO', 'EDR'])
+		self.assertEqual(list(frame['gender_code']), ['X', 'W', 'X'])
+		self.assertEqual(list(frame['rank']), ['Gold', 'Bronze', 'Gold'])
+		self.assertEqual(list(frame['year']), [2022] * 3)
+		self.assertEqual(frame['year'].dtype, 'int64')
+		self.assertEqual(list(frame['host_id']), ['beijing-2022'] * 3)
+
+	def test_unresolvable_rows_are_reported_together(self):
+		rows = [medals_all_row()] + [medals_all_row(discipline_title='Rugby')] * 3 + [
+			medals_all_row(slug_game='nowhere-1900'),
+			medals_all_row(medal_type='TIN'),
+		]
+		path = self.write_csv(rows, MEDALS_ALL_FIELDS)
+		self.command.import_medals_all(path)
+
+		output = self.command.stdout.getvalue()
+		self.assertEqual(Medal.objects.count(), 1)
+		self.assertIn('5 rows could not be resolved and were skipped', output)
+		self.assertIn('Discipline "Rugby" does not exist (3 rows)', output)
+		self.assertIn('Host game "nowhere-1900" does not exist (1 rows)', output)
+		self.assertIn('Unknown medal type "TIN" (1 rows)', output)
+
+
+class AthleteIndexTests(ImportTestCase):
+
+	def get_rows(self):
+		biathlete = dict(
+			discipline_title='Biathlon', event_gender='Men', participant_type='Athlete',
+			country_name='Norway', country_code='NO', country_3_letter_code='NOR',
+		)
+		return [
+			medals_all_row(**biathlete, event_title='Men 20km Individual', athlete_full_name='Johannes Thingnes BOE',
+				athlete_url='https://olympics.com/en/athletes/johannes-thingnes-boe'),
+			medals_all_row(**biathlete, event_title='Men 10km Sprint', athlete_full_name='BOE Johannes  Thingnes'),
+			medals_all_row(**biathlete, event_title='Men 12.5km Pursuit', athlete_full_name='Johannes T. BOE',
+				athlete_url='https://olympics.com/en/athletes/johannes-thingnes-boe'),
+			medals_all_row(**biathlete, event_title='Men 15km Mass Start', athlete_full_name='Tarjei BOE',
+				athlete_url='https://olympics.com/en/athletes/tarjei-boe'),
+		]
+
+	def test_normalize_athlete_name(self):
+		self.assertEqual(normalize_athlete_name('Marit BJØRGEN'), normalize_athlete_name('bjørgen,  Marit'))
+		self.assertEqual(normalize_athlete_name('Émilie Le Pennec'), 'emilie le pennec')
+
+	def test_name_variants_resolve_to_one_athlete(self):
+		for importFile in (self.command.import_medals_all_bulk, self.command.import_medals_all):
+			importFile(self.write_csv(self.get_rows(), MEDALS_ALL_FIELDS))
+
+			self.assertEqual(Athlete.objects.count(), 2)
+			johannes = Athlete.objects.get(sourceSlug='johannes-thingnes-boe')
+			self.assertEqual(johannes.medals.count(), 3)
+
+	def test_mixed_event_medals_resolve_to_the_same_athlete(self):
+		skier = dict(discipline_title='Biathlon', participant_type='Athlete', athlete_full_name='Dorothea WIERER')
+		rows = [
+			medals_all_row(**skier, event_title='Women 7.5km Sprint', event_gender='Women'),
+			medals_all_row(**skier, event_title='Mixed Relay', event_gender='Mixed', medal_type='SILVER'),
+			# A namesake from the same country in a men's event is someone else
+			medals_all_row(**skier, event_title='Men 10km Sprint', event_gender='Men'),
+		]
+		for importFile in (self.command.import_medals_all_bulk, self.command.import_medals_all):
+			importFile(self.write_csv(rows, MEDALS_ALL_FIELDS))
+
+			athletes = Athlete.objects.filter(name='Dorothea WIERER').order_by('id')
+			self.assertEqual([athlete.medals.count() for athlete in athletes], [2, 1])
+			Athlete.objects.all().delete()
+
+	def test_resolving_makes_no_queries_per_row(self):
+		self.command.import_medals_all_bulk(self.write_csv(self.get_rows(), MEDALS_ALL_FIELDS))
+
+		with CaptureQueriesContext(connection) as queries:
+			self.command.import_medals_all_bulk(self.write_csv(self.get_rows(), MEDALS_ALL_FIELDS))
+		self.assertFalse([query for query in queries if 'INSERT INTO "tally_app_athlete"' in query['sql']])
+		self.assertEqual(Athlete.objects.count(), 2)
+
+
+class TeamIdAllocatorTests(ImportTestCase):
+
+	def test_next_id_continues_from_existing_teams(self):
+		italy = Country.objects.get(code='ITA')
+		prefix = get_team_id_prefix('CUR', 'X', 'Mixed Doubles', 'ITA', 2022)
+		Team.objects.create(id=f'{prefix}01', country=italy, gender='Mixed', discipline='Curling')
+		Team.objects.create(id=f'{prefix}03', country=italy, gender='Mixed', discipline='Curling')
+
+		allocator = TeamIdAllocator()
+		allocator.load()
+		with self.assertNumQueries(0):
+			self.assertEqual(allocator.next_id(prefix), 'CURXMIXED DOITA202204')
+			self.assertEqual(allocator.next_id(prefix), 'CURXMIXED DOITA202205')
+			self.assertEqual(allocator.next_id(get_team_id_prefix('CUR', 'W', 'Team', 'ITA', 2022)), 'CURWTEAM----ITA202201')
+
+	def test_reserved_ids_are_skipped(self):
+		allocator = TeamIdAllocator()
+		allocator.reserve('ARCMTEAM3---CHN202401')
+
+		self.assertEqual(allocator.next_id('ARCMTEAM3---CHN2024'), 'ARCMTEAM3---CHN202402')
+
+
+class IngestTests(ImportTestCase):
+
+	def get_host_rows(self, numRows):
+		return [
+			{
+				'game_slug': f'games-{1900 + ii}', 'game_end_date': f'{1900 + ii}-08-20T00:00:00Z',
+				'game_start_date': f'{1900 + ii}-08-01T00:00:00Z', 'game_location': 'Somewhere',
+				'game_name': f'Games {1900 + ii}', 'game_season': 'Summer', 'game_year': 1900 + ii,
+			}
+			for ii in range(numRows)
+		]
+
+	def test_iter_chunks_streams_fixed_size_chunks(self):
+		path = self.write_csv(self.get_host_rows(7), list(self.get_host_rows(1)[0]))
+
+		self.assertEqual([len(rows) for rows in iter_chunks(path, 3)], [3, 3, 1])
+		self.assertEqual(next(iter_chunks(path, 3, startRow=5))[0]['game_slug'], 'games-1905')
+
+	def test_failed_chunk_is_rolled_back_and_resume_skips_committed_rows(self):
+		path = self.write_csv(self.get_host_rows(10), list(self.get_host_rows(1)[0]))
+		processed = []
+
+		def import_chunk(rows):
+			for row in rows:
+				if row['game_slug'] == 'games-1905' and not processed:
+					raise ValueError('bad row')
+			Host.objects.bulk_create([Host(id=row['game_slug'], slug=row['game_slug'], name=row['game_name'],
+				location=row['game_location'], season=row['game_season'], year=row['game_year'],
+				startDate=row['game_start_date'], endDate=row['game_end_date']) for row in rows])
+
+		with self.assertRaises(ChunkImportError) as context:
+			ingest_csv(path, import_chunk, chunkSize=4)
+
+		self.assertEqual((context.exception.firstRow, context.exception.lastRow), (5, 8))
+		self.assertEqual(Host.objects.filter(slug__startswith='games-').count(), 4)
+		self.assertEqual(ImportCheckpoint.objects.get().rowOffset, 4)
+
+		processed.append(True)
+		self.assertEqual(ingest_csv(path, import_chunk, chunkSize=4, resume=True), 6)
+		self.assertEqual(Host.objects.filter(slug__startswith='games-').count(), 10)
+
+	def test_resume_restarts_when_the_file_changed(self):
+		fieldnames = list(self.get_host_rows(1)[0])
+		path = self.write_csv(self.get_host_rows(3), fieldnames)
+		ingest_csv(path, lambda rows: None)
+
+		with open(path, 'a', newline='') as file:
+			csv.DictWriter(file, fieldnames=fieldnames).writerow(self.get_host_rows(4)[3])
+
+		self.assertEqual(ingest_csv(path, lambda rows: None, resume=True), 4)
+
+	def test_import_reports_progress_and_failed_chunks(self):
+		self.command.batchSize = 2
+		path = self.write_csv(self.get_host_rows(3), list(self.get_host_rows(1)[0]))
+
+		def import_chunk(rows):
+			if rows[0]['game_slug'] == 'games-1902':
+				raise ValueError('Broken row')
+		self.command.ingest(path, import_chunk)
+
+		output = self.command.stdout.getvalue()
+		self.assertIn('2/3 rows', output)
+		self.assertIn('Error importing rows 3-3', output)
+		self.assertIn('--resume', output)
+
+	def test_import_hosts_all(self):
+		path = self.write_csv(self.get_host_rows(5), list(self.get_host_rows(1)[0]))
+		self.command.batchSize = 2
+		self.command.import_hosts_all(path)
+
+		self.assertEqual(Host.objects.filter(slug__startswith='games-').count(), 5)
+		self.assertIn('5/5 rows (100%)', self.command.stdout.getvalue())
+
+
+class DeltaImportTests(ImportTestCase):
+	HOST_FIELDS = ['game_slug', 'game_end_date', 'game_start_date', 'game_location', 'game_name', 'game_season', 'game_year']
+
+	def host_row(self, year, location='Somewhere'):
+		return {
+			'game_slug': f'games-{year}', 'game_end_date': f'{year}-08-20T00:00:00Z', 'game_start_date': f'{year}-08-01T00:00:00Z',
+			'game_location': location, 'game_name': f'Games {year}', 'game_season': 'Summer', 'game_year': year,
+		}
+
+	def write_hosts(self, rows):
+		path = os.path.join(self.directory, 'olympic_hosts.csv')
+		with open(path, 'w', newline='') as file:
+			writer = csv.DictWriter(file, fieldnames=self.HOST_FIELDS)
+			writer.writeheader()
+			writer.writerows(rows)
+		return path
+
+	def setUp(self):
+		super().setUp()
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.directory = directory.name
+
+	def test_delta_only_touches_changed_rows(self):
+		path = self.write_hosts([self.host_row(1900), self.host_row(1904), self.host_row(1908)])
+		self.command.import_delta(path, self.command.import_hosts_all)
+		self.assertEqual(Host.objects.filter(slug__startswith='games-').count(), 3)
+
+		path = self.write_hosts([self.host_row(1900), self.host_row(1904, location='Elsewhere'), self.host_row(1912)])
+		delta = compute_delta(path)
+		self.assertEqual((len(delta.inserted), len(delta.updated), len(delta.deleted), delta.numUnchanged), (1, 1, 1, 1))
+
+		with CaptureQueriesContext(connection) as queries:
+			self.command.import_delta(path, self.command.import_hosts_all)
+		self.assertFalse([query for query in queries if 'games-1900' in str(query)])
+
+		self.assertEqual(
+			list(Host.objects.filter(slug__startswith='games-').order_by('year').values_list('slug', 'location')),
+			[('games-1900', 'Somewhere'), ('games-1904', 'Elsewhere'), ('games-1912', 'Somewhere')],
+		)
+		self.assertEqual((len(compute_delta(path).changed), len(compute_delta(path).deleted)), (0, 0))
+
+	def test_dry_run_reports_counts_without_writing(self):
+		path = self.write_hosts([self.host_row(1900), self.host_row(1904)])
+		self.command.import_delta(path, self.command.import_hosts_all, dryRun=True)
+
+		self.assertIn('2 to insert, 0 to update, 0 to delete, 0 unchanged', self.command.stdout.getvalue())
+		self.assertFalse(Host.objects.filter(slug__startswith='games-').exists())
+
+	def test_removed_medal_rows_are_deleted(self):
+		path = os.path.join(self.directory, 'olympic_medals.csv')
+		athleteRow = medals_all_row(
+			discipline_title='Biathlon', event_title='Men 20km Individual', event_gender='Men', participant_type='Athlete',
+			athlete_full_name='Quentin FILLON MAILLET', country_name='Norway', country_code='NO', country_3_letter_code='NOR',
+		)
+		teamRows = [medals_all_row(athlete_full_name='Stefania CONSTANTINI'), medals_all_row(athlete_full_name='Amos MOSANER')]
+
+		def write_medals(rows):
+			with open(path, 'w', newline='') as file:
+				writer = csv.DictWriter(file, fieldnames=MEDALS_ALL_FIELDS)
+				writer.writeheader()
+				writer.writerows(rows)
+
+		write_medals([athleteRow] + teamRows)
+		self.command.import_delta(path, self.command.import_medals_all_bulk)
+		self.assertEqual(Medal.objects.count(), 2)
+
+		# Removing one member of a team keeps the team medal
+		write_medals(teamRows[:1])
+		self.command.import_delta(path, self.command.import_medals_all_bulk)
+		self.assertEqual(list(Medal.objects.values_list('country__code', flat=True)), ['ITA'])
+
+		write_medals([])
+		self.command.import_delta(path, self.command.import_medals_all_bulk)
+		self.assertFalse(Medal.objects.exists())
+
+
+class PipelineTests(SimpleTestCase):
+
+	def test_stages_run_after_their_dependencies(self):
+		finished = []
+		stages = [
+			Stage('medals', lambda: finished.append('medals'), dependencies=['athletes', 'teams']),
+			Stage('athletes', lambda: finished.append('athletes'), dependencies=['countries']),
+			Stage('teams', lambda: finished.append('teams'), dependencies=['countries']),
+			Stage('countries', lambda: finished.append('countries')),
+		]
+		results = run_stages(stages)
+
+		self.assertEqual(finished[0], 'countries')
+		self.assertEqual(finished[-1], 'medals')
+		self.assertTrue(all(result.status == StageResult.OK for result in results))
+
+	def test_independent_stages_run_concurrently(self):
+		# Both stages have to be running at the same time to get past the barrier
+		barrier = threading.Barrier(2, timeout=5)
+		results = run_stages([Stage('summer', barrier.wait), Stage('winter', barrier.wait)], maxWorkers=2)
+
+		self.assertEqual([result.status for result in results], [StageResult.OK, StageResult.OK])
+
+	def test_failed_stage_skips_its_dependents_only(self):
+		def fail():
+			raise RuntimeError('no data')
+
+		results = {result.stage.name: result for result in run_stages([
+			Stage('hosts', fail),
+			Stage('events', lambda: None, dependencies=['hosts']),
+			Stage('medals', lambda: None, dependencies=['events']),
+			Stage('countries', lambda: False),
+			Stage('disciplines', lambda: None),
+		])}
+
+		self.assertEqual(results['hosts'].status, StageResult.FAILED)
+		self.assertIsInstance(results['hosts'].error, RuntimeError)
+		self.assertEqual(results['events'].status, StageResult.SKIPPED)
+		self.assertEqual(results['medals'].status, StageResult.SKIPPED)
+		self.assertEqual(results['countries'].status, StageResult.FAILED)
+		self.assertEqual(results['disciplines'].status, StageResult.OK)
+
+	def test_invalid_dependencies_are_rejected(self):
+		with self.assertRaises(ValueError):
+			check_stages([Stage('a', None, ['b']), Stage('b', None, ['a'])])
+		with self.assertRaises(ValueError):
+			check_stages([Stage('a', None, ['missing'])])
+
+
+class ImportAllTests(TestCase):
+
+	def setUp(self):
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.dataDir = directory.name
+		with open(os.path.join(self.dataDir, 'summer_olympics_disciplines.csv'), 'w') as file:
+			file.write('sport,discipline,code\nAthletics,,ATH\n')
+
+		command = ImportAllCommand(stdout=StringIO())
+		self.stages = {stage.name: stage for stage in command.get_stages({
+			'data_dir': self.dataDir, 'dataset_dir': 'missing', 'batch_size': 1000, 'offline': True,
+		})}
+
+	def test_command_stages_fail_when_the_command_raises(self):
+		with self.assertRaises(CommandError):
+			call_command('import_countries_data', os.path.join(self.dataDir, 'countries.json'), offline=True, stdout=StringIO())
+
+		result = run_stage(self.stages['countries'])
+		self.assertEqual(result.status, StageResult.FAILED)
+		self.assertIsInstance(result.error, CommandError)
+
+	def test_command_stages_succeed_when_the_command_returns(self):
+		self.assertEqual(run_stage(self.stages['summer_disciplines']).status, StageResult.OK)
+		self.assertTrue(Discipline.objects.filter(code='ATH').exists())
+
+		# No winter file
+		self.assertIsInstance(run_stage(self.stages['winter_disciplines']).error, CommandError)
+
+
+class StubFlagHandler(BaseHTTPRequestHandler):
+	"""Answers HEAD requests with 200 for the flags in `available` and 404 otherwise."""
+	available = {'/it.png', '/no.png'}
+	requests = []
+
+	def do_HEAD(self):
+		self.requests.append(self.path)
+		self.send_response(200 if self.path in self.available else 404)
+		self.end_headers()
+
+	def log_message(self, format, *args):
+		pass
+
+
+class FlagResolverTests(TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubFlagHandler)
+		cls.urlTemplate = f'http://127.0.0.1:{cls.server.server_port}/{{iso}}.png'
+		threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown()
+		cls.server.server_close()
+		super().tearDownClass()
+
+	def setUp(self):
+		StubFlagHandler.requests = []
+		cacheDir = tempfile.TemporaryDirectory()
+		self.addCleanup(cacheDir.cleanup)
+		self.cachePath = os.path.join(cacheDir.name, 'flags.json')
+
+	def get_resolver(self, **kwargs):
+		kwargs.setdefault('specificFlagURLs', {'AIN': 'https://example.com/ain.png'})
+		return FlagResolver(cachePath=self.cachePath, urlTemplate=self.urlTemplate, **kwargs)
+
+	def test_resolve_many_with_fallbacks(self):
+		flagURLs = self.get_resolver().resolve_many([('ITA', 'IT'), ('NOR', 'NO'), ('XYZ', 'XY'), ('AIN', 'AI')])
+
+		self.assertEqual(flagURLs['ITA'], self.urlTemplate.format(iso='it'))
+		self.assertEqual(flagURLs['NOR'], self.urlTemplate.format(iso='no'))
+		self.assertEqual(flagURLs['XYZ'], MISSING_FLAG_URL)
+		self.assertEqual(flagURLs['AIN'], 'https://example.com/ain.png')
+		self.assertCountEqual(StubFlagHandler.requests, ['/it.png', '/no.png', '/xy.png'])
+
+	def test_cached_results_skip_the_network(self):
+		self.get_resolver().resolve_many([('ITA', 'IT'), ('XYZ', 'XY')])
+		StubFlagHandler.requests = []
+
+		flagURLs = self.get_resolver().resolve_many([('ITA', 'IT'), ('XYZ', 'XY')])
+
+		self.assertEqual(StubFlagHandler.requests, [])
+		self.assertEqual(flagURLs['XYZ'], MISSING_FLAG_URL)
+
+	def test_expired_cache_entries_are_checked_again(self):
+		self.get_resolver().resolve_many([('ITA', 'IT')])
+		StubFlagHandler.requests = []
+
+		self.get_resolver(ttl=0).resolve_many([('ITA', 'IT')])
+
+		self.assertEqual(StubFlagHandler.requests, ['/it.png'])
+
+	def test_offline_makes_no_requests(self):
+		flagURLs = self.get_resolver(offline=True).resolve_many([('ITA', 'IT')])
+
+		self.assertEqual(StubFlagHandler.requests, [])
+		self.assertEqual(flagURLs['ITA'], self.urlTemplate.format(iso='it'))
+
+
+class CountingBackend(LocalBackend):
+
+	def __init__(self, directory):
+		super().__init__(directory)
+		self.numDownloads = 0
+
+	def download(self, dataset, filename, directory):
+		self.numDownloads += 1
+		return super().download(dataset, filename, directory)
+
+
+class DatasetCacheTests(SimpleTestCase):
+
+	def setUp(self):
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.directory = directory.name
+		self.remoteDir = os.path.join(self.directory, 'remote')
+		os.mkdir(self.remoteDir)
+		self.cacheDir = os.path.join(self.directory, 'cache')
+		self.destination = os.path.join(self.directory, 'data', 'medals.csv')
+		self.backend = CountingBackend(self.remoteDir)
+		self.write_remote('a,b\n1,2\n')
+
+	def write_remote(self, content):
+		path = os.path.join(self.remoteDir, 'medals.csv')
+		with open(path, 'w') as file:
+			file.write(content)
+		# Make sure the version changes even on filesystems with coarse timestamps
+		os.utime(path, ns=(0, os.stat(path).st_mtime_ns + self.backend.numDownloads + 1))
+
+	def fetch(self, offline=False):
+		return DatasetCache(backend=self.backend, cacheDir=self.cacheDir, offline=offline).fetch('owner/dataset', 'medals.csv', self.destination)
+
+	def read_destination(self):
+		with open(self.destination) as file:
+			return file.read()
+
+	def test_unchanged_file_is_only_downloaded_once(self):
+		self.assertEqual(self.fetch(), 'download')
+		os.remove(self.destination)
+
+		self.assertEqual(self.fetch(), 'cache (up to date)')
+		self.assertEqual(self.backend.numDownloads, 1)
+		self.assertEqual(self.read_destination(), 'a,b\n1,2\n')
+
+	def test_changed_file_is_downloaded_again(self):
+		self.fetch()
+		self.write_remote('a,b\n3,4\n')
+
+		self.assertEqual(self.fetch(), 'download')
+		self.assertEqual(self.backend.numDownloads, 2)
+		self.assertEqual(self.read_destination(), 'a,b\n3,4\n')
+
+	def test_offline_uses_local_copy_or_cache(self):
+		with self.assertRaises(DatasetUnavailable):
+			self.fetch(offline=True)
+
+		self.fetch()
+		self.assertEqual(self.fetch(offline=True), 'local copy (offline)')
+		os.remove(self.destination)
+		self.assertEqual(self.fetch(offline=True), 'cache (offline)')
+		self.assertEqual(self.backend.numDownloads, 1)
+		self.assertEqual(self.read_destination(), 'a,b\n1,2\n')
+
+
+class BenchmarkTests(ImportTestCase):
+
+	def setUp(self):
+		super().setUp()
+		Host.objects.create(
+			id='paris-2024', name='Paris 2024', slug='paris-2024', location='France', season='Summer',
+			year=2024, startDate='2024-07-26T17:30:00Z', endDate='2024-08-11T21:00:00Z',
+		)
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.dataset = SyntheticDataset(30, Discipline.objects.all(), Country.objects.all(), Host.objects.all())
+		self.datasetDir = self.dataset.write(directory.name)
+
+	def test_generated_files_have_the_requested_size(self):
+		for filename in ('olympic_medals.csv', 'events.csv', 'athletes.csv', 'teams.csv', 'medals.csv'):
+			with open(self.datasetDir / filename, newline='') as file:
+				self.assertEqual(len(list(csv.DictReader(file))), 30, filename)
+
+	def test_generated_files_import_cleanly(self):
+		self.command.import_medals_all_bulk(self.datasetDir / 'olympic_medals.csv')
+		self.assertIn('(0 skipped)', self.command.stdout.getvalue())
+
+		for method, filename in [
+			('import_events_paris2024', 'events.csv'),
+			('import_athletes_paris2024', 'athletes.csv'),
+			('import_teams_paris2024', 'teams.csv'),
+			('import_medals_paris2024', 'medals.csv'),
+		]:
+			self.assertEqual(getattr(self.command, method)(self.datasetDir / filename), 30, filename)
+		self.assertEqual(Medal.objects.filter(event__host_id='paris-2024').count(), 30)
+
+		# Every athlete is linked to their discipline and event, every team to its imported members
+		self.assertEqual(Athlete.disciplines.through.objects.count(), 30)
+		self.assertEqual(Athlete.events.through.objects.count(), 30)
+		athlete = Athlete.objects.get(id=self.dataset.get_athlete_code(4))
+		self.assertEqual(athlete.teams.count(), 3)
+		self.assertEqual(Team.athletes.through.objects.count(), 30 * 3 - 3)
+
+	def test_compare_results_flags_regressions(self):
+		old = {'results': [
+			{'benchmark': 'teams', 'size': 10, 'seconds': 1.0, 'queries': 100, 'peakMemoryMB': 2.0},
+			{'benchmark': 'events', 'size': 10, 'seconds': 1.0, 'queries': 100, 'peakMemoryMB': 2.0},
+		]}
+		new = {'results': [
+			{'benchmark': 'teams', 'size': 10, 'seconds': 1.05, 'queries': 100, 'peakMemoryMB': 2.0},
+			{'benchmark': 'events', 'size': 10, 'seconds': 0.5, 'queries': 150, 'peakMemoryMB': 1.0},
+		]}
+
+		comparisons = {key: isRegression for key, _, _, _, isRegression in compare_results(old, new, threshold=0.1)}
+
+		self.assertEqual(comparisons, {('events', 10): True, ('teams', 10): False})
+
+
+class MedalTallyTests(ImportTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.event = Event.objects.create(discipline_id='CUR', name='Mixed Doubles', gender='Mixed', host_id='beijing-2022')
+		self.athlete = Athlete.objects.create(name='Amos MOSANER', gender='Male', country_id='Italy')
+
+	def create_medal(self, rank, country='Italy'):
+		return Medal.objects.create(
+			rank=rank, event=self.event, country_id=country,
+			athlete=self.athlete,
+		)
+
+	def get_tally(self, country='Italy'):
+		return MedalTally.objects.filter(country_id=country, host_id='beijing-2022').values_list('gold', 'silver', 'bronze', 'total').first()
+
+	def get_overall_tally(self, country='Italy'):
+		return OverallMedalTally.objects.filter(country_id=country).values_list('gold', 'silver', 'bronze', 'total').first()
+
+	def test_tally_follows_medal_writes(self):
+		gold = self.create_medal(Medal.GOLD)
+		self.create_medal(Medal.BRONZE)
+		self.assertEqual(self.get_tally(), (1, 0, 1, 2))
+
+		gold.rank = Medal.SILVER
+		gold.save()
+		self.assertEqual(self.get_tally(), (0, 1, 1, 2))
+
+		gold.country_id = 'Norway'
+		gold.save()
+		self.assertEqual(self.get_tally(), (0, 0, 1, 1))
+		self.assertEqual(self.get_tally('Norway'), (0, 1, 0, 1))
+		self.assertEqual(self.get_overall_tally(), (0, 0, 1, 1))
+
+		gold.delete()
+		self.assertIsNone(self.get_tally('Norway'))
+		self.assertIsNone(self.get_overall_tally('Norway'))
+
+		Medal.objects.all().delete()
+		self.assertFalse(MedalTally.objects.exists())
+		self.assertIsNone(self.get_overall_tally())
+
+	def test_countries_with_medals_can_be_deleted(self):
+		self.create_medal(Medal.GOLD)
+		self.create_medal(Medal.SILVER, country='Norway')
+
+		Country.objects.get(pk='Norway').delete()
+		self.assertFalse(Medal.objects.filter(country_id='Norway').exists())
+		self.assertIsNone(self.get_overall_tally('Norway'))
+		self.assertEqual(self.get_overall_tally(), (1, 0, 0, 1))
+
+	def test_bulk_import_matches_a_rebuild(self):
+		self.command.import_medals_all_bulk(self.write_csv([
+			medals_all_row(athlete_full_name='Stefania CONSTANTINI'),
+			medals_all_row(athlete_full_name='Amos MOSANER'),
+			medals_all_row(event_title='Men', event_gender='Men', medal_type='SILVER', participant_type='Athlete', athlete_full_name='Joel RETORNAZ'),
+			medals_all_row(event_title='Men', event_gender='Men', medal_type='BRONZE', participant_type='Athlete', athlete_full_name='Bruce MOUAT',
+				country_name='Norway', country_code='NO', country_3_letter_code='NOR'),
+		], MEDALS_ALL_FIELDS))
+
+		tallies = set(MedalTally.objects.values_list('country_id', 'host_id', 'gold', 'silver', 'bronze', 'total'))
+		self.assertEqual(tallies, {('Italy', 'beijing-2022', 1, 1, 0, 2), ('Norway', 'beijing-2022', 0, 0, 1, 1)})
+
+		overallTallies = set(OverallMedalTally.objects.values_list('country_id', 'gold', 'silver', 'bronze', 'total'))
+		self.assertEqual(overallTallies, {('Italy', 1, 1, 0, 2), ('Norway', 0, 0, 1, 1)})
+
+		rebuild_tallies()
+		self.assertEqual(set(MedalTally.objects.values_list('country_id', 'host_id', 'gold', 'silver', 'bronze', 'total')), tallies)
+		self.assertEqual(set(OverallMedalTally.objects.values_list('country_id', 'gold', 'silver', 'bronze', 'total')), overallTallies)
+
+	def test_row_by_row_import_recounts_the_tallies_once(self):
+		self.create_medal(Medal.BRONZE)
+		with CaptureQueriesContext(connection) as queries:
+			self.command.import_medals_all(self.write_csv([
+				medals_all_row(),
+				medals_all_row(event_title='Men', event_gender='Men', medal_type='SILVER', participant_type='Athlete', athlete_full_name='Joel RETORNAZ'),
+				medals_all_row(event_title='Men', event_gender='Men', medal_type='BRONZE', participant_type='Athlete', athlete_full_name='Bruce MOUAT',
+					country_name='Norway', country_code='NO', country_3_letter_code='NOR'),
+			], MEDALS_ALL_FIELDS))
+
+		self.assertEqual(self.get_tally(), (1, 1, 1, 3))
+		self.assertEqual(self.get_tally('Norway'), (0, 0, 1, 1))
+		self.assertEqual(self.get_overall_tally(), (1, 1, 1, 3))
+		self.assertEqual(self.get_overall_tally('Norway'), (0, 0, 1, 1))
+
+		# No tally is updated per Medal, and the dataset version is bumped once
+		self.assertFalse([query for query in queries if 'UPDATE "tally_app_medaltally"' in query['sql']])
+		self.assertEqual(len([query for query in queries if 'UPDATE "tally_app_datasetversion"' in query['sql']]), 1)
+
+	def test_migration_recount_matches_a_rebuild(self):
+		self.create_medal(Medal.GOLD)
+		self.create_medal(Medal.SILVER, country='Norway')
+		MedalTally.objects.update(gold=5, total=7)
+		OverallMedalTally.objects.filter(country_id='Italy').delete()
+
+		# 0010 recounts the tallies after deleting the medals whose winner is gone
+		migration = importlib.import_module('tally_app.migrations.0010_medal_winner_foreign_keys')
+		migration.recount_tallies(apps)
+		self.assertEqual(self.get_tally(), (1, 0, 0, 1))
+		self.assertEqual(self.get_overall_tally('Norway'), (0, 1, 0, 1))
+
+		tallies = set(MedalTally.objects.values_list('country_id', 'host_id', 'gold', 'silver', 'bronze', 'total'))
+		overallTallies = set(OverallMedalTally.objects.values_list('country_id', 'gold', 'silver', 'bronze', 'total'))
+		rebuild_tallies()
+		self.assertEqual(set(MedalTally.objects.values_list('country_id', 'host_id', 'gold', 'silver', 'bronze', 'total')), tallies)
+		self.assertEqual(set(OverallMedalTally.objects.values_list('country_id', 'gold', 'silver', 'bronze', 'total')), overallTallies)
+
+	def test_tally_views_read_the_tallies(self):
+		self.create_medal(Medal.GOLD)
+		self.create_medal(Medal.SILVER, country='Norway')
+
+		response = self.client.get('/')
+		tallies = list(response.context['page'])
+		self.assertEqual([(tally.country.code, tally.gold, tally.total) for tally in tallies[:2]], [('ITA', 1, 1), ('NOR', 0, 1)])
+
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.get('/tally/host/beijing-2022/')
+		self.assertEqual({country.code: country.num_silver_medals for country in response.context['countries']}, {'ITA': 0, 'NOR': 1})
+		self.assertFalse([query for query in queries if '"tally_app_medal"' in query['sql']])
+
+
+
+class OverallTallyPageTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls):
+		# Plenty of ties, so the pages depend on the tie-breakers
+		for ii in range(23):
+			country = Country.objects.create(fullName=f'Country {ii:02d}', code=f'C{ii:02d}', flagURL='https://example.com/flag.png')
+			OverallMedalTally.objects.filter(country=country).update(gold=ii % 3, silver=ii % 2, bronze=ii % 4, total=ii % 3 + ii % 2 + ii % 4)
+
+	def get_all_pages(self, sort, direction, pageSize=5):
+		pages = [get_overall_tally_page(sort, direction, pageSize=pageSize)]
+		while pages[-1].nextCursor:
+			pages.append(get_overall_tally_page(sort, direction, pageSize=pageSize, after=pages[-1].nextCursor))
+		return pages
+
+	def test_pages_follow_the_sort_without_gaps_or_repeats(self):
+		for sort, ordering in OVERALL_TALLY_ORDERINGS.items():
+			for direction in ('asc', 'desc'):
+				with self.subTest(sort=sort, direction=direction):
+					pages = self.get_all_pages(sort, direction)
+					expected = OverallMedalTally.objects.order_by(*(f'-{field}' if direction == 'desc' else field for field in ordering))
+					self.assertEqual([tally.pk for page in pages for tally in page], [tally.pk for tally in expected])
+					self.assertEqual([page.offset for page in pages], [0, 5, 10, 15, 20])
+
+	def test_previous_page(self):
+		pages = self.get_all_pages('total', 'desc')
+
+		previous = get_overall_tally_page('total', 'desc', pageSize=5, before=pages[2].previousCursor)
+		self.assertEqual([tally.pk for tally in previous], [tally.pk for tally in pages[1]])
+		self.assertEqual(previous.offset, 5)
+
+		first = get_overall_tally_page('total', 'desc', pageSize=5, before=pages[1].previousCursor)
+		self.assertEqual([tally.pk for tally in first], [tally.pk for tally in pages[0]])
+		self.assertIsNone(first.previousCursor)
+
+	def test_pages_cost_the_same_at_any_depth(self):
+		cursor = self.get_all_pages('gold', 'desc')[-2].nextCursor
+		with self.assertNumQueries(2):
+			get_overall_tally_page('gold', 'desc', pageSize=5, after=cursor)
+
+	def test_bad_cursors(self):
+		for cursor in ['not a cursor', 'WzFd']:
+			with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+				decode_cursor(cursor, 4)
+
+	def test_index_view_sorts_and_paginates(self):
+		response = self.client.get('/?sort=country&direction=desc')
+		names = [tally.country.fullName for tally in response.context['page']]
+		self.assertEqual(names[:3], ['Country 22', 'Country 21', 'Country 20'])
+		self.assertEqual(len(names), 23)
+
+		response = self.client.get('/?sort=bogus&after=garbage')
+		self.assertEqual(response.context['sort'], 'gold')
+		self.assertEqual(response.status_code, 200)
+
+class QueryPlanTests(ImportTestCase):
+	"""The per-Games and per-country queries should seek an index rather than scan a table."""
+
+	def assert_uses_index(self, queryset, table, index):
+		plan = queryset.explain()
+		self.assertIn(f'{table} USING INDEX {index}', plan.replace('COVERING INDEX', 'INDEX'))
+		self.assertNotRegex(plan, rf'SCAN {table}\b(?! USING)')
+
+	def test_medals_of_a_country_by_rank(self):
+		self.assert_uses_index(Medal.objects.filter(country_id='Italy', rank=Medal.GOLD), 'tally_app_medal', 'medal_country_rank_idx')
+
+	def test_podium_of_an_event(self):
+		self.assert_uses_index(Medal.objects.filter(event_id=1, rank=Medal.GOLD), 'tally_app_medal', 'medal_event_rank_idx')
+
+	def test_events_of_a_host(self):
+		self.assert_uses_index(Event.objects.filter(host_id='beijing-2022').order_by('discipline'), 'tally_app_event', 'event_host_discipline_idx')
+
+	def test_overall_table_by_gold(self):
+		self.assert_uses_index(OverallMedalTally.objects.order_by('-gold', '-silver', '-bronze', '-country_id')[:50],
+			'tally_app_overallmedaltally', 'overall_gold_idx')
+
+	def test_hosts_of_a_season(self):
+		self.assert_uses_index(Host.objects.filter(season='Summer').order_by('year'), 'tally_app_host', 'host_season_year_idx')
+
+	def test_medals_of_a_country_at_a_host(self):
+		plan = Medal.objects.filter(event__host_id='beijing-2022', country_id='Italy').explain()
+		self.assertNotRegex(plan, r'SCAN tally_app_(medal|event)\b(?! USING)')
+
+
+class CountryMedalListingTests(ImportTestCase):
+	# Country and medals, plus the host and its top 10 countries on a Games page; the menu comes from the cache
+	# Each also reads the dataset version, once
+	QUERY_BUDGETS = {'/tally/country/ITA/': 3, '/tally/country/ITA/beijing-2022/': 5}
+
+	def create_medals(self, numEvents):
+		athlete = Athlete.objects.create(name='Dorothea WIERER', gender='Female', country_id='Italy')
+		for ii in range(numEvents):
+			event = Event.objects.create(discipline_id=['BTH', 'CUR'][ii % 2], name=f'Event {ii}', gender='Women', host_id='beijing-2022')
+			for rank in (Medal.BRONZE, Medal.GOLD):
+				Medal.objects.create(rank=rank, event=event, country_id='Italy', athlete=athlete)
+
+	def test_medals_are_grouped_by_discipline_and_sorted(self):
+		self.create_medals(3)
+		response = self.client.get('/tally/country/ITA/')
+
+		medalsPerDiscipline = response.context['medalsPerDiscipline']
+		self.assertEqual([discipline.code for discipline in medalsPerDiscipline], ['BTH', 'CUR'])
+		self.assertEqual(
+			[(medal.event.name, medal.rank) for medal in medalsPerDiscipline[Discipline.objects.get(code='BTH')]],
+			[('Event 0', Medal.GOLD), ('Event 0', Medal.BRONZE), ('Event 2', Medal.GOLD), ('Event 2', Medal.BRONZE)],
+		)
+
+	def test_country_pages_stay_within_the_query_budget(self):
+		self.create_medals(40)
+
+		get_navigation()
+		for url, budget in self.QUERY_BUDGETS.items():
+			with self.assertNumQueries(budget):
+				response = self.client.get(url)
+			self.assertContains(response, 'Event 39')
+
+
+class WinnerResolutionTests(ImportTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.event = Event.objects.create(discipline_id='CUR', name='Mixed Doubles', gender='Mixed', host_id='beijing-2022')
+		for ii, rank in enumerate([Medal.GOLD, Medal.SILVER, Medal.BRONZE] * 4):
+			country = ['Italy', 'Norway'][ii % 2]
+			if ii % 3:
+				winner = Athlete.objects.create(name=f'Athlete {ii}', gender='Male', country_id=country)
+			else:
+				winner = Team.objects.create(id=f'CURXMIXED{ii:03d}', gender='X', discipline='Curling', country_id=country)
+			Medal.objects.create(rank=rank, event=self.event, country_id=country, winner=winner)
+
+	def test_winners_are_joined_in(self):
+		with self.assertNumQueries(1):
+			winners = [(medal.winner.pk, medal.winner.country.code) for medal in with_winners(Medal.objects.all())]
+		self.assertIn(('CURXMIXED000', 'ITA'), winners)
+
+		athlete = Athlete.objects.get(name='Athlete 1')
+		self.assertEqual(list(athlete.medals.values_list('rank', flat=True)), [Medal.SILVER])
+
+	def test_a_medal_has_exactly_one_winner(self):
+		athlete = Athlete.objects.get(name='Athlete 1')
+		team = Team.objects.get(id='CURXMIXED000')
+		for winners in [{}, {'athlete': athlete, 'team': team}]:
+			with self.subTest(winners=winners), self.assertRaises(IntegrityError), transaction.atomic():
+				Medal.objects.create(rank=Medal.GOLD, event=self.event, country_id='Italy', **winners)
+
+	def test_event_detail_query_count_is_fixed(self):
+		self.client.get(f'/tally/event/{self.event.pk}')
+		# The event, then its medals with their winners joined in, and the dataset version for the navigation
+		with self.assertNumQueries(3):
+			response = self.client.get(f'/tally/event/{self.event.pk}')
+
+		self.assertEqual(response.context['gold_medal'].winner.pk, 'CURXMIXED000')
+		self.assertContains(response, 'Athlete 1')
+
+
+class NavigationTests(ImportTestCase):
+
+	def create_medal(self, countryId):
+		event = Event.objects.create(discipline_id='CUR', name=f'Event {Event.objects.count()}', gender='Mixed', host_id='beijing-2022')
+		athlete = Athlete.objects.create(name='Stefania CONSTANTINI', gender='Female', country_id=countryId)
+		return Medal.objects.create(rank=Medal.GOLD, event=event, country_id=countryId,
+			athlete=athlete)
+
+	def test_navigation_is_cached_between_requests(self):
+		self.create_medal('Norway')
+		self.client.get('/')
+
+		# Only the dataset version is read
+		with self.assertNumQueries(1):
+			navigation = get_navigation()
+		self.assertEqual([host.slug for host in navigation['hosts']], ['beijing-2022'])
+		self.assertEqual(navigation['top_countries'][0].code, 'NOR')
+
+	def test_medal_changes_invalidate_the_navigation(self):
+		medal = self.create_medal('Norway')
+		get_navigation()
+
+		medal.country_id = 'Italy'
+		medal.save()
+		self.create_medal('Italy')
+		self.assertEqual([country.code for country in get_navigation()['top_countries']], ['ITA', 'NOR'])
+
+		Medal.objects.filter(country_id='Italy').delete()
+		self.assertEqual(get_navigation()['top_countries'][0].total_medals, 0)
+
+	def test_import_invalidates_the_navigation(self):
+		self.assertEqual(get_navigation()['top_countries'][0].total_medals, 0)
+
+		self.command.import_medals_all_bulk(self.write_csv([medals_all_row()], MEDALS_ALL_FIELDS))
+		self.assertEqual(get_navigation()['top_countries'][0].total_medals, 1)
+
+
+class PageCacheTests(ImportTestCase):
+
+	def setUp(self):
+		super().setUp()
+		event = Event.objects.create(discipline_id='CUR', name='Mixed Doubles', gender='Mixed', host_id='beijing-2022')
+		athlete = Athlete.objects.create(name='Stefania CONSTANTINI', gender='Female', country_id='Italy')
+		self.medal = Medal.objects.create(rank=Medal.GOLD, event=event, country_id='Italy',
+			athlete=athlete)
+
+	def assert_served_from_cache(self, url):
+		first = self.client.get(url)
+		self.assertEqual(first.status_code, 200)
+
+		# Only the dataset version is read
+		with self.assertNumQueries(2):
+			repeat = self.client.get(url)
+			notModified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+		self.assertEqual(repeat.content, first.content)
+		self.assertEqual(repeat['ETag'], first['ETag'])
+		self.assertIn('Last-Modified', repeat)
+		self.assertEqual(notModified.status_code, 304)
+		return first
+
+	def test_tally_pages_are_served_from_the_cache(self):
+		for url in ['/', '/tally/host/beijing-2022/', '/tally/country/ITA/', '/tally/country/ITA/stats/']:
+			with self.subTest(url=url):
+				self.assert_served_from_cache(url)
+
+	def test_query_string_is_part_of_the_key(self):
+		self.client.get('/tally/host/beijing-2022/?sort=gold')
+		with self.assertNumQueries(4):
+			self.client.get('/tally/host/beijing-2022/?sort=silver')
+
+	def test_data_changes_make_cached_pages_stale(self):
+		first = self.assert_served_from_cache('/tally/country/ITA/')
+
+		self.medal.delete()
+		response = self.client.get('/tally/country/ITA/', HTTP_IF_NONE_MATCH=first['ETag'])
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], first['ETag'])
+		self.assertNotContains(response, 'Mixed Doubles')
+
+	def test_medal_edits_that_keep_the_tally_bump_the_dataset_version(self):
+		version = get_dataset_version()
+		self.medal.date = '2022-02-08'
+		self.medal.save()
+		self.assertNotEqual(get_dataset_version(), version)
+
+		athlete = Athlete.objects.create(name='Amos MOSANER', gender='Male', country_id='Italy')
+		version = get_dataset_version()
+		self.medal.athlete = athlete
+		self.medal.save()
+		self.assertNotEqual(get_dataset_version(), version)
+
+	def test_imports_bump_the_dataset_version(self):
+		first = self.client.get('/')
+		self.command.import_medals_all_bulk(self.write_csv([medals_all_row()], MEDALS_ALL_FIELDS))
+		self.assertNotEqual(self.client.get('/')['ETag'], first['ETag'])
+
+	def test_versions_bumped_by_other_processes_are_seen(self):
+		# Each process has its own local-memory cache, only the database is shared
+		siteCache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'site'}}
+		importerCache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'importer'}}
+		with override_settings(CACHES=siteCache):
+			first = self.assert_served_from_cache('/tally/host/beijing-2022/')
+		with override_settings(CACHES=importerCache):
+			call_command('rebuild_medal_tally', stdout=StringIO())
+		with override_settings(CACHES=siteCache):
+			response = self.client.get('/tally/host/beijing-2022/', HTTP_IF_NONE_MATCH=first['ETag'])
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], first['ETag'])
+
+	def test_file_based_cache(self):
+		with tempfile.TemporaryDirectory() as directory:
+			fileCache = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+			with override_settings(CACHES=fileCache):
+				first = self.assert_served_from_cache('/tally/host/beijing-2022/')
+				bump_dataset_version()
+				self.assertNotEqual(self.client.get('/tally/host/beijing-2022/')['ETag'], first['ETag'])
+
+
+class CountryStatsTests(ImportTestCase):
+
+	def setUp(self):
+		super().setUp()
+		Host.objects.create(
+			id='paris-2024', name='Paris 2024', slug='paris-2024', location='France', season='Summer',
+			year=2024, startDate='2024-07-26T17:30:00Z', endDate='2024-08-11T19:00:00Z',
+		)
+		event = Event.objects.create(discipline_id='CUR', name='Mixed Doubles', gender='Mixed', host_id='beijing-2022')
+		athlete = Athlete.objects.create(name='Stefania CONSTANTINI', gender='Female', country_id='Italy')
+		Medal.objects.create(rank=Medal.GOLD, event=event, country_id='Italy',
+			athlete=athlete)
+
+	def test_chart_data(self):
+		data = self.client.get('/tally/country/ITA/stats/data/').json()
+		self.assertEqual(data, {
+			'country': 'Italy', 'season': 'All', 'year': [2022, 2024],
+			'gold': [1, 0], 'silver': [0, 0], 'bronze': [0, 0], 'total': [1, 0],
+		})
+
+		data = self.client.get('/tally/country/ITA/stats/data/?season=Summer').json()
+		self.assertEqual((data['season'], data['year'], data['total']), ('Summer', [2024], [0]))
+
+	def test_page_loads_plotly_as_a_static_asset(self):
+		response = self.client.get('/tally/country/ITA/stats/?season=Winter')
+
+		self.assertContains(response, f'/static/{get_plotly_js_path()}')
+		self.assertContains(response, '/tally/country/ITA/stats/data/?season=Winter')
+		self.assertLess(len(response.content), 50_000)
+		self.assertEqual(list(response.context['medal_data']), [(2022, 1, 0, 0, 1)])
+
+	def test_plotly_js_is_found_under_its_fingerprinted_name(self):
+		finder = PlotlyJsFinder()
+		self.assertEqual(finder.find(get_plotly_js_path()), str(get_plotly_js_source()))
+		self.assertEqual(finder.find('tally_app/js/plotly.min.js'), [])
+		self.assertEqual([path for path, storage in finder.list([])], [get_plotly_js_path()])
+
+
+class StartupProfileTests(SimpleTestCase):
+	# No transaction around the tests, so the test database can be copied for the new interpreter
+	databases = {'default'}
+
+	def test_parse_importtime(self):
+		imports = parse_importtime(
+			'import time: self [us] | cumulative | imported package\n'
+			'import time:       117 |        117 |     django.contrib.sites.requests\n'
+			'import time:      1569 |       4846 | tally_app.views\n'
+			'some other output\n'
+		)
+		self.assertEqual([(module.name, module.selfTime, module.cumulativeTime, module.depth) for module in imports], [
+			('django.contrib.sites.requests', 117, 117, 2),
+			('tally_app.views', 1569, 4846, 0),
+		])
+
+	def test_cold_start_is_within_budget(self):
+		# The test database only lives in this process, give the new interpreter a copy of it
+		databasePath = os.path.join(tempfile.mkdtemp(), 'startup.sqlite3')
+		self.addCleanup(os.remove, databasePath)
+		connection.ensure_connection()
+		with sqlite3.connect(databasePath) as copy:
+			connection.connection.backup(copy)
+
+		profile = profile_startup('/', database=databasePath)
+
+		self.assertEqual(profile.status, 200)
+		self.assertEqual(profile.heavyModules, [])
+		self.assertIn('tally_app.views', [module.name for module in profile.imports])
+		self.assertLess(profile.responseSeconds * 1000, STARTUP_BUDGET_MS)
+
+
+class ApiTests(ImportTestCase):
+
+	def setUp(self):
+		super().setUp()
+		Host.objects.create(
+			id='paris-2024', name='Paris 2024', slug='paris-2024', location='France', season='Summer',
+			year=2024, startDate='2024-07-26T17:30:00Z', endDate='2024-08-11T19:00:00Z',
+		)
+		self.curling = Event.objects.create(discipline_id='CUR', name='Mixed Doubles', gender='Mixed', host_id='beijing-2022')
+		biathlon = Event.objects.create(discipline_id='BTH', name='Sprint', gender='Women', host_id='paris-2024')
+
+		team = Team.objects.create(id='CURXMIXED001', gender='X', discipline='Curling', country_id='Italy')
+		athlete = Athlete.objects.create(name='Dorothea WIERER', gender='Female', country_id='Italy')
+		Medal.objects.create(rank=Medal.SILVER, event=self.curling, country_id='Norway', athlete=athlete)
+		Medal.objects.create(rank=Medal.GOLD, event=self.curling, country_id='Italy', team=team)
+		Medal.objects.create(rank=Medal.BRONZE, event=biathlon, country_id='Italy', athlete=athlete)
+
+	def get_json(self, url, status=200):
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, status, response.content)
+		return response.json()
+
+	def get_all_results(self, url):
+		results = []
+		while url:
+			data = self.get_json(url)
+			results += data['results']
+			url = data['next']
+		return results
+
+	def test_tally(self):
+		data = self.get_json('/api/v1/tally/?fields=code,gold,total')
+		self.assertEqual(data['results'], [{'code': 'ITA', 'gold': 1, 'total': 2}, {'code': 'NOR', 'gold': 0, 'total': 1}])
+		self.assertIsNone(data['next'])
+
+		self.assertEqual(self.get_all_results('/api/v1/tally/?sort=total&direction=asc&limit=1&fields=code'), [{'code': 'NOR'}, {'code': 'ITA'}])
+		self.assertEqual(self.get_json('/api/v1/tally/?season=Summer&fields=code,bronze')['results'], [{'code': 'ITA', 'bronze': 1}])
+
+	def test_host_tally(self):
+		data = self.get_json('/api/v1/hosts/beijing-2022/tally/?sort=silver&fields=code,silver,total')
+		self.assertEqual(data['results'], [{'code': 'NOR', 'silver': 1, 'total': 1}, {'code': 'ITA', 'silver': 0, 'total': 1}])
+		self.get_json('/api/v1/hosts/nowhere-1900/tally/', status=404)
+
+	def test_hosts(self):
+		self.assertEqual([host['slug'] for host in self.get_all_results('/api/v1/hosts/?limit=1')], ['paris-2024', 'beijing-2022'])
+		self.assertEqual(self.get_json('/api/v1/hosts/?season=Winter&fields=slug,year')['results'], [{'slug': 'beijing-2022', 'year': 2022}])
+
+	def test_country_medals(self):
+		medals = self.get_all_results('/api/v1/countries/ITA/medals/?limit=1')
+		self.assertEqual([(medal['host']['slug'], medal['rank']) for medal in medals], [('paris-2024', Medal.BRONZE), ('beijing-2022', Medal.GOLD)])
+		self.assertEqual(medals[1]['winner'], {'type': 'team', 'id': 'CURXMIXED001', 'name': str(Team.objects.get())})
+
+		data = self.get_json('/api/v1/countries/ITA/medals/?discipline=CUR&fields=rank,discipline')
+		self.assertEqual(data['results'], [{'rank': Medal.GOLD, 'discipline': {'code': 'CUR', 'name': 'Curling'}}])
+		self.assertEqual(len(self.get_json('/api/v1/countries/ITA/medals/?host=paris-2024&season=Summer')['results']), 1)
+
+	def test_event_podiums(self):
+		data = self.get_json(f'/api/v1/events/{self.curling.pk}/?fields=name,podium')
+		self.assertEqual([(medal['rank'], medal['country'], medal['winner']['type']) for medal in data['podium']], [
+			(Medal.GOLD, 'Italy', 'team'), (Medal.SILVER, 'Norway', 'athlete'),
+		])
+		self.assertEqual([event['name'] for event in self.get_json('/api/v1/events/?season=Winter&fields=name')['results']], ['Mixed Doubles'])
+
+	def test_query_costs_do_not_grow_with_the_page(self):
+		# The dataset version, the country, then medals with their winners joined in
+		with self.assertNumQueries(3):
+			self.get_json('/api/v1/countries/ITA/medals/')
+		# The dataset version, events, then their medals with their winners joined in
+		with self.assertNumQueries(3):
+			self.get_json('/api/v1/events/')
+		# The dataset version, the host and its tally
+		with self.assertNumQueries(3):
+			self.get_json('/api/v1/hosts/beijing-2022/tally/?limit=1')
+
+	def test_bad_requests(self):
+		for url in [
+			'/api/v1/tally/?sort=name', '/api/v1/tally/?direction=up', '/api/v1/tally/?limit=0', '/api/v1/tally/?limit=lots',
+			'/api/v1/tally/?fields=code,population', '/api/v1/hosts/?season=Spring', '/api/v1/hosts/?after=nonsense',
+		]:
+			with self.subTest(url=url):
+				self.assertIn('error', self.get_json(url, status=400))
+
+		self.assertEqual(self.client.post('/api/v1/tally/').status_code, 405)
+
+
+class ExportTests(ImportTestCase):
+
+	def setUp(self):
+		super().setUp()
+		event = Event.objects.create(discipline_id='CUR', name='Mixed Doubles', gender='Mixed', host_id='beijing-2022')
+
+		self.team = Team.objects.create(id='CURXMIXED001', gender='X', discipline='Curling', country_id='Italy')
+		self.athletes = [Athlete.objects.create(name=f'Athlete {i}', gender='Female', country_id='Norway') for i in range(5)]
+		Medal.objects.create(rank=Medal.GOLD, event=event, country_id='Italy', team=self.team)
+		for athlete in self.athletes:
+			Medal.objects.create(rank=Medal.SILVER, event=event, country_id='Norway', athlete=athlete)
+
+	def export(self, format, **kwargs):
+		return b''.join(iter_export(format, **kwargs))
+
+	def test_csv(self):
+		rows = list(csv.DictReader(self.export('csv').decode().splitlines()))
+		self.assertEqual(list(rows[0]), EXPORT_COLUMNS)
+		self.assertEqual(len(rows), 6)
+		self.assertEqual(
+			(rows[0]['country_code'], rows[0]['host'], rows[0]['discipline'], rows[0]['winner_type'], rows[0]['winner']),
+			('ITA', 'beijing-2022', 'Curling', 'team', str(self.team)),
+		)
+		self.assertEqual([row['winner'] for row in rows[1:]], [athlete.name for athlete in self.athletes])
+
+	def test_ndjson_and_gzip(self):
+		lines = gzip.decompress(self.export('ndjson', compress=True)).decode().splitlines()
+		medals = [json.loads(line) for line in lines]
+		self.assertEqual(len(medals), 6)
+		self.assertEqual(medals[1]['winner_id'], self.athletes[0].pk)
+		self.assertEqual(medals[1]['host_year'], 2022)
+
+	def test_queries_grow_with_the_chunks_not_the_medals(self):
+		# The medals, read in two chunks, and a query per kind of winner in each chunk
+		with self.assertNumQueries(4):
+			self.export('csv', chunkSize=3)
+
+	def test_endpoint_streams(self):
+		response = self.client.get('/api/v1/export/medals.ndjson?country=NOR')
+		self.assertTrue(response.streaming)
+		self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+		self.assertEqual(response['Content-Disposition'], 'attachment; filename="medals.ndjson"')
+		self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 5)
+
+		response = self.client.get('/api/v1/export/medals.csv?gzip=1')
+		self.assertEqual(response['Content-Type'], 'application/gzip')
+		self.assertEqual(len(gzip.decompress(b''.join(response.streaming_content)).splitlines()), 7)
+
+		self.assertEqual(self.client.get('/api/v1/export/medals.xml').status_code, 404)
+		self.assertEqual(self.client.get('/api/v1/export/medals.csv?season=Spring').status_code, 400)
+
+	def test_command_follows_the_extension(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'medals.ndjson.gz')
+			stdout = StringIO()
+			call_command('export_medals', path, stdout=stdout)
+			with gzip.open(path, 'rt') as file:
+				self.assertEqual(len(file.readlines()), 6)
+		self.assertIn('Successfully exported', stdout.getvalue())
+
+
+class PrerenderTests(ImportTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.athlete = Athlete.objects.create(name='Dorothea WIERER', gender='Female', country_id='Italy')
+		self.curling = Event.objects.create(discipline_id='CUR', name='Mixed Doubles', gender='Mixed', host_id='beijing-2022')
+		self.biathlon = Event.objects.create(discipline_id='BTH', name='Sprint', gender='Women', host_id='beijing-2022')
+		for event, country in [(self.curling, 'Italy'), (self.biathlon, 'Norway')]:
+			Medal.objects.create(rank=Medal.GOLD, event=event, country_id=country, athlete=self.athlete)
+
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.outputDir = directory.name
+
+	def test_renders_every_page(self):
+		result = prerender(self.outputDir, workers=1)
+
+		self.assertEqual(result.failed, [])
+		self.assertIn('/tally/country/ITA/beijing-2022/', result.rendered)
+		# Two countries with a page and a stats page, their two pages at the one host, two events and four more
+		self.assertEqual(len(result.rendered), 12)
+		eventPage = get_output_path(self.outputDir, f'/tally/event/{self.biathlon.pk}')
+		self.assertIn('Dorothea WIERER', eventPage.read_text())
+		self.assertTrue(get_output_path(self.outputDir, '/').exists())
+
+	def test_renders_only_pages_whose_data_changed(self):
+		prerender(self.outputDir, workers=1)
+		self.assertEqual(prerender(self.outputDir, workers=1).rendered, [])
+
+		Medal.objects.filter(event=self.curling).update(rank=Medal.SILVER)
+		rebuild_tallies()
+		result = prerender(self.outputDir, workers=1)
+		self.assertIn(f'/tally/event/{self.curling.pk}', result.rendered)
+		self.assertIn('/tally/country/ITA/', result.rendered)
+		self.assertIn('/tally/host/beijing-2022/', result.rendered)
+		self.assertNotIn(f'/tally/event/{self.biathlon.pk}', result.rendered)
+		self.assertNotIn('/tally/country/NOR/', result.rendered)
+
+	def test_country_changes_render_the_pages_showing_the_country(self):
+		prerender(self.outputDir, workers=1)
+
+		norway = Country.objects.get(code='NOR')
+		norway.flagURL = 'https://example.com/no-new.png'
+		norway.save()
+		result = prerender(self.outputDir, workers=1)
+		for url in ['/', '/countries/', '/tally/country/NOR/', '/tally/host/beijing-2022/']:
+			self.assertIn(url, result.rendered)
+		self.assertNotIn('/tally/country/ITA/', result.rendered)
+		self.assertIn('no-new.png', get_output_path(self.outputDir, '/').read_text())
+
+	def test_removes_pages_of_deleted_events(self):
+		prerender(self.outputDir, workers=1)
+		url = f'/tally/event/{self.biathlon.pk}'
+		self.biathlon.delete()
+
+		result = prerender(self.outputDir, workers=1)
+		# Norway's only medal there went with it
+		self.assertEqual(result.removed, ['/tally/country/NOR/beijing-2022/', url])
+		self.assertFalse(get_output_path(self.outputDir, url).parent.exists())
+
+	def test_command(self):
+		stdout = StringIO()
+		call_command('prerender', output=self.outputDir, workers=1, stdout=stdout)
+		self.assertIn('12 pages rendered', stdout.getvalue())
+
+
+class RosterTests(ImportTestCase):
+
+	def test_parse_names(self):
+		self.assertEqual(parse_names("['KAO Wenchao', 'LI Zhongyuan']"), ['KAO Wenchao', 'LI Zhongyuan'])
+		self.assertEqual(parse_names('["Men\'s 100m", "Men\'s 200m"]'), ["Men's 100m", "Men's 200m"])
+		self.assertEqual(parse_names("['Men's 100m']"), ["Men's 100m"])
+		self.assertEqual(parse_names('Curling, Biathlon'), ['Curling', 'Biathlon'])
+		self.assertEqual(parse_names(''), [])
+
+	def test_events_are_found_whichever_importer_named_them(self):
+		eventIndex = EventIndex([
+			(1, 'CUR', 'Mixed Doubles', 'X'),
+			(2, 'BTH', "Women's Sprint", 'Women'),
+			(3, 'CUR', "Women's Sprint", 'Women'),
+		])
+		self.assertEqual(eventIndex.resolve(['Mixed Mixed Doubles', "Women's Sprint"], {'CUR', 'BTH'}), {1, 2, 3})
+		self.assertEqual(eventIndex.resolve(["Women's Sprint"], {'BTH'}), {2})
+		self.assertEqual(eventIndex.resolve(["Men's Sprint"]), set())
+
+	def test_migration_links_the_listed_disciplines_events_and_athletes(self):
+		Host.objects.create(
+			id='paris-2024', name='Paris 2024', slug='paris-2024', location='France', season='Summer',
+			year=2024, startDate='2024-07-26T17:30:00Z', endDate='2024-08-11T21:00:00Z',
+		)
+		event = Event.objects.create(discipline_id='CUR', name='Mixed Doubles', gender='X', host_id='paris-2024')
+		athletes = [
+			Athlete.objects.create(id=1001, name='Stefania CONSTANTINI', gender='Female', country_id='Italy',
+				disciplinesRaw="['Curling', 'Luge']", eventsRaw="['Mixed Mixed Doubles']"),
+			Athlete.objects.create(id=1002, name='Amos MOSANER', gender='Male', country_id='Italy'),
+		]
+		team = Team.objects.create(id='CURXMIXED001', gender='X', discipline='Curling', country_id='Italy',
+			athleteIDs="['1001', '1002', '1003']")
+
+		migration = importlib.import_module('tally_app.migrations.0012_athlete_team_relations')
+		migration.link_rosters(apps, None)
+
+		self.assertEqual(list(athletes[0].disciplines.all()), [Discipline.objects.get(code='CUR')])
+		self.assertEqual(list(athletes[0].events.all()), [event])
+		self.assertEqual(list(event.athletes.all()), [athletes[0]])
+		self.assertEqual(set(team.athletes.all()), set(athletes))
+		self.assertEqual(list(athletes[1].teams.all()), [team])
+
+
+class SearchTests(ImportTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.event = Event.objects.create(discipline_id='BTH', name='Sprint', gender='Women', host_id='beijing-2022')
+		self.athlete = Athlete.objects.create(name='Ángel MARTÍNEZ', gender='Male', country_id='Italy')
+		Athlete.objects.create(name='Nora SOLBERG', gender='Female', country_id='Norway')
+		Medal.objects.create(rank=Medal.GOLD, event=self.event, country_id='Italy', athlete=self.athlete)
+
+	def get_titles(self, query, **kwargs):
+		return [document.title for document in search(query, **kwargs)]
+
+	def test_sqlite_has_the_full_text_index(self):
+		self.assertTrue(has_full_text_index(connection))
+
+	def test_words_match_as_prefixes_best_first(self):
+		self.assertEqual(self.get_titles('nor')[:2], ['Norway', 'Nora SOLBERG'])
+		self.assertEqual(self.get_titles('nora sol'), ['Nora SOLBERG'])
+		self.assertEqual(self.get_titles('biath sprint'), ['Biathlon Sprint'])
+		self.assertEqual(self.get_titles('nor', kind=SearchDocument.ATHLETE), ['Nora SOLBERG'])
+		self.assertEqual(self.get_titles('"nor*'), self.get_titles('nor'))
+		self.assertEqual(self.get_titles('  '), [])
+
+	def test_accents_and_case_are_ignored(self):
+		self.assertEqual(self.get_titles('angel martinez'), ['Ángel MARTÍNEZ'])
+		self.assertEqual(self.get_titles('MARTÍN'), ['Ángel MARTÍNEZ'])
+
+	def test_fallback_finds_the_same_documents(self):
+		for query in ['nor', 'angel martinez', 'biath sprint', 'it']:
+			self.assertEqual(
+				{document.pk for document in search_fallback(get_terms(query), None, 20)},
+				{document.pk for document in search(query)},
+			)
+
+	def test_saves_and_deletes_are_indexed(self):
+		self.athlete.displayName = 'Angelo'
+		self.athlete.save()
+		self.assertEqual(self.get_titles('angelo'), ['Angelo'])
+
+		self.athlete.delete()
+		self.assertEqual(self.get_titles('angel'), [])
+
+		Discipline.objects.filter(code='BTH').update(name='Biathlon Skiing')
+		Discipline.objects.get(code='BTH').save()
+		self.assertIn('Biathlon Skiing Sprint', self.get_titles('biathlon skiing'))
+
+	def test_negative_tallies_dont_break_country_documents(self):
+		# Tallies can be off until the next rebuild, e.g. after a migration deleted medals
+		OverallMedalTally.objects.filter(country_id='Norway').update(total=-1)
+		index_objects(SearchDocument.COUNTRY, ['NOR'])
+		self.assertEqual(SearchDocument.objects.get(kind=SearchDocument.COUNTRY, objectId='NOR').boost, 0)
+
+	def test_deleting_a_country_indexes_it_once(self):
+		athlete = Athlete.objects.get(name='Nora SOLBERG')
+		for rank in [Medal.GOLD, Medal.SILVER, Medal.BRONZE]:
+			Medal.objects.create(rank=rank, event=self.event, country_id='Norway', athlete=athlete)
+
+		with CaptureQueriesContext(connection) as queries:
+			Country.objects.get(pk='Norway').delete()
+		# The document of a country is built from its overall tally
+		documentQueries = [query for query in queries if query['sql'].startswith('SELECT') and 'tally_app_overallmedaltally' in query['sql']]
+		self.assertEqual(len(documentQueries), 1)
+		self.assertEqual(self.get_titles('norway'), [])
+
+	def test_imports_refresh_the_index(self):
+		path = self.write_csv([medals_all_row(participant_type='Athlete', athlete_full_name='Amos MOSANER')], MEDALS_ALL_FIELDS)
+		self.command.import_medals_all_bulk(path)
+
+		document = SearchDocument.objects.get(title='Amos MOSANER')
+		self.assertEqual(self.get_titles('mosaner'), ['Amos MOSANER'])
+		self.assertEqual(document.url, f'/tally/event/{Medal.objects.get(athlete__name="Amos MOSANER").event_id}')
+
+	def test_suggestions(self):
+		data = self.client.get('/search/suggest/', {'q': 'marti'}).json()
+		self.assertEqual(data['results'], [
+			{'kind': 'athlete', 'title': 'Ángel MARTÍNEZ', 'detail': 'Italy', 'url': f'/tally/event/{self.event.pk}'},
+		])
+
+		response = self.client.get('/search/', {'q': 'norway'})
+		self.assertContains(response, 'Nora SOLBERG')
+		self.assertContains(response, '/tally/country/NOR/')
 
-# Create your tests here.
@@ -11,4 +11,22 @@ def fetch_medals_data(api_url, country=None):
 	except requests.RequestException as e:
 		# Handle any errors
 		print(f"Error fetiching data from API: {e}")
-		return None
\ No newline at end of file
+		return None
+
+
+class QueryCounter:
+	"""Database execute wrapper that counts every query run on a connection.
+
+	Usage:
+		counter = QueryCounter()
+		with connection.execute_wrapper(counter):
+			...
+		print(counter.count)
+	"""
+
+	def __init__(self):
+		self.count = 0
+
+	def __call__(self, execute, sql, params, many, context):
+		self.count += 1
+		return execute(sql, params, many, context)
@@ -1,53 +1,46 @@
-from django.db.models import Count, Case, When, IntegerField, Q
+from django.db.models import Q
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views import generic
 
 from django.http import JsonResponse
+from django.views.decorators.http import require_safe
 
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
+from tally_app.models import Country, Athlete, Team, Medal, Event, Host, SearchDocument
+from tally_app.tally import OVERALL_TALLY_ORDERINGS, annotate_medal_totals, get_medal_series, get_overall_tally_page
+from tally_app.pagination import InvalidCursor
+from tally_app.listings import get_country_medals, group_by_discipline, with_winners
+from tally_app.page_cache import cache_page_per_dataset
+from tally_app.search import search as search_documents
+from tally_app.static_assets import get_plotly_js_path
 
-from tally_app.models import Country, Athlete, Team, Medal, Event, Host
+INDEX_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 50
+NUM_SUGGESTIONS = 8
 
 # Create your views here.
 # def index(request):
 # 	return render(request, 'tally_app/index.html')
 
 
+@cache_page_per_dataset
 def index(request):
-
-	# Annotate each country with the total number of medals
-	countries = Country.objects.annotate(
-		num_gold_medals=Count(
-			Case(
-				When(medals__rank=Medal.GOLD, then=1),
-				output_field=IntegerField()
-			)
-		),
-		num_silver_medals=Count(
-			Case(
-				When(medals__rank=Medal.SILVER, then=1),
-				output_field=IntegerField()
-			)
-		),
-		num_bronze_medals=Count(
-			Case(
-				When(medals__rank=Medal.BRONZE, then=1),
-				output_field=IntegerField()
-			)
-		),
-		total_medals=Count('medals')
-	).order_by('-num_gold_medals', '-num_silver_medals', '-num_bronze_medals')
-
-	hosts = Host.objects.all()
-	medals = Medal.objects.filter()
-
+	# Sort the all-time medal table as asked, by gold, silver then bronze medals by default
+	sort = request.GET.get('sort', 'gold')
+	direction = request.GET.get('direction', 'asc' if 'sort' in request.GET else 'desc')
+	if sort not in OVERALL_TALLY_ORDERINGS:
+		sort, direction = 'gold', 'desc'
+
+	try:
+		page = get_overall_tally_page(sort, direction, pageSize=INDEX_PAGE_SIZE,
+			after=request.GET.get('after'), before=request.GET.get('before'))
+	except InvalidCursor:
+		page = get_overall_tally_page(sort, direction, pageSize=INDEX_PAGE_SIZE)
+
+	# hosts and top_countries come from the navigation context processor
 	context = {
-		'countries': countries,
-		'top_countries': countries[0:10],
-		'medals': medals,
-		'hosts': hosts.order_by('-year')
+		'page': page,
+		'sort': sort,
+		'direction': direction,
 	}
 
 	return render(request, 'tally_app/index.html', context=context)
@@ -78,14 +71,10 @@ def all_countries(request):
 	num_columns_sm = 2  # Number of columns for small screens
 	num_columns_xs = 1  # Number of columns for extra small screens
 
-	countries = Country.objects.annotate(total_medals=Count('medals')).order_by('-total_medals')
-
-	hosts = Host.objects.all().order_by('-year')
+	countries = annotate_medal_totals(Country.objects.all()).order_by('-total_medals')
 
 	context = {
-		'hosts': hosts,
 		'countries': countries,
-		'top_countries': countries.order_by('-total_medals')[0:10],
 		'num_columns_md': 12 // num_columns_md,
 		'num_columns_sm': 12 // num_columns_sm,
 		'num_columns_xs': 12 // num_columns_xs,
@@ -95,31 +84,15 @@ def all_countries(request):
 	return render(request, 'tally_app/countries.html', context=context)
 
 
+@cache_page_per_dataset
 def country_medals(request, code):
 	country = get_object_or_404(Country, code=code)
-	medals = Medal.objects.filter(country=country)
-
-	uniqueDisciplines = Event.objects.filter(medals__in=medals).values_list('discipline', flat=True).distinct()
-
-	medalsPerDiscipline = {}
-	for medal in Medal.objects.filter(country=country):
-		if medal.event.discipline not in medalsPerDiscipline:
-			medalsPerDiscipline[medal.event.discipline] = []
-
-		medalsPerDiscipline[medal.event.discipline].append(medal)
-
-
-	# Annotate each country with the total number of medals
-	countries = Country.objects.annotate(total_medals=Count('medals')).order_by('-total_medals')
-
-	hosts = Host.objects.all().order_by('-year')
+	medalsPerDiscipline = group_by_discipline(get_country_medals(country))
 
 	context = {
-		'hosts': hosts,
 		'country': country,
-		'top_countries': countries[0:10],
 		'medalsPerDiscipline': medalsPerDiscipline,
-		'disciplines': uniqueDisciplines,
+		'disciplines': list(medalsPerDiscipline),
 	}
 
 	return render(request, 'tally_app/country_medals.html', context=context)
@@ -127,157 +100,122 @@ def country_medals(request, code):
 
 def country_medal_tally_for_host(request, code, slug):
 	country = get_object_or_404(Country, code=code)
-
-	allHosts = Host.objects.all()
 	host = get_object_or_404(Host, slug=slug)
 
-	medals = Medal.objects.filter(date__year=host.year, country=country)
-
-	uniqueDisciplines = Event.objects.filter(medals__in=medals).values_list('discipline', flat=True).distinct()
-
-	medalsPerDiscipline = {}
-	for medal in medals:
-		if medal.event.discipline not in medalsPerDiscipline:
-			medalsPerDiscipline[medal.event.discipline] = []
-
-		medalsPerDiscipline[medal.event.discipline].append(medal)
+	medalsPerDiscipline = group_by_discipline(get_country_medals(country, host=host))
 
 	# Annotate each country with the total number of medals
-	countries = Country.objects.filter(medals__in=Medal.objects.filter(date__year=host.year)).distinct().annotate(total_medals=Count('medals')).order_by('-total_medals')
+	countries = annotate_medal_totals(Country.objects.filter(tallies__host=host)).order_by('-total_medals')
 
 	context = {
-		'hosts': allHosts.order_by('-year'),
 		'current_host': host,
 		'top_countries': countries[0:10],
 		'country': country,
 		'medalsPerDiscipline': medalsPerDiscipline,
-		'disciplines': uniqueDisciplines,
+		'disciplines': list(medalsPerDiscipline),
 	}
 
 	return render(request, 'tally_app/country_medals_for_host.html', context=context)
 
 
-def country_stats(request, code):
-	# Annotate each country with the total number of medals
-	countries = Country.objects.annotate(total_medals=Count('medals')).order_by('-total_medals')
-	country = get_object_or_404(Country, code=code)
-
+def get_season_filter(request):
 	season_filter = request.GET.get('season', 'All')  # Default to "All" if no filter is set
-	if season_filter == 'Summer':
-		hosts = Host.objects.filter(season='Summer')
-	elif season_filter == 'Winter':
-		hosts = Host.objects.filter(season='Winter')
-	else:
-		hosts = Host.objects.all()  # Show all hosts for "All"
-
-
-	# Annotate hosts with the medal counts
-	medalData = hosts.annotate(
-		num_gold_medals=Count('events__medals', filter=Q(events__medals__country=country, events__medals__rank='Gold')),
-		num_silver_medals=Count('events__medals', filter=Q(events__medals__country=country, events__medals__rank='Silver')),
-		num_bronze_medals=Count('events__medals', filter=Q(events__medals__country=country, events__medals__rank='Bronze')),
-		total_medals=Count('events__medals', filter=Q(events__medals__country=country))
-	).order_by('year')
-
-	# Prepare the data for Plotly
-	data = {
-		'year': [host.year for host in medalData],
-		'Total Medals': [host.total_medals for host in medalData],
-		'Gold Medals': [host.num_gold_medals for host in medalData],
-		'Silver Medals': [host.num_silver_medals for host in medalData],
-		'Bronze Medals': [host.num_bronze_medals for host in medalData],
-	}
-
-	df = pd.DataFrame(data)
+	return season_filter if season_filter in ('Summer', 'Winter') else 'All'
 
-	cmin = min(df['Total Medals'].values)  # get minimum value of the whole set
-	cmax = max(df['Total Medals'].values)  # get maximum value of the whole set
 
-	fig = go.Figure()
-
-	colors = [ 'black', '#e8c62c', 'silver', '#e6a14e']
-
-	for ii, col in enumerate(df.columns[1:]):
-		fig.add_trace(
-			go.Scatter(
-				x=df['year'],  # construct list of identical X values to match the Y-list
-				y=df[col],  # Your MTU list
-				mode='lines+markers',  # scatter plot without lines
-				marker=dict(
-					color=colors[ii],  # set color by the value of Y
-					cmin=cmin,  # absolute color scaling min value
-					cmax=cmax,  # absolute color scaling max value
-				),
-				line=dict(
-					dash='dot' if ii == 0 else 'solid',
-				),
-				name=col,
-			)
-		)
-
-	fig.update_layout(title=f'{country.fullName} Medal Count (1896 - 2024)',
-				   xaxis_title='Year',
-				   yaxis_title='# Medals')
+@cache_page_per_dataset
+def country_stats(request, code):
+	country = get_object_or_404(Country, code=code)
+	season_filter = get_season_filter(request)
 
-	chart = fig.to_html()
+	# The chart is drawn in the browser from country_stats_data
+	series = get_medal_series(country, None if season_filter == 'All' else season_filter)
 
 	context = {
-		'hosts': hosts.order_by('-year'),
 		'season_filter': season_filter,  # Pass the current filter to the template
-		'top_countries': countries[0:10],
 		'country': country,
-		'chart': chart,
+		'medal_data': list(zip(series['year'], series['gold'], series['silver'], series['bronze'], series['total'])),
+		'plotly_js': get_plotly_js_path(),
 	}
 
 	return render(request, 'tally_app/country_stats.html', context=context)
 
 
+@cache_page_per_dataset
+def country_stats_data(request, code):
+	"""The per-Games medal counts behind the country_stats chart, as JSON."""
+	country = get_object_or_404(Country, code=code)
+	season_filter = get_season_filter(request)
+
+	return JsonResponse({
+		'country': country.fullName,
+		'season': season_filter,
+		**get_medal_series(country, None if season_filter == 'All' else season_filter),
+	})
+
+
+@cache_page_per_dataset
 def host_medal_tally(request, slug):
-	allHosts = Host.objects.all()
 	host = get_object_or_404(Host, slug=slug)
 
-	medalsForHost = Medal.objects.filter(date__year=host.year)
-
-	countries = Country.objects.filter(medals__in=medalsForHost).distinct().annotate(
-		num_gold_medals=Count(
-			Case(
-				When(medals__rank=Medal.GOLD, then=1),
-				output_field=IntegerField()
-			)
-		),
-		num_silver_medals=Count(
-			Case(
-				When(medals__rank=Medal.SILVER, then=1),
-				output_field=IntegerField()
-			)
-		),
-		num_bronze_medals=Count(
-			Case(
-				When(medals__rank=Medal.BRONZE, then=1),
-				output_field=IntegerField()
-			)
-		),
-		total_medals=Count('medals')
-	)
+	countries = annotate_medal_totals(Country.objects.filter(tallies__host=host))
 
 	context = {
 		'countries': countries.order_by('-num_gold_medals', '-num_silver_medals', '-num_bronze_medals'),
 		'top_countries': countries.order_by('-total_medals')[0:10],
 		'current_host': host,
-		'hosts': allHosts.order_by('-year'),
 	}
 
 	return render(request, 'tally_app/host_medal_tally.html', context=context)
 
 
 def event_detail(request, pk):
-	event = get_object_or_404(Event, id=pk)  # Fetch the event
-	medals = Medal.objects.filter(event=event).order_by('rank')  # Get gold, silver, bronze medals
+	event = get_object_or_404(Event.objects.select_related('discipline', 'host'), id=pk)  # Fetch the event
+
+	# Get gold, silver, bronze medals along with their winners
+	medalsByRank = {}
+	for medal in with_winners(Medal.objects.filter(event=event).order_by('id')):
+		medalsByRank.setdefault(medal.rank, medal)
 
 	context = {
 		'event': event,
-		'gold_medal': medals.filter(rank='Gold').first(),
-		'silver_medal': medals.filter(rank='Silver').first(),
-		'bronze_medal': medals.filter(rank='Bronze').first(),
+		'gold_medal': medalsByRank.get(Medal.GOLD),
+		'silver_medal': medalsByRank.get(Medal.SILVER),
+		'bronze_medal': medalsByRank.get(Medal.BRONZE),
 	}
 	return render(request, 'tally_app/event_detail.html', context)
+
+
+def get_search_kind(request):
+	kind = request.GET.get('kind')
+	return kind if kind in dict(SearchDocument.KIND_CHOICES) else None
+
+
+@cache_page_per_dataset
+def search(request):
+	query = request.GET.get('q', '').strip()
+	kind = get_search_kind(request)
+
+	context = {
+		'query': query,
+		'kind': kind,
+		'kinds': SearchDocument.KIND_CHOICES,
+		'results': search_documents(query, kind=kind, limit=SEARCH_PAGE_SIZE),
+	}
+	return render(request, 'tally_app/search.html', context)
+
+
+@cache_page_per_dataset
+@require_safe
+def search_suggestions(request):
+	"""The best few matches of what has been typed into the search box so far, as JSON."""
+	query = request.GET.get('q', '').strip()
+	results = search_documents(query, kind=get_search_kind(request), limit=NUM_SUGGESTIONS)
+
+	return JsonResponse({
+		'query': query,
+		'results': [
+			{'kind': result.kind, 'title': result.title, 'detail': result.detail, 'url': result.url}
+			for result in results
+		],
+	})